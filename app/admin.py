@@ -0,0 +1,133 @@
+"""
+Endpoints d'administration et de diagnostic (rôle administrateur requis)
+"""
+from typing import List
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.allocation_tracking import (
+    GROUP_BY_CHOICES, AllocationTrackingError, SnapshotNotFoundError, allocation_tracker
+)
+from app.auth import require_admin
+from app.models import (
+    AllocationDiffEntry, AllocationSnapshot, AllocationStatus, ProfileInfo, ResourceReport, SubjectUsage
+)
+from app.profiling import profile_store, render_collapsed, sampling_profiler
+from app.resource_usage import usage_store
+from app.services.quotas import usage_ledger
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles", response_model=List[ProfileInfo])
+async def list_profiles():
+    """Liste les profils de conversion enregistrés"""
+    return [ProfileInfo(**profile) for profile in profile_store.list()]
+
+
+@router.get("/profiles/{request_id}")
+async def download_profile(request_id: str):
+    """
+    Télécharge le profil d'une requête
+    
+    - `.prof` : profil cProfile (pstats, snakeviz...)
+    - `.collapsed` : piles échantillonnées compatibles flamegraph
+    """
+    path = profile_store.find(request_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Aucun profil pour la requête {request_id}"
+        )
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
+@router.get("/profiler/stacks", response_class=PlainTextResponse)
+async def sampled_stacks(reset: bool = Query(default=False, description="Remettre les compteurs à zéro après lecture")):
+    """
+    Piles agrégées de l'échantillonneur continu, au format collapsed stacks
+    
+    Une ligne par pile (`thread;module:fonction;... nombre`), directement
+    exploitable par flamegraph.pl ou speedscope.
+    """
+    snapshot = sampling_profiler.snapshot(reset=reset)
+    return PlainTextResponse(
+        render_collapsed(snapshot["counts"]),
+        headers={
+            "X-Profiler-Running": str(sampling_profiler.running).lower(),
+            "X-Profiler-Samples": str(snapshot["samples"]),
+            "X-Profiler-Since": datetime.utcfromtimestamp(snapshot["since"]).isoformat()
+        }
+    )
+
+
+@router.get("/requests/{request_id}/resources", response_model=ResourceReport)
+async def request_resources(request_id: str):
+    """Ressources consommées par une conversion (CPU, mémoire par étape, forme des entrées)"""
+    report = usage_store.get(request_id)
+    if report is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Aucune mesure pour la requête {request_id}"
+        )
+    return ResourceReport(**report)
+
+
+@router.get("/usage", response_model=List[SubjectUsage])
+async def subjects_usage(limit: int = Query(default=20, ge=1, le=1000, description="Nombre d'utilisateurs retournés")):
+    """Utilisateurs les plus coûteux (temps CPU, octets produits) sur la fenêtre glissante"""
+    return [SubjectUsage(**usage) for usage in usage_ledger.top(limit)]
+
+
+@router.get("/usage/{subject}", response_model=SubjectUsage)
+async def subject_usage(subject: str):
+    """Consommation d'un utilisateur sur la fenêtre glissante"""
+    return SubjectUsage(**usage_ledger.usage(subject))
+
+
+@router.get("/tracemalloc", response_model=AllocationStatus)
+async def tracemalloc_status():
+    """État du suivi des allocations (tracemalloc) et snapshots disponibles"""
+    return AllocationStatus(**allocation_tracker.status())
+
+
+@router.post("/tracemalloc/start", response_model=AllocationStatus)
+async def tracemalloc_start(frames: int = Query(default=25, ge=1, le=100, description="Profondeur de pile par allocation")):
+    """Active tracemalloc (surcoût CPU et mémoire uniquement tant qu'il est actif)"""
+    return AllocationStatus(**allocation_tracker.start(frames))
+
+
+@router.post("/tracemalloc/stop", response_model=AllocationStatus)
+async def tracemalloc_stop():
+    """Désactive tracemalloc et libère les snapshots"""
+    return AllocationStatus(**allocation_tracker.stop())
+
+
+@router.post("/tracemalloc/snapshots", response_model=AllocationSnapshot)
+async def tracemalloc_snapshot():
+    """Prend un snapshot des allocations courantes"""
+    try:
+        return AllocationSnapshot(**await run_in_threadpool(allocation_tracker.take_snapshot))
+    except AllocationTrackingError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.get("/tracemalloc/diff", response_model=List[AllocationDiffEntry])
+async def tracemalloc_diff(
+    from_id: int = Query(description="Snapshot de référence"),
+    to_id: int = Query(description="Snapshot à comparer"),
+    limit: int = Query(default=20, ge=1, le=500, description="Nombre d'entrées retournées"),
+    group_by: str = Query(default="traceback", description=f"Regroupement: {', '.join(GROUP_BY_CHOICES)}")
+):
+    """Top-N des différences d'allocations entre deux snapshots, triées par croissance"""
+    try:
+        entries = await run_in_threadpool(allocation_tracker.diff, from_id, to_id, limit, group_by)
+    except SnapshotNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except AllocationTrackingError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return [AllocationDiffEntry(**entry) for entry in entries]
@@ -0,0 +1,135 @@
+"""
+Suivi des allocations mémoire avec tracemalloc pour la recherche de fuites
+
+tracemalloc n'est actif qu'entre start() et stop() : aucun surcoût en dehors.
+Les snapshots sont conservés en nombre limité, et les opérations coûteuses
+(snapshot, comparaison) doivent être exécutées hors de la boucle d'événements.
+"""
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from app.config import settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+GROUP_BY_CHOICES = ("traceback", "lineno", "filename")
+
+# Allocations internes à ignorer dans les snapshots
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class AllocationTrackingError(Exception):
+    """Exception pour les erreurs de suivi des allocations"""
+    pass
+
+
+class SnapshotNotFoundError(AllocationTrackingError):
+    """Exception pour un snapshot inconnu ou éjecté"""
+    pass
+
+
+class AllocationTracker:
+    """Démarrage/arrêt de tracemalloc, snapshots numérotés et comparaisons"""
+
+    def __init__(self, max_snapshots: int):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def start(self, frames: int) -> Dict[str, Any]:
+        """Active tracemalloc avec la profondeur de pile demandée"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+                logger.warning("🧪 tracemalloc activé (%s frames par allocation)", frames)
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """Désactive tracemalloc et libère les snapshots"""
+        with self._lock:
+            self._snapshots.clear()
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+                logger.warning("🧪 tracemalloc désactivé")
+        return self.status()
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        """Prend un snapshot des allocations (opération coûteuse, hors boucle d'événements)"""
+        if not tracemalloc.is_tracing():
+            raise AllocationTrackingError("tracemalloc n'est pas actif")
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        traced, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            entry = self._snapshots[snapshot_id] = {
+                "snapshot": snapshot,
+                "taken_at": time.time(),
+                "traced": traced,
+                "peak": peak,
+            }
+            # Décrit avant l'éviction éventuelle (appel concurrent, max_snapshots=0)
+            description = self._describe(snapshot_id, entry)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return description
+
+    def diff(self, from_id: int, to_id: int, limit: int = 20, group_by: str = "traceback") -> List[Dict[str, Any]]:
+        """Top des différences d'allocations entre deux snapshots"""
+        if group_by not in GROUP_BY_CHOICES:
+            raise AllocationTrackingError(f"Regroupement non supporté: {group_by}")
+        older = self._get(from_id)["snapshot"]
+        newer = self._get(to_id)["snapshot"]
+
+        stats = newer.compare_to(older, group_by)
+        return [
+            {
+                "size_diff": stat.size_diff,
+                "size": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+                "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            }
+            for stat in stats[:limit]
+        ]
+
+    def status(self) -> Dict[str, Any]:
+        """État courant du suivi des allocations"""
+        tracing = tracemalloc.is_tracing()
+        traced, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [self._describe(snapshot_id, entry) for snapshot_id, entry in self._snapshots.items()]
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced": traced,
+            "peak": peak,
+            "overhead": tracemalloc.get_tracemalloc_memory() if tracing else 0,
+            "snapshots": snapshots,
+        }
+
+    def _get(self, snapshot_id: int) -> Dict[str, Any]:
+        """Snapshot par identifiant"""
+        with self._lock:
+            entry = self._snapshots.get(snapshot_id)
+        if entry is None:
+            raise SnapshotNotFoundError(f"Snapshot {snapshot_id} introuvable")
+        return entry
+
+    @staticmethod
+    def _describe(snapshot_id: int, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Description sérialisable d'un snapshot"""
+        return {"id": snapshot_id, "taken_at": entry["taken_at"], "traced": entry["traced"], "peak": entry["peak"]}
+
+
+allocation_tracker = AllocationTracker(settings.tracemalloc_max_snapshots)
@@ -6,12 +6,14 @@ import requests
 from typing import Dict, Any, Optional
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 import json
 import time
 from app.config import settings
 from app.logging_config import get_logger
+from app.metrics import JWKS_CACHE_HITS, JWKS_REFRESHES, observe_stage
 
 logger = get_logger(__name__)
 security = HTTPBearer(auto_error=not settings.disable_auth)
@@ -19,6 +21,7 @@ security = HTTPBearer(auto_error=not settings.disable_auth)
 # Cache pour les clés JWKS
 _jwks_cache = {}
 _cache_expiry = 0
+_cache_fetched_at = 0
 CACHE_DURATION = 3600  # 1 heure
 
 
@@ -29,39 +32,54 @@ class JWTError(Exception):
 
 def get_jwks() -> Dict[str, Any]:
     """Récupère les clés JWKS depuis l'URL configurée"""
-    global _jwks_cache, _cache_expiry
+    global _jwks_cache, _cache_expiry, _cache_fetched_at
     
     current_time = time.time()
     
     # Vérifier le cache
     if _jwks_cache and current_time < _cache_expiry:
         logger.debug("Utilisation du cache JWKS")
+        JWKS_CACHE_HITS.inc()
         return _jwks_cache
     
     try:
-        logger.info(f"Récupération des clés JWKS depuis {settings.jwks_url}")
+        logger.info("Récupération des clés JWKS depuis %s", settings.jwks_url)
         response = requests.get(settings.jwks_url, timeout=10)
         response.raise_for_status()
         
         try:
             jwks_data = response.json()
         except ValueError as e:
-            logger.error(f"Format JSON invalide dans la réponse JWKS: {e}")
+            logger.error("Format JSON invalide dans la réponse JWKS: %s", e)
             raise JWTError("Format JSON invalide dans la réponse JWKS")
         _jwks_cache = jwks_data
         _cache_expiry = current_time + CACHE_DURATION
+        _cache_fetched_at = current_time
         
-        logger.info(f"Clés JWKS récupérées avec succès ({len(jwks_data.get('keys', []))} clés)")
+        JWKS_REFRESHES.inc(outcome="success")
+        logger.info("Clés JWKS récupérées avec succès (%s clés)", len(jwks_data.get('keys', [])))
         return jwks_data
         
+    except JWTError:
+        JWKS_REFRESHES.inc(outcome="error")
+        raise
     except requests.RequestException as e:
-        logger.error(f"Erreur lors de la récupération des clés JWKS: {e}")
+        JWKS_REFRESHES.inc(outcome="error")
+        logger.error("Erreur lors de la récupération des clés JWKS: %s", e)
         raise JWTError(f"Impossible de récupérer les clés JWKS: {e}")
     except json.JSONDecodeError as e:
-        logger.error(f"Erreur de décodage JSON des clés JWKS: {e}")
+        JWKS_REFRESHES.inc(outcome="error")
+        logger.error("Erreur de décodage JSON des clés JWKS: %s", e)
         raise JWTError(f"Format JSON invalide pour les clés JWKS: {e}")
 
 
+def get_jwks_cache_age() -> Optional[float]:
+    """Âge du cache JWKS en secondes (None si jamais chargé), sans aucun appel réseau"""
+    if not _jwks_cache or not _cache_fetched_at:
+        return None
+    return time.time() - _cache_fetched_at
+
+
 def get_public_key(kid: str) -> str:
     """Récupère la clé publique correspondant au kid"""
     jwks = get_jwks()
@@ -87,13 +105,13 @@ def get_public_key(kid: str) -> str:
                         format=serialization.PublicFormat.SubjectPublicKeyInfo
                     )
                     
-                    logger.debug(f"Clé publique trouvée pour kid: {kid}")
+                    logger.debug("Clé publique trouvée pour kid: %s", kid)
                     return pem.decode('utf-8')
                 else:
                     raise JWTError(f"Type de clé non supporté: {key.get('kty')}")
                     
             except Exception as e:
-                logger.error(f"Erreur lors de la conversion de la clé JWK: {e}")
+                logger.error("Erreur lors de la conversion de la clé JWK: %s", e)
                 raise JWTError(f"Erreur lors de la conversion de la clé: {e}")
     
     raise JWTError(f"Clé avec kid '{kid}' non trouvée")
@@ -122,17 +140,17 @@ def verify_jwt_token(token: str) -> Dict[str, Any]:
             options={"verify_exp": True}
         )
         
-        logger.debug(f"Token JWT vérifié avec succès pour l'utilisateur: {payload.get('sub', 'unknown')}")
+        logger.debug("Token JWT vérifié avec succès pour l'utilisateur: %s", payload.get('sub', 'unknown'))
         return payload
         
     except jwt.ExpiredSignatureError:
         logger.warning("Token JWT expiré")
         raise JWTError("Token expiré")
     except jwt.InvalidTokenError as e:
-        logger.warning(f"Token JWT invalide: {e}")
+        logger.warning("Token JWT invalide: %s", e)
         raise JWTError(f"Token invalide: {e}")
     except Exception as e:
-        logger.error(f"Erreur lors de la vérification du token JWT: {e}")
+        logger.error("Erreur lors de la vérification du token JWT: %s", e)
         raise JWTError(f"Erreur de vérification: {e}")
 
 
@@ -162,18 +180,20 @@ async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] =
     
     try:
         token = credentials.credentials
-        payload = verify_jwt_token(token)
+        # Vérification hors de la boucle : un rafraîchissement JWKS est un appel HTTP synchrone
+        with observe_stage("auth"):
+            payload = await run_in_threadpool(verify_jwt_token, token)
         return payload
         
     except JWTError as e:
-        logger.warning(f"Authentification échouée: {e}")
+        logger.warning("Authentification échouée: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e),
             headers={"WWW-Authenticate": "Bearer"},
         )
     except Exception as e:
-        logger.error(f"Erreur inattendue lors de l'authentification: {e}")
+        logger.error("Erreur inattendue lors de l'authentification: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erreur interne du serveur"
@@ -192,4 +212,20 @@ def get_user_email(user: Dict[str, Any]) -> Optional[str]:
 
 def get_user_roles(user: Dict[str, Any]) -> list:
     """Extrait les rôles utilisateur du payload JWT"""
-    return user.get("roles", [])
\ No newline at end of file
+    return user.get("roles", [])
+
+
+def is_admin(user: Dict[str, Any]) -> bool:
+    """Indique si l'utilisateur possède le rôle administrateur"""
+    return settings.admin_role in get_user_roles(user)
+
+
+async def require_admin(current_user: Dict[str, Any] = Depends(get_current_user)) -> Dict[str, Any]:
+    """Dépendance FastAPI réservant un endpoint aux administrateurs"""
+    if not is_admin(current_user):
+        logger.warning("Accès administrateur refusé pour l'utilisateur: %s", get_user_id(current_user))
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Droits administrateur requis"
+        )
+    return current_user
\ No newline at end of file
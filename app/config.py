@@ -26,12 +26,81 @@ class Settings(BaseSettings):
     
     # File Configuration
     max_file_size: int = 50 * 1024 * 1024  # 50MB
+    multipart_overhead: int = 64 * 1024  # en-têtes et séparateurs multipart tolérés au-delà de max_file_size
+    request_decompression: bool = os.getenv("REQUEST_DECOMPRESSION", "true").lower() == "true"  # Content-Encoding: gzip
     allowed_extensions: list = [".msg"]
     temp_dir: str = os.getenv("TEMP_DIR", "/tmp")
+    attachment_spill_threshold: int = int(os.getenv("ATTACHMENT_SPILL_THRESHOLD_MB", "1")) * 1024 * 1024  # 0 = désactivé
+    scratch_max_age: float = float(os.getenv("SCRATCH_MAX_AGE", "3600"))  # secondes avant qu'un orphelin soit supprimé
+    scratch_janitor_interval: float = float(os.getenv("SCRATCH_JANITOR_INTERVAL", "300"))  # 0 = au démarrage seulement
+    reference_roots: str = os.getenv("REFERENCE_ROOTS", "")  # répertoires lisibles par /convert/path (vide = désactivé)
+    source_hosts: str = os.getenv("SOURCE_HOSTS", "")  # hôtes lisibles par source_url (vide = désactivé)
+    source_connect_timeout: float = float(os.getenv("SOURCE_CONNECT_TIMEOUT", "5"))
+    source_read_timeout: float = float(os.getenv("SOURCE_READ_TIMEOUT", "30"))  # entre deux blocs reçus
+    source_total_timeout: float = float(os.getenv("SOURCE_TOTAL_TIMEOUT", "120"))
+    source_max_connections: int = int(os.getenv("SOURCE_MAX_CONNECTIONS", "32"))
+    webhook_hosts: str = os.getenv("WEBHOOK_HOSTS", "")  # hôtes pouvant recevoir les rappels (vide = désactivé)
+    webhook_payload: str = os.getenv("WEBHOOK_PAYLOAD", "metadata")  # metadata ou pdf
+    webhook_store_path: str = os.getenv("WEBHOOK_STORE_PATH", os.path.join(temp_dir, "msgtopdf-webhooks", "deliveries.sqlite3"))
+    webhook_max_concurrency: int = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "8"))
+    webhook_max_attempts: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    webhook_backoff_base: float = float(os.getenv("WEBHOOK_BACKOFF_BASE", "1"))
+    webhook_backoff_max: float = float(os.getenv("WEBHOOK_BACKOFF_MAX", "300"))
+    webhook_timeout: float = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+    
+    # Capacity Configuration
+    conversion_workers: int = int(os.getenv("CONVERSION_WORKERS", str(max(os.cpu_count() or 2, 2))))  # ≥ nombre de voies
+    max_concurrent_conversions: int = int(os.getenv("MAX_CONCURRENT_CONVERSIONS", str(conversion_workers)))
+    conversion_lanes: str = os.getenv("CONVERSION_LANES", "interactive=48/0.5,bulk=0/0.5")  # voie=coût_max_MB/part
+    admission_max_queue: int = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))  # par voie
+    admission_queue_timeout: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))  # secondes
+    scheduling_aging: float = float(os.getenv("SCHEDULING_AGING", "1.0"))  # secondes de priorité par seconde d'attente
+    cost_history_size: int = int(os.getenv("COST_HISTORY_SIZE", "500"))
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    rate_limits: str = os.getenv("RATE_LIMITS", "default=60/20/4")  # rôle=par_minute/rafale/simultanées
+    quota_window_seconds: int = int(os.getenv("QUOTA_WINDOW_SECONDS", "3600"))
+    quotas: str = os.getenv("QUOTAS", "default=0/0")  # rôle=secondes_cpu/mégaoctets_produits par fenêtre
+    memory_budget_mb: int = int(os.getenv("MEMORY_BUDGET_MB", "0"))  # 0 = 75% de la limite mémoire
+    readiness_max_queue_depth: int = int(os.getenv("READINESS_MAX_QUEUE_DEPTH", "16"))
+    readiness_min_memory_mb: int = int(os.getenv("READINESS_MIN_MEMORY_MB", "256"))
+    
+    # Event Loop Monitoring
+    loop_monitor_enabled: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    loop_monitor_interval_ms: int = int(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100"))
+    loop_block_threshold_ms: int = int(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "250"))
+    
+    # Resource Accounting
+    resource_history_size: int = int(os.getenv("RESOURCE_HISTORY_SIZE", "1000"))
+    
+    tracemalloc_max_snapshots: int = int(os.getenv("TRACEMALLOC_MAX_SNAPSHOTS", "5"))
+    
+    # Administration
+    admin_role: str = os.getenv("ADMIN_ROLE", "admin")
+    reference_role: str = os.getenv("REFERENCE_ROLE", admin_role)  # rôle requis par /convert/path
+    
+    # Profiling Configuration
+    profile_dir: str = os.getenv("PROFILE_DIR", os.path.join(os.getenv("TEMP_DIR", "/tmp"), "msgtopdf-profiles"))
+    profile_slow_threshold: float = float(os.getenv("PROFILE_SLOW_THRESHOLD", "0"))  # secondes, 0 = désactivé
+    profile_sample_interval_ms: int = int(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))
+    profile_max_files: int = int(os.getenv("PROFILE_MAX_FILES", "100"))
+    sampling_profiler_enabled: bool = os.getenv("SAMPLING_PROFILER_ENABLED", "true").lower() == "true"
+    sampling_profiler_interval_ms: int = int(os.getenv("SAMPLING_PROFILER_INTERVAL_MS", "100"))
     
     # Logging Configuration
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
-    log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_format: str = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s"
+    log_json: bool = os.getenv("LOG_JSON", "false").lower() == "true"  # sortie JSON structurée
+    log_async: bool = os.getenv("LOG_ASYNC", "false").lower() == "true"  # écriture via un thread d'écoute
+    
+    # Loki Configuration (envoi des logs par lots, désactivé si LOKI_URL est vide)
+    loki_url: str = os.getenv("LOKI_URL", "")
+    loki_labels: str = os.getenv("LOKI_LABELS", "app=msgtopdf")
+    loki_batch_size: int = int(os.getenv("LOKI_BATCH_SIZE", "500"))
+    loki_flush_interval_ms: int = int(os.getenv("LOKI_FLUSH_INTERVAL_MS", "1000"))
+    loki_buffer_size: int = int(os.getenv("LOKI_BUFFER_SIZE", "10000"))
+    loki_overflow_policy: str = os.getenv("LOKI_OVERFLOW_POLICY", "drop_newest")  # ou drop_oldest
+    loki_sample_rate: int = int(os.getenv("LOKI_SAMPLE_RATE", "10"))  # 1 = pas d'échantillonnage
+    loki_timeout: float = float(os.getenv("LOKI_TIMEOUT", "5"))
     
     class Config:
         env_file = ".env"
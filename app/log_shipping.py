@@ -0,0 +1,243 @@
+"""
+Envoi des logs vers Loki par lots, depuis un thread d'arrière-plan
+
+Le handler se contente d'ajouter la ligne formatée à un tampon borné ; un
+thread dédié regroupe les lignes par flux (labels), compresse le lot en gzip
+et le pousse sur l'API `/loki/api/v1/push`. Un backend lent ou indisponible
+ne ralentit donc jamais les conversions : le tampon se remplit et la
+politique de débordement s'applique.
+
+Politique de débordement :
+- au-delà de la moitié du tampon, seul un enregistrement sur `sample_rate`
+  de niveau inférieur à WARNING est conservé (échantillonnage)
+- tampon plein : `drop_newest` rejette l'enregistrement entrant,
+  `drop_oldest` éjecte le plus ancien
+- un lot refusé par le backend est abandonné (pas de renvoi), le thread
+  espaçant ensuite ses envois
+
+Seul le thread d'envoi utilise la session HTTP : flush() lui demande de vider
+le tampon et attend qu'il l'ait fait ; close() ne pousse le reste depuis le
+thread appelant qu'une fois le thread d'envoi terminé.
+
+python-logging-loki n'est pas utilisé : son handler pousse chaque
+enregistrement dans une requête distincte, sans lot ni compression.
+"""
+import gzip
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from app.metrics import counter, gauge
+
+PUSH_PATH = "/loki/api/v1/push"
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest")
+MAX_BACKOFF = 30.0
+
+# Handlers actifs, pour la jauge de remplissage du tampon
+_handlers: "weakref.WeakSet[LokiHandler]" = weakref.WeakSet()
+
+LOG_RECORDS_SHIPPED = counter(
+    "msgtopdf_log_records_shipped_total",
+    "Enregistrements de log envoyés à Loki"
+)
+LOG_RECORDS_DROPPED = counter(
+    "msgtopdf_log_records_dropped_total",
+    "Enregistrements de log non envoyés à Loki",
+    labelnames=("reason",)
+)
+LOG_BATCHES = counter(
+    "msgtopdf_log_batches_total",
+    "Lots de logs poussés vers Loki par résultat",
+    labelnames=("outcome",)
+)
+
+
+def parse_labels(value: str) -> Dict[str, str]:
+    """Parse des labels au format "clé=valeur,clé=valeur" """
+    labels = {}
+    for pair in value.split(","):
+        key, sep, label = pair.partition("=")
+        if sep and key.strip():
+            labels[key.strip()] = label.strip()
+    return labels
+
+
+class LokiHandler(logging.Handler):
+    """Handler de logs bufferisé poussant des lots compressés vers Loki"""
+
+    def __init__(self, url: str, labels: Dict[str, str] = None, batch_size: int = 500,
+                 flush_interval: float = 1.0, buffer_size: int = 10000,
+                 overflow_policy: str = "drop_newest", sample_rate: int = 10, timeout: float = 5.0):
+        super().__init__()
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Politique de débordement non supportée: {overflow_policy}")
+        self.url = url if "/loki/api/" in url else url.rstrip("/") + PUSH_PATH
+        self.labels = labels or {}
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.buffer_size = max(1, buffer_size)
+        self.overflow_policy = overflow_policy
+        self.sample_rate = max(1, sample_rate)
+        self.timeout = timeout
+        self._buffer: Deque[Tuple[int, str, str]] = deque()
+        self._buffer_lock = threading.Lock()
+        self._sampled = 0
+        self._flush_waiters: List[threading.Event] = []
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._run, name="loki-shipper", daemon=True)
+        self._thread.start()
+        _handlers.add(self)
+
+    @property
+    def buffered(self) -> int:
+        """Nombre d'enregistrements en attente d'envoi"""
+        return len(self._buffer)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Ajoute l'enregistrement au tampon (jamais bloquant sur le réseau)"""
+        # Les logs du module lui-même ne sont pas renvoyés vers Loki
+        if record.name == __name__:
+            return
+        if record.levelno < logging.WARNING and not self._keep_sample():
+            LOG_RECORDS_DROPPED.inc(reason="sampled")
+            return
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        entry = (int(record.created * 1e9), record.levelname.lower(), line)
+
+        with self._buffer_lock:
+            if len(self._buffer) >= self.buffer_size:
+                LOG_RECORDS_DROPPED.inc(reason="overflow")
+                if self.overflow_policy == "drop_newest":
+                    return
+                self._buffer.popleft()
+            self._buffer.append(entry)
+            full_batch = len(self._buffer) >= self.batch_size
+        if full_batch:
+            self._wakeup.set()
+
+    def _keep_sample(self) -> bool:
+        """Échantillonnage des niveaux inférieurs à WARNING quand le tampon se remplit"""
+        if self.sample_rate == 1 or len(self._buffer) < self.buffer_size // 2:
+            return True
+        with self._buffer_lock:
+            self._sampled += 1
+            return self._sampled % self.sample_rate == 0
+
+    def _take_batch(self) -> List[Tuple[int, str, str]]:
+        """Retire un lot du tampon"""
+        with self._buffer_lock:
+            count = min(len(self._buffer), self.batch_size)
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _payload(self, batch: List[Tuple[int, str, str]]) -> bytes:
+        """Corps de la requête push (un flux par niveau), compressé en gzip"""
+        streams: Dict[str, List[List[str]]] = {}
+        for timestamp, level, line in batch:
+            streams.setdefault(level, []).append([str(timestamp), line])
+        body = {
+            "streams": [
+                {"stream": {**self.labels, "level": level}, "values": values}
+                for level, values in streams.items()
+            ]
+        }
+        return gzip.compress(json.dumps(body, ensure_ascii=False).encode("utf-8"))
+
+    def _push(self, batch: List[Tuple[int, str, str]]) -> bool:
+        """Pousse un lot vers Loki, retourne True en cas de succès"""
+        try:
+            response = self._session.post(
+                self.url,
+                data=self._payload(batch),
+                headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            LOG_BATCHES.inc(outcome="failed")
+            LOG_RECORDS_DROPPED.inc(len(batch), reason="push_failed")
+            logging.getLogger(__name__).debug("Envoi du lot de logs vers Loki échoué: %s", e)
+            return False
+        LOG_BATCHES.inc(outcome="success")
+        LOG_RECORDS_SHIPPED.inc(len(batch))
+        return True
+
+    def _run(self) -> None:
+        """Boucle d'envoi (thread démon)"""
+        backoff = 0.0
+        while not self._stop.is_set():
+            if backoff:
+                self._wait_backoff(backoff)
+            else:
+                self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self._buffer_lock:
+                waiters, self._flush_waiters = self._flush_waiters, []
+            while self._buffer and not self._stop.is_set():
+                if self._push(self._take_batch()):
+                    backoff = 0.0
+                else:
+                    # Envois espacés tant que le backend échoue, le tampon absorbe
+                    backoff = min(max(backoff * 2, self.flush_interval), MAX_BACKOFF)
+                    break
+                # Hors flush demandé, un lot incomplet attend le prochain intervalle
+                if not waiters and len(self._buffer) < self.batch_size:
+                    break
+            for waiter in waiters:
+                waiter.set()
+        with self._buffer_lock:
+            waiters, self._flush_waiters = self._flush_waiters, []
+        for waiter in waiters:
+            waiter.set()
+
+    def _wait_backoff(self, backoff: float) -> None:
+        """Attente du backoff : les lots complets ne l'écourtent pas, un flush ou l'arrêt si"""
+        deadline = time.monotonic() + backoff
+        while not self._stop.is_set() and not self._flush_waiters:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._wakeup.wait(remaining)
+            self._wakeup.clear()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Demande au thread d'envoi de vider le tampon et attend qu'il l'ait fait"""
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        with self._buffer_lock:
+            self._flush_waiters.append(done)
+        self._wakeup.set()
+        done.wait(self.timeout if timeout is None else timeout)
+
+    def close(self) -> None:
+        """Arrête le thread d'envoi puis pousse les derniers enregistrements"""
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.timeout + 1)
+        # Thread d'envoi terminé : la session n'est plus utilisée que par l'appelant
+        if not self._thread.is_alive():
+            deadline = time.monotonic() + self.timeout
+            while self._buffer and time.monotonic() < deadline:
+                if not self._push(self._take_batch()):
+                    break
+        self._session.close()
+        super().close()
+
+
+gauge(
+    "msgtopdf_log_buffer_records",
+    "Enregistrements de log en attente d'envoi vers Loki",
+    function=lambda: sum(handler.buffered for handler in list(_handlers))
+)
@@ -1,11 +1,59 @@
 """
 Configuration du système de logging
+
+Deux options indépendantes (voir app.config) :
+- LOG_JSON : sortie JSON structurée (une ligne par enregistrement)
+- LOG_ASYNC : les handlers s'exécutent dans un thread d'écoute alimenté par une
+  file ; l'appelant ne fait qu'empiler l'enregistrement, le message n'est
+  formaté qu'au moment de son écriture
+- LOKI_URL : envoi complémentaire des logs (JSON) vers Loki, par lots
+  depuis un thread d'arrière-plan (voir app.log_shipping)
+
+L'identifiant de requête est porté par une variable de contexte (propagée aux
+workers de conversion) et ajouté à chaque enregistrement par un filtre.
 """
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
 import sys
-from typing import Dict, Any
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
 from app.config import settings
 
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_listener: Optional[logging.handlers.QueueListener] = None
+_shipper: Optional[logging.Handler] = None
+
+# Attributs standard d'un LogRecord (tout autre attribut provient de `extra`)
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+
+def set_request_id(request_id: Optional[str]) -> contextvars.Token:
+    """Associe un identifiant de requête au contexte courant"""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token: contextvars.Token) -> None:
+    """Restaure l'identifiant de requête précédent"""
+    _request_id.reset(token)
+
+
+def get_request_id() -> Optional[str]:
+    """Identifiant de la requête en cours (None hors requête)"""
+    return _request_id.get()
+
+
+class RequestContextFilter(logging.Filter):
+    """Ajoute l'identifiant de requête du contexte courant aux enregistrements"""
+
+    def filter(self, record):
+        if getattr(record, "request_id", None) is None:
+            record.request_id = _request_id.get() or "-"
+        return True
+
 
 class ColoredFormatter(logging.Formatter):
     """Formatter avec couleurs pour les logs"""
@@ -20,9 +68,58 @@ class ColoredFormatter(logging.Formatter):
     }
     
     def format(self, record):
-        log_color = self.COLORS.get(record.levelname, self.COLORS['RESET'])
-        record.levelname = f"{log_color}{record.levelname}{self.COLORS['RESET']}"
-        return super().format(record)
+        # Le niveau coloré n'est appliqué que le temps du formatage : l'enregistrement
+        # est partagé avec les autres handlers
+        levelname = record.levelname
+        log_color = self.COLORS.get(levelname, self.COLORS['RESET'])
+        record.levelname = f"{log_color}{levelname}{self.COLORS['RESET']}"
+        try:
+            return super().format(record)
+        finally:
+            record.levelname = levelname
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatter JSON : une ligne par enregistrement, champs `extra` inclus"""
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None) or _request_id.get(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler qui transmet l'enregistrement sans le formater
+
+    Le QueueHandler standard formate le message dans le thread appelant ; ici le
+    formatage est laissé au handler final, dans le thread d'écoute. Les arguments
+    du message doivent donc ne pas être modifiés après l'appel de log.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _build_formatter() -> logging.Formatter:
+    """Formatter de sortie selon la configuration"""
+    if settings.log_json:
+        return JsonFormatter()
+    return ColoredFormatter(settings.log_format)
 
 
 def setup_logging() -> None:
@@ -33,24 +130,70 @@ def setup_logging() -> None:
     logger.setLevel(getattr(logging, settings.log_level.upper()))
     
     # Supprime les handlers existants
+    shutdown_logging()
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
     
     # Handler pour la console
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(getattr(logging, settings.log_level.upper()))
+    console_handler.setFormatter(_build_formatter())
+    handlers = [console_handler]
     
-    # Formatter avec couleurs
-    formatter = ColoredFormatter(settings.log_format)
-    console_handler.setFormatter(formatter)
+    if settings.loki_url:
+        from app.log_shipping import LokiHandler, parse_labels
+        
+        global _shipper
+        _shipper = LokiHandler(
+            settings.loki_url,
+            labels=parse_labels(settings.loki_labels),
+            batch_size=settings.loki_batch_size,
+            flush_interval=settings.loki_flush_interval_ms / 1000,
+            buffer_size=settings.loki_buffer_size,
+            overflow_policy=settings.loki_overflow_policy,
+            sample_rate=settings.loki_sample_rate,
+            timeout=settings.loki_timeout
+        )
+        _shipper.setLevel(getattr(logging, settings.log_level.upper()))
+        _shipper.setFormatter(JsonFormatter())
+        handlers.append(_shipper)
     
-    logger.addHandler(console_handler)
+    if settings.log_async:
+        # Le filtre s'exécute dans le thread appelant, où le contexte de requête est visible
+        queue_handler = LazyQueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(RequestContextFilter())
+        logger.addHandler(queue_handler)
+        
+        global _listener
+        _listener = logging.handlers.QueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+    else:
+        for handler in handlers:
+            handler.addFilter(RequestContextFilter())
+            logger.addHandler(handler)
     
     # Configuration des loggers spécifiques
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
     logging.getLogger("uvicorn.error").setLevel(logging.INFO)
 
 
+def shutdown_logging() -> None:
+    """Arrête le thread d'écoute en vidant la file, puis l'envoi vers Loki"""
+    global _listener, _shipper
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _shipper is not None:
+        logging.getLogger().removeHandler(_shipper)
+        _shipper.close()
+        _shipper = None
+
+
+atexit.register(shutdown_logging)
+
+
 def get_logger(name: str) -> logging.Logger:
     """Retourne un logger configuré"""
     return logging.getLogger(name)
@@ -60,24 +203,47 @@ def log_request_info(request_id: str, endpoint: str, method: str, user_id: str =
     """Log les informations de requête"""
     logger = get_logger("api.request")
     logger.info(
-        f"Request [{request_id}] - {method} {endpoint} - User: {user_id or 'Anonymous'}"
+        "Request - %s %s - User: %s", method, endpoint, user_id or "Anonymous",
+        extra={"request_id": request_id, "endpoint": endpoint, "method": method, "user_id": user_id}
     )
 
 
-def log_conversion_info(request_id: str, filename: str, file_size: int, processing_time: float) -> None:
-    """Log les informations de conversion"""
+def log_conversion_info(request_id: str, filename: str, file_size: int, processing_time: float,
+                        resources: Dict[str, Any] = None) -> None:
+    """Log les informations de conversion (et les ressources consommées si disponibles)"""
     logger = get_logger("api.conversion")
-    logger.info(
-        f"Conversion [{request_id}] - File: {filename} ({file_size} bytes) - "
-        f"Processing time: {processing_time:.2f}s"
-    )
+    extra = {
+        "request_id": request_id,
+        "file_name": filename,
+        "file_size": file_size,
+        "processing_time": processing_time,
+    }
+    if resources:
+        extra["cpu_time"] = resources["cpu_time"]
+        extra["peak_rss_growth"] = resources["peak_rss_growth"]
+        logger.info(
+            "Conversion - File: %s (%s bytes) - Processing time: %.2fs - CPU: %.2fs - Peak RSS growth: %.1f MB",
+            filename, file_size, processing_time, resources["cpu_time"],
+            resources["peak_rss_growth"] / (1024 * 1024), extra=extra
+        )
+    else:
+        logger.info(
+            "Conversion - File: %s (%s bytes) - Processing time: %.2fs",
+            filename, file_size, processing_time, extra=extra
+        )
 
 
-def log_error(request_id: str, error: Exception, context: Dict[str, Any] = None) -> None:
-    """Log les erreurs avec contexte"""
+def log_error(request_id: str, error: Exception, context: Dict[str, Any] = None, expected: bool = False) -> None:
+    """
+    Log les erreurs avec contexte
+
+    Les erreurs attendues (validation de la requête, refus métier) sont journalisées
+    sans capture de la trace d'appel.
+    """
     logger = get_logger("api.error")
-    context_str = f" - Context: {context}" if context else ""
+    args = (type(error).__name__, error) + ((context,) if context else ())
     logger.error(
-        f"Error [{request_id}] - {type(error).__name__}: {str(error)}{context_str}",
-        exc_info=True
-    )
\ No newline at end of file
+        "Error - %s: %s - Context: %s" if context else "Error - %s: %s", *args,
+        exc_info=not expected,
+        extra={"request_id": request_id, "error_type": type(error).__name__, "context": context}
+    )
@@ -0,0 +1,118 @@
+"""
+Surveillance de la boucle d'événements : latence d'ordonnancement et appels bloquants
+
+Une tâche asyncio se réveille à intervalle régulier et mesure son retard par
+rapport à l'heure prévue (latence de la boucle). Un thread de surveillance
+vérifie que ces battements continuent : si la boucle ne bat plus depuis plus
+que le seuil configuré, la pile du thread de la boucle est journalisée, ce qui
+désigne directement l'appel synchrone qui la bloque.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from app.config import settings
+from app.logging_config import get_logger
+from app.metrics import counter, gauge, histogram
+
+logger = get_logger(__name__)
+
+LOOP_LAG = histogram(
+    "msgtopdf_event_loop_lag_seconds",
+    "Retard d'ordonnancement de la boucle d'événements",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_BLOCKED = counter(
+    "msgtopdf_event_loop_blocked_total",
+    "Blocages de la boucle d'événements au-delà du seuil"
+)
+
+
+class EventLoopMonitor:
+    """Mesure de la latence de la boucle et détection des appels bloquants"""
+
+    def __init__(self, interval: float, block_threshold: float):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.last_lag = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._reported_beat: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        """Indique si la surveillance est active"""
+        return self._task is not None and not self._task.done() and not self._task.get_loop().is_closed()
+
+    def start(self) -> None:
+        """Démarre la surveillance (à appeler depuis la boucle d'événements)"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            "Surveillance de la boucle démarrée (intervalle %.0f ms, seuil de blocage %.0f ms)",
+            self.interval * 1000, self.block_threshold * 1000
+        )
+
+    async def stop(self) -> None:
+        """Arrête la surveillance"""
+        self._stop.set()
+        task, self._task = self._task, None
+        self._watchdog = None
+        if task is None or task.done() or task.get_loop().is_closed():
+            return
+        task.cancel()
+        if task.get_loop() is asyncio.get_running_loop():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self) -> None:
+        """Battement périodique mesurant le retard de réveil"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            self.last_lag = lag
+            self._last_beat = time.monotonic()
+            LOOP_LAG.observe(lag)
+
+    def _watch(self) -> None:
+        """Thread de surveillance : journalise la pile de la boucle si elle est bloquée"""
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.block_threshold or self._reported_beat == beat:
+                continue
+            # Un seul rapport par blocage
+            self._reported_beat = beat
+            LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<pile indisponible>"
+            logger.warning(
+                "🐌 Boucle d'événements bloquée depuis %.0f ms, appel en cours:\n%s", blocked_for * 1000, stack
+            )
+
+
+loop_monitor = EventLoopMonitor(
+    settings.loop_monitor_interval_ms / 1000,
+    settings.loop_block_threshold_ms / 1000
+)
+gauge(
+    "msgtopdf_event_loop_last_lag_seconds",
+    "Dernier retard d'ordonnancement mesuré",
+    function=lambda: loop_monitor.last_lag
+)
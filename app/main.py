@@ -1,24 +1,61 @@
 """
 Application FastAPI principale
 """
-import os
+import sqlite3
 import tempfile
 import uuid
 import time
+from contextlib import AsyncExitStack
 from datetime import datetime
-from typing import Dict, Any
+from typing import AsyncIterator, Callable, Dict, Any, Optional, Tuple
 from pathlib import Path
 
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, status, Form
-from fastapi.responses import Response
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, status, Form, Header, Query, Request
+from fastapi.responses import Response, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
-from app.logging_config import setup_logging, get_logger, log_request_info, log_conversion_info, log_error
-from app.auth import get_current_user, get_user_id, JWTError
-from app.models import ConversionResponse, ErrorResponse, HealthResponse, UserInfo
+from app.logging_config import (
+    setup_logging, get_logger, log_request_info, log_conversion_info, log_error, set_request_id, get_request_id
+)
+from app.auth import get_current_user, get_user_id, get_user_roles, get_jwks_cache_age, is_admin, JWTError
+from app.models import (
+    ConversionAcceptedResponse, ConversionResponse, ConversionResult, CostEstimateResponse, ErrorResponse,
+    HealthResponse, LivenessResponse, PathConversionRequest, PathConversionResponse, ReadinessResponse, UserInfo,
+    WebhookPayload
+)
 from app.services.msg_converter import MSGConverter, MSGConversionError, UnauthorizedAttachmentError
+from app.services.capacity import ConversionPool, default_memory_budget, read_memory_status
+from app.services.admission import AdmissionController, AdmissionRejectedError
+from app.services.cost_estimator import CostEstimate, CostModel
+from app.services.lanes import LANE_ROUTED, check_capacity, parse_lanes, select_lane, split_capacity
+from app.services.manifest import MessageManifest, read_manifest
+from app.services.ingest import (
+    RAW_MSG_CONTENT_TYPE, RAW_MSG_DEFAULT_FILENAME, IngestedUpload, InvalidUploadError, UploadTooLargeError,
+    ingest_upload, iter_upload_file
+)
+from app.services.references import (
+    OutputExistsError, ReferenceNotAllowedError, ReferenceNotFoundError, map_reference, output_beside, parse_roots,
+    resolve_reference, write_beside
+)
+from app.services.source_fetch import (
+    SourceFetchError, SourceFetcher, SourceNotAllowedError, parse_hosts, source_filename
+)
+from app.services.webhooks import CallbackNotAllowedError, DeliveryStore, WebhookDispatcher
+from app.services.scratch import ScratchSpace
+from app.services.rate_limiting import RateLimiter, parse_policies, policy_for_roles
+from app.services.quotas import parse_quotas, quota_for_roles, usage_ledger
+from app.metrics import (
+    BYTES_SENT, CONVERSIONS, CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    counter, gauge, get_request_timings, observe_request_resources, observe_stage, render_metrics
+)
+from app.resource_usage import summarize, usage_store
+from app.loop_monitor import loop_monitor
+from app.middleware import BodySizeLimitMiddleware, GzipRequestMiddleware, RequestTimingMiddleware
+from app.profiling import RequestProfiler, sampling_profiler
+from app import admin
 
 # Configuration du logging
 setup_logging()
@@ -48,30 +85,156 @@ app.add_middleware(
     allowed_hosts=["*"]  # À configurer selon vos besoins
 )
 
+# Endpoints d'administration
+app.include_router(admin.router)
+
+# Mesure des étapes des requêtes de conversion (Server-Timing, écriture de la réponse)
+app.add_middleware(RequestTimingMiddleware)
+
+# Décompression des envois gzip, limite appliquée aux octets décompressés
+if settings.request_decompression:
+    app.add_middleware(GzipRequestMiddleware, max_body_size=settings.max_file_size + settings.multipart_overhead)
+
+# Refus des envois trop volumineux dès l'en-tête Content-Length ou au fil de la réception
+app.add_middleware(BodySizeLimitMiddleware, max_body_size=settings.max_file_size + settings.multipart_overhead)
+
 # Instance du convertisseur
 converter = MSGConverter()
 
+# Voies de conversion selon le coût estimé, chacune avec sa part des workers
+conversion_lanes = parse_lanes(settings.conversion_lanes)
+
+# Répertoires lisibles par la conversion par référence
+reference_roots = parse_roots(settings.reference_roots)
+
+# Récupération des fichiers par URL, connexions partagées entre les requêtes
+source_fetcher = SourceFetcher(
+    parse_hosts(settings.source_hosts),
+    settings.max_file_size,
+    connect_timeout=settings.source_connect_timeout,
+    read_timeout=settings.source_read_timeout,
+    total_timeout=settings.source_total_timeout,
+    max_connections=settings.source_max_connections
+)
+
+# Livraison des résultats des conversions asynchrones (webhooks)
+webhook_dispatcher = WebhookDispatcher(
+    DeliveryStore(settings.webhook_store_path),
+    parse_hosts(settings.webhook_hosts),
+    max_concurrency=settings.webhook_max_concurrency,
+    max_attempts=settings.webhook_max_attempts,
+    backoff_base=settings.webhook_backoff_base,
+    backoff_max=settings.webhook_backoff_max,
+    timeout=settings.webhook_timeout
+)
+
+# Espace de travail temporaire des conversions, nettoyé des orphelins
+scratch_space = ScratchSpace(
+    settings.temp_dir,
+    max_age=settings.scratch_max_age,
+    janitor_interval=settings.scratch_janitor_interval
+)
+
+# Pool de workers de conversion (hors de la boucle d'événements)
+conversion_pool = ConversionPool(
+    settings.conversion_workers,
+    lanes=split_capacity(conversion_lanes, settings.conversion_workers)
+)
+
+gauge("msgtopdf_conversion_queue_depth", "Conversions en attente d'un worker",
+      function=lambda: conversion_pool.queue_depth)
+gauge("msgtopdf_conversion_busy_workers", "Workers de conversion occupés",
+      function=lambda: conversion_pool.busy_workers)
+gauge("msgtopdf_webhook_deliveries_in_flight", "Livraisons de webhooks en cours",
+      function=lambda: webhook_dispatcher.in_flight)
+gauge("msgtopdf_scratch_active", "Espaces de travail temporaires en cours d'utilisation",
+      function=lambda: scratch_space.active)
+gauge("msgtopdf_scratch_free_bytes", "Espace libre du répertoire temporaire",
+      function=lambda: scratch_space.free_bytes())
+
+# Contrôle d'admission en amont du pool : concurrence, mémoire réservée et file d'attente bornées par voie
+admission_lanes = split_capacity(conversion_lanes, settings.max_concurrent_conversions)
+admission_controller = AdmissionController(
+    sum(admission_lanes.values()),
+    settings.admission_max_queue,
+    settings.admission_queue_timeout,
+    memory_budget=default_memory_budget(settings.memory_budget_mb),
+    min_free_memory=settings.readiness_min_memory_mb * 1024 * 1024,
+    lanes=admission_lanes,
+    aging=settings.scheduling_aging
+)
+
+# Estimation du temps et de la mémoire des conversions, calibrée sur les conversions mesurées
+cost_model = CostModel(settings.cost_history_size)
+
+gauge("msgtopdf_admission_active", "Conversions admises en cours",
+      function=lambda: admission_controller.active)
+gauge("msgtopdf_admission_queued", "Requêtes en attente d'admission",
+      function=lambda: admission_controller.queued)
+gauge("msgtopdf_admission_reserved_memory_bytes", "Mémoire réservée par les conversions admises",
+      function=lambda: admission_controller.reserved_memory)
+
+# Limites de débit et de concurrence par utilisateur (sujet JWT), selon ses rôles
+rate_limiter = RateLimiter()
+rate_limit_policies = parse_policies(settings.rate_limits)
+quota_policies = parse_quotas(settings.quotas)
+RATE_LIMITED = counter("msgtopdf_rate_limited_total", "Requêtes refusées par la limitation de débit ou les quotas",
+                       labelnames=("reason",))
+
+# État du processus pour les sondes
+started_at = time.time()
+draining = False
+
 
 @app.on_event("startup")
 async def startup_event():
     """Événement de démarrage de l'application"""
+    # Au moins une place par voie de conversion, sinon refus de démarrer
+    try:
+        check_capacity(conversion_lanes, {
+            "CONVERSION_WORKERS": settings.conversion_workers,
+            "MAX_CONCURRENT_CONVERSIONS": settings.max_concurrent_conversions
+        })
+    except ValueError as e:
+        logger.critical("❌ Configuration invalide: %s", e)
+        raise
+    
     logger.info("🚀 Démarrage de l'API MSG to PDF Converter")
-    logger.info(f"Version: {settings.api_version}")
-    logger.info(f"JWKS URL: {settings.jwks_url}")
+    logger.info("Version: %s", settings.api_version)
+    logger.info("JWKS URL: %s", settings.jwks_url)
+    
+    if settings.sampling_profiler_enabled:
+        sampling_profiler.start()
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    if settings.webhook_hosts:
+        webhook_dispatcher.start()
+    await scratch_space.start()
+    # Fichiers temporaires des bibliothèques (envois multipart mis en tampon sur
+    # disque par python-multipart) sous TEMP_DIR, balayés par le nettoyeur
+    tempfile.tempdir = str(scratch_space.root)
     
     # Vérification de la connectivité JWKS au démarrage
     try:
         from app.auth import get_jwks
-        get_jwks()
+        # Récupération des clés (réseau) hors de la boucle d'événements, déjà surveillée
+        await run_in_threadpool(get_jwks)
         logger.info("✅ Connexion JWKS vérifiée")
     except Exception as e:
-        logger.warning(f"⚠️ Problème de connexion JWKS: {e}")
+        logger.warning("⚠️ Problème de connexion JWKS: %s", e)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Événement d'arrêt de l'application"""
+    global draining
+    draining = True
     logger.info("🛑 Arrêt de l'API MSG to PDF Converter")
+    sampling_profiler.stop()
+    await loop_monitor.stop()
+    await source_fetcher.close()
+    await webhook_dispatcher.stop()
+    await scratch_space.stop()
 
 
 @app.get("/health", response_model=HealthResponse, tags=["Health"])
@@ -80,7 +243,8 @@ async def health_check():
     jwks_status = "ok"
     try:
         from app.auth import get_jwks
-        get_jwks()
+        # Récupération éventuelle des clés (réseau) hors de la boucle d'événements
+        await run_in_threadpool(get_jwks)
     except Exception:
         jwks_status = "error"
     
@@ -91,6 +255,70 @@ async def health_check():
     )
 
 
+@app.get("/health/live", response_model=LivenessResponse, tags=["Health"])
+async def liveness_probe():
+    """Sonde de vivacité : répond tant que la boucle d'événements tourne, sans aucune E/S"""
+    return LivenessResponse(status="alive", uptime=time.time() - started_at)
+
+
+def _lane_status() -> Dict[str, Dict[str, int]]:
+    """Admission et workers de chaque voie de conversion"""
+    pool_lanes = conversion_pool.lane_status()
+    admission_lanes = admission_controller.lane_status()
+    return {
+        lane.name: {**admission_lanes.get(lane.name, {}), **pool_lanes.get(lane.name, {})}
+        for lane in conversion_lanes
+    }
+
+
+@app.get("/health/ready", response_model=ReadinessResponse, tags=["Health"],
+         responses={503: {"model": ReadinessResponse}})
+async def readiness_probe():
+    """
+    Sonde de disponibilité avec indicateurs de capacité
+    
+    N'effectue aucun appel réseau : les indicateurs proviennent des compteurs
+    du contrôle d'admission et du pool de conversion, de l'état du cache JWKS et de /proc ou /sys/fs/cgroup.
+    Retourne 503 si l'instance est en arrêt, saturée ou à court de mémoire.
+    """
+    memory = read_memory_status()
+    queue_depth = admission_controller.queued + conversion_pool.queue_depth
+    reasons = []
+    
+    if draining:
+        reasons.append("shutting_down")
+    if queue_depth > settings.readiness_max_queue_depth:
+        reasons.append("queue_full")
+    if memory.headroom is not None and memory.headroom < settings.readiness_min_memory_mb * 1024 * 1024:
+        reasons.append("low_memory")
+    
+    readiness = ReadinessResponse(
+        status="not_ready" if reasons else "ready",
+        reasons=reasons,
+        queue_depth=queue_depth,
+        busy_workers=conversion_pool.busy_workers,
+        max_workers=conversion_pool.max_workers,
+        jwks_cache_age=get_jwks_cache_age(),
+        memory_limit=memory.limit,
+        memory_used=memory.used,
+        memory_headroom=memory.headroom,
+        memory_reserved=admission_controller.reserved_memory,
+        memory_budget=admission_controller.memory_budget,
+        lanes=_lane_status()
+    )
+    
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE if reasons else status.HTTP_200_OK,
+        content=readiness.model_dump(mode="json")
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Health"])
+async def metrics():
+    """Métriques du pipeline de conversion au format d'exposition Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/user/info", response_model=UserInfo, tags=["User"])
 async def get_user_info(current_user: Dict[str, Any] = Depends(get_current_user)):
     """Récupère les informations de l'utilisateur connecté"""
@@ -104,151 +332,680 @@ async def get_user_info(current_user: Dict[str, Any] = Depends(get_current_user)
     )
 
 
+async def rate_limited_user(request: Request, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Dépendance appliquant les quotas, limites de débit et de concurrence de l'utilisateur
+    
+    La décision est conservée dans `request.state.rate_limit` pour les en-têtes de réponse.
+    """
+    user_id = get_user_id(current_user)
+    roles = get_user_roles(current_user)
+    
+    # Quotas sur le coût réel (CPU, octets produits) de la fenêtre glissante
+    retry_after = usage_ledger.retry_after(user_id, quota_for_roles(quota_policies, roles))
+    if retry_after is not None:
+        RATE_LIMITED.inc(reason="quota")
+        logger.warning("🚫 Quota de conversion atteint pour l'utilisateur: %s", user_id)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Quota de conversion atteint pour cet utilisateur",
+            headers={"Retry-After": str(retry_after)}
+        )
+    
+    if not settings.rate_limit_enabled:
+        yield current_user
+        return
+    
+    policy = policy_for_roles(rate_limit_policies, roles)
+    decision = rate_limiter.acquire(user_id, policy)
+    request.state.rate_limit = decision
+    if not decision.allowed:
+        RATE_LIMITED.inc(reason=decision.reason)
+        logger.warning("🚫 Limite atteinte (%s) pour l'utilisateur: %s", decision.reason, user_id)
+        detail = (
+            "Trop de conversions simultanées pour cet utilisateur" if decision.reason == "concurrency"
+            else "Limite de débit atteinte pour cet utilisateur"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers=decision.headers()
+        )
+    try:
+        yield current_user
+    finally:
+        rate_limiter.release(user_id)
+
+
+def _timed(func: Callable[..., Any], *args) -> Tuple[Any, float]:
+    """Exécute une fonction et mesure sa seule durée d'exécution (attente d'un worker exclue)"""
+    start = time.monotonic()
+    return func(*args), time.monotonic() - start
+
+
+def _run_conversion(temp_file_path: str, request_id: str, strict_mode: bool, merge_attachments: bool,
+                    spill_dir: Optional[str] = None) -> Tuple[bytes, int]:
+    """
+    Conversion puis fusion éventuelle (exécutée dans un worker du pool)
+    
+    Les pièces jointes volumineuses sont déversées dans spill_dir, l'espace de travail de la requête.
+    
+    Returns:
+        Tuple contenant (PDF final, nombre de pièces jointes fusionnées)
+    """
+    main_pdf, attachment_pdfs = converter.convert_msg_to_pdf(
+        temp_file_path, request_id, strict_mode, spill_dir=spill_dir
+    )
+    
+    logger.info("📧 PDF principal créé: %s bytes", len(main_pdf))
+    logger.info("📎 Pièces jointes PDF trouvées: %s", len(attachment_pdfs))
+    
+    # Fusion si demandée
+    if not merge_attachments:
+        logger.info("⏭️ Fusion désactivée par l'utilisateur")
+        return main_pdf, 0
+    
+    if not attachment_pdfs:
+        logger.info("❌ Aucune pièce jointe PDF à fusionner")
+        return main_pdf, 0
+    
+    logger.info("🔄 Fusion de %s PDF(s) avec le mail principal...", len(attachment_pdfs))
+    final_pdf = converter.merge_pdfs(main_pdf, attachment_pdfs, request_id)
+    logger.info("✅ Fusion terminée: %s bytes au total", len(final_pdf))
+    return final_pdf, len(attachment_pdfs)
+
+
+def _validate_filename(request_id: str, filename: Optional[str]) -> None:
+    """Refuse un nom de fichier absent ou sans extension .msg (400)"""
+    if not filename:
+        error_msg = "Nom de fichier manquant"
+        log_error(request_id, ValueError(error_msg), expected=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_msg
+        )
+    
+    if not filename.lower().endswith('.msg'):
+        error_msg = f"Type de fichier non supporté: {filename}. Seuls les fichiers .msg sont acceptés."
+        log_error(request_id, ValueError(error_msg), expected=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_msg
+        )
+
+
+async def _ingest(request_id: str, filename: str, chunks: AsyncIterator[bytes]) -> IngestedUpload:
+    """Réception en un passage : signature OLE, taille et empreinte SHA-256"""
+    try:
+        with observe_stage("upload_read"):
+            return await ingest_upload(chunks, settings.max_file_size)
+    except InvalidUploadError as e:
+        log_error(request_id, e, {"filename": filename}, expected=True)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except UploadTooLargeError as e:
+        log_error(request_id, e, {"filename": filename}, expected=True)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+
+async def _fetch_source(request_id: str, url: str, filename: str) -> IngestedUpload:
+    """Récupération d'un fichier .msg par URL, dans le même passage que les envois"""
+    try:
+        source_fetcher.check(url)
+    except SourceNotAllowedError as e:
+        log_error(request_id, e, {"source_url": url}, expected=True)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    _validate_filename(request_id, filename)
+    try:
+        with observe_stage("upload_read"):
+            return await source_fetcher.fetch(url)
+    except SourceFetchError as e:
+        log_error(request_id, e, {"source_url": url}, expected=True)
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT if e.timeout else status.HTTP_502_BAD_GATEWAY,
+            detail=str(e)
+        )
+    except InvalidUploadError as e:
+        log_error(request_id, e, {"source_url": url}, expected=True)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except UploadTooLargeError as e:
+        log_error(request_id, e, {"source_url": url}, expected=True)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+
+def _check_callback(request_id: str, callback_url: Optional[str]) -> None:
+    """Refuse une URL de rappel hors des hôtes autorisés (403)"""
+    if callback_url is None:
+        return
+    try:
+        webhook_dispatcher.check(callback_url)
+    except CallbackNotAllowedError as e:
+        log_error(request_id, e, {"callback_url": callback_url}, expected=True)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+
+
+def _option(query_value, header_value, default):
+    """Option de /convert/raw : paramètre de requête, sinon en-tête, sinon valeur par défaut"""
+    if query_value is not None:
+        return query_value
+    if header_value is not None:
+        return header_value
+    return default
+
+
 @app.post("/convert", response_model=ConversionResponse, tags=["Conversion"])
 async def convert_msg_to_pdf(
-    file: UploadFile = File(..., description="Fichier .msg à convertir"),
+    request: Request,
+    file: Optional[UploadFile] = File(default=None, description="Fichier .msg à convertir"),
+    source_url: Optional[str] = Form(default=None, description="URL du fichier .msg sur un hôte autorisé, à la place de file"),
     merge_attachments: bool = Form(default=True, description="Fusionner les PDFs et images en pièces jointes"),
     strict_mode: bool = Form(default=False, description="Mode strict: refuse la conversion si des pièces jointes non autorisées sont présentes"),
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    dry_run: bool = Form(default=False, description="Retourne le coût estimé sans convertir"),
+    callback_url: Optional[str] = Form(default=None, description="URL de rappel : conversion asynchrone, résultat livré par webhook"),
+    current_user: Dict[str, Any] = Depends(rate_limited_user)
 ):
     """
     Convertit un fichier .msg Outlook en PDF
     
-    - **file**: Fichier .msg à convertir (obligatoire)
+    - **file**: Fichier .msg à convertir
+    - **source_url**: URL du fichier .msg sur un hôte autorisé (`SOURCE_HOSTS`), à la place de file
     - **merge_attachments**: Si True, fusionne les PDFs et images en pièces jointes avec le mail converti
     - **strict_mode**: Si True, refuse la conversion si le message contient des pièces jointes non autorisées
+    - **dry_run**: Si True, retourne le coût estimé (temps, mémoire, voie) sans convertir
+    - **callback_url**: URL d'un hôte autorisé (`WEBHOOK_HOSTS`) : la conversion est acceptée (202)
+      puis poursuivie en arrière-plan, son résultat étant livré par POST à cette URL
     
     **Pièces jointes autorisées :** PDFs et images (JPG, PNG, GIF, BMP, TIFF, WebP)
     
     Retourne le PDF converti avec les métadonnées de conversion.
+    
+    Les administrateurs peuvent profiler la conversion avec l'en-tête `X-Profile: 1`.
     """
     request_id = str(uuid.uuid4())
-    user_id = get_user_id(current_user)
     start_time = time.time()
+    # Identifiant porté par le contexte de la requête, propagé aux workers de conversion
+    set_request_id(request_id)
     
-    log_request_info(request_id, "/convert", "POST", user_id)
+    log_request_info(request_id, "/convert", "POST", get_user_id(current_user))
     
-    # Validation du fichier
-    if not file.filename:
-        error_msg = "Nom de fichier manquant"
-        log_error(request_id, ValueError(error_msg))
+    if (file is None) == (source_url is None):
+        error_msg = "Fournir soit un fichier (file), soit une URL (source_url)"
+        log_error(request_id, ValueError(error_msg), expected=True)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error_msg)
+    _check_callback(request_id, callback_url)
+    
+    if source_url is not None:
+        filename = source_filename(source_url)
+        upload = await _fetch_source(request_id, source_url, filename)
+    else:
+        filename = file.filename
+        _validate_filename(request_id, filename)
+        upload = await _ingest(request_id, filename, iter_upload_file(file))
+    
+    return await _convert_upload(
+        request, current_user, request_id, start_time, filename, upload,
+        merge_attachments, strict_mode, dry_run, callback_url=callback_url
+    )
+
+
+@app.post("/convert/raw", response_model=ConversionResponse, tags=["Conversion"])
+async def convert_raw_msg_to_pdf(
+    request: Request,
+    filename: Optional[str] = Query(default=None, description="Nom du fichier .msg (défaut: message.msg)"),
+    merge_attachments: Optional[bool] = Query(default=None, description="Fusionner les PDFs et images en pièces jointes"),
+    strict_mode: Optional[bool] = Query(default=None, description="Mode strict"),
+    dry_run: Optional[bool] = Query(default=None, description="Retourne le coût estimé sans convertir"),
+    callback_url: Optional[str] = Query(default=None, description="URL de rappel (conversion asynchrone)"),
+    x_filename: Optional[str] = Header(default=None),
+    x_merge_attachments: Optional[bool] = Header(default=None),
+    x_strict_mode: Optional[bool] = Header(default=None),
+    x_dry_run: Optional[bool] = Header(default=None),
+    x_callback_url: Optional[str] = Header(default=None),
+    current_user: Dict[str, Any] = Depends(rate_limited_user)
+):
+    """
+    Convertit un fichier .msg Outlook transmis tel quel dans le corps de la requête
+    
+    Destiné aux appels de service à service : le corps (`Content-Type: application/vnd.ms-outlook`)
+    est vérifié, haché et compté au fil de la réception, sans analyse multipart.
+    
+    Les options sont passées en paramètres de requête (`filename`, `merge_attachments`,
+    `strict_mode`, `dry_run`, `callback_url`) ou en en-têtes (`X-Filename`, `X-Merge-Attachments`,
+    `X-Strict-Mode`, `X-Dry-Run`, `X-Callback-URL`), les paramètres de requête l'emportant.
+    """
+    request_id = str(uuid.uuid4())
+    start_time = time.time()
+    set_request_id(request_id)
+    
+    log_request_info(request_id, "/convert/raw", "POST", get_user_id(current_user))
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type != RAW_MSG_CONTENT_TYPE:
+        error_msg = f"Type de contenu non supporté: {content_type or 'absent'}. Attendu: {RAW_MSG_CONTENT_TYPE}"
+        log_error(request_id, ValueError(error_msg), expected=True)
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=error_msg)
+    
+    filename = _option(filename, x_filename, RAW_MSG_DEFAULT_FILENAME)
+    _validate_filename(request_id, filename)
+    callback_url = _option(callback_url, x_callback_url, None)
+    _check_callback(request_id, callback_url)
+    upload = await _ingest(request_id, filename, request.stream())
+    
+    return await _convert_upload(
+        request, current_user, request_id, start_time, filename, upload,
+        _option(merge_attachments, x_merge_attachments, True),
+        _option(strict_mode, x_strict_mode, False),
+        _option(dry_run, x_dry_run, False),
+        callback_url=callback_url
+    )
+
+
+@app.post("/convert/path", response_model=PathConversionResponse, tags=["Conversion"])
+async def convert_path_to_pdf(
+    request: Request,
+    body: PathConversionRequest,
+    current_user: Dict[str, Any] = Depends(rate_limited_user)
+):
+    """
+    Convertit un fichier .msg local désigné par son chemin
+    
+    Destiné aux appelants qui partagent l'hôte ou un volume avec l'API : le fichier,
+    situé sous un répertoire autorisé (`REFERENCE_ROOTS`), est projeté en mémoire et
+    converti sans envoi ni copie temporaire.
+    
+    - **path**: Chemin absolu du fichier .msg
+    - **write_output**: Si True, le PDF est écrit à côté du fichier source
+      (même nom, extension .pdf) et seules les métadonnées sont retournées
+    - **overwrite**: Si True, un PDF déjà présent est remplacé (sinon 409)
+    
+    Réservé aux utilisateurs ayant le rôle `REFERENCE_ROLE` (par défaut le rôle administrateur).
+    
+    Les autres options (`merge_attachments`, `strict_mode`, `dry_run`, `callback_url`) sont celles de `/convert`.
+    """
+    request_id = str(uuid.uuid4())
+    start_time = time.time()
+    set_request_id(request_id)
+    
+    log_request_info(request_id, "/convert/path", "POST", get_user_id(current_user))
+    
+    # Lecture et écriture de fichiers de l'hôte : réservées à un rôle
+    if settings.reference_role not in get_user_roles(current_user):
+        logger.warning("Conversion par référence refusée pour l'utilisateur: %s", get_user_id(current_user))
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=error_msg
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Conversion par référence réservée au rôle {settings.reference_role}"
         )
     
-    if not file.filename.lower().endswith('.msg'):
-        error_msg = f"Type de fichier non supporté: {file.filename}. Seuls les fichiers .msg sont acceptés."
-        log_error(request_id, ValueError(error_msg))
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=error_msg
+    try:
+        source = resolve_reference(body.path, reference_roots)
+    except ReferenceNotAllowedError as e:
+        log_error(request_id, e, {"path": body.path}, expected=True)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ReferenceNotFoundError as e:
+        log_error(request_id, e, {"path": body.path}, expected=True)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    
+    _validate_filename(request_id, source.name)
+    if body.write_output and not body.overwrite and output_beside(source).exists():
+        e = OutputExistsError(f"Le fichier existe déjà: {output_beside(source)}")
+        log_error(request_id, e, {"path": str(source)}, expected=True)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    _check_callback(request_id, body.callback_url)
+    try:
+        with observe_stage("upload_read"):
+            upload = await run_in_threadpool(map_reference, source, settings.max_file_size)
+    except InvalidUploadError as e:
+        log_error(request_id, e, {"path": str(source)}, expected=True)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except UploadTooLargeError as e:
+        log_error(request_id, e, {"path": str(source)}, expected=True)
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    
+    try:
+        response = await _convert_upload(
+            request, current_user, request_id, start_time, source.name, upload,
+            body.merge_attachments, body.strict_mode, body.dry_run,
+            source_path=source, write_output=body.write_output, callback_url=body.callback_url,
+            overwrite=body.overwrite
+        )
+    except BaseException:
+        upload.content.close()
+        raise
+    # Conversion asynchrone : la projection est fermée par la tâche du livreur
+    if response.status_code != status.HTTP_202_ACCEPTED:
+        upload.content.close()
+    return response
+
+
+def _response_headers(request: Request, request_id: str) -> Dict[str, str]:
+    """En-têtes communs aux réponses de conversion réussies (identifiant, limites de débit)"""
+    headers = {"X-Request-ID": request_id}
+    rate_limit = getattr(request.state, "rate_limit", None)
+    if rate_limit is not None:
+        headers.update(rate_limit.headers())
+    return headers
+
+
+async def _convert_upload(
+    request: Request,
+    current_user: Dict[str, Any],
+    request_id: str,
+    start_time: float,
+    filename: str,
+    upload: IngestedUpload,
+    merge_attachments: bool,
+    strict_mode: bool,
+    dry_run: bool,
+    source_path: Optional[Path] = None,
+    write_output: bool = False,
+    callback_url: Optional[str] = None,
+    overwrite: bool = False
+) -> Response:
+    """
+    Estimation, admission, conversion et réponse pour un fichier .msg reçu
+    
+    Un fichier local (source_path) est converti en place, sans fichier temporaire ;
+    avec write_output, le PDF est écrit à côté de lui (un PDF existant n'est remplacé qu'avec
+    overwrite) et seules les métadonnées sont retournées.
+    Avec callback_url, la conversion est acceptée (202) puis poursuivie dans une tâche
+    du livreur de webhooks, détachée de la requête, son résultat étant livré par webhook.
+    """
+    file_content = upload.content
+    file_size = upload.size
+    
+    # Inventaire des pièces jointes (tailles, dimensions des images) pour estimer la mémoire
+    with observe_stage("manifest"):
+        manifest = await run_in_threadpool(read_manifest, file_content)
+    estimate = cost_model.estimate(manifest)
+    lane = select_lane(conversion_lanes, estimate.memory).name
+    
+    if dry_run:
+        return JSONResponse(content=CostEstimateResponse(
+            request_id=request_id,
+            filename=filename,
+            file_size=file_size,
+            sha256=upload.sha256,
+            lane=lane,
+            memory_estimate=estimate.memory,
+            wall_time_estimate=estimate.wall_time,
+            attachments={kind: manifest.count(kind) for kind in ("pdf", "image", "message", "other")},
+            image_pixels=sum(a.pixels or 0 for a in manifest.attachments),
+            pdf_pages=sum(a.pages or 0 for a in manifest.attachments),
+            readable=manifest.readable,
+            calibration_samples=cost_model.samples
+        ).model_dump(mode="json"), headers=_response_headers(request, request_id))
+    
+    # Conversion asynchrone : acceptée immédiatement, résultat livré par webhook
+    if callback_url is not None:
+        accepted = ConversionAcceptedResponse(
+            request_id=request_id,
+            filename=filename,
+            file_size=file_size,
+            sha256=upload.sha256,
+            lane=lane,
+            wall_time_estimate=estimate.wall_time,
+            callback_url=callback_url
+        )
+        # Conversion confiée au livreur : la requête et sa connexion sont libérées dès la réponse
+        webhook_dispatcher.submit(_complete_async_conversion(
+            request, current_user, request_id, start_time, filename, upload,
+            manifest, estimate, lane, merge_attachments, strict_mode, source_path, write_output, callback_url,
+            overwrite
+        ))
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=accepted.model_dump(mode="json"),
+            headers=_response_headers(request, request_id)
         )
     
-    # Vérification de la taille du fichier
-    file_content = await file.read()
-    file_size = len(file_content)
+    final_pdf, result, headers = await _run_pipeline(
+        request, current_user, request_id, start_time, filename, upload,
+        manifest, estimate, lane, merge_attachments, strict_mode, source_path, write_output, overwrite
+    )
+    
+    if write_output:
+        return JSONResponse(
+            content=PathConversionResponse(**result.model_dump(), source_path=str(source_path)).model_dump(mode="json"),
+            headers=_response_headers(request, request_id)
+        )
+    
+    BYTES_SENT.inc(len(final_pdf))
+    return Response(
+        content=final_pdf,
+        media_type="application/pdf",
+        headers=headers
+    )
+
+
+async def _run_pipeline(
+    request: Request,
+    current_user: Dict[str, Any],
+    request_id: str,
+    start_time: float,
+    filename: str,
+    upload: IngestedUpload,
+    manifest: MessageManifest,
+    estimate: CostEstimate,
+    lane: str,
+    merge_attachments: bool,
+    strict_mode: bool,
+    source_path: Optional[Path],
+    write_output: bool,
+    overwrite: bool = False
+) -> Tuple[bytes, ConversionResult, Dict[str, str]]:
+    """
+    Admission, conversion et comptabilité d'une conversion
+    
+    Returns:
+        Tuple contenant (PDF final, métadonnées du résultat, en-têtes de la réponse PDF)
+    """
+    user_id = get_user_id(current_user)
+    file_content = upload.content
+    file_size = upload.size
     
-    if file_size > settings.max_file_size:
-        error_msg = f"Fichier trop volumineux: {file_size} bytes. Limite: {settings.max_file_size} bytes"
-        log_error(request_id, ValueError(error_msg))
+    # Admission : attente bornée d'une place dans la voie et de la mémoire estimée, refus rapide si saturé,
+    # les conversions les plus courtes passant en premier
+    try:
+        ticket = await admission_controller.acquire(estimate.memory, lane, estimate.wall_time)
+    except AdmissionRejectedError as e:
+        log_error(request_id, e, {"reason": e.reason, "memory_estimate": estimate.memory, "lane": lane},
+                  expected=True)
+        CONVERSIONS.inc(outcome="shed")
+        if e.retry_after is None:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
         raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=error_msg
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
+    admitted_at = time.monotonic()
+    LANE_ROUTED.inc(lane=lane)
     
-    temp_file_path = None
+    scratch = AsyncExitStack()
+    output_size = 0
     try:
-        # Sauvegarde temporaire du fichier
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.msg') as temp_file:
-            temp_file.write(file_content)
-            temp_file_path = temp_file.name
-        
-        logger.info(f"[{request_id}] Fichier temporaire créé: {temp_file_path}")
-        
-        # Conversion
-        main_pdf, attachment_pdfs = converter.convert_msg_to_pdf(temp_file_path, request_id, strict_mode)
+        # Espace de travail de la requête (fichier reçu, pièces jointes déversées)
+        area = await scratch.enter_async_context(scratch_space.area(request_id))
+        if source_path is not None:
+            msg_path = str(source_path)
+        else:
+            # Sauvegarde temporaire du fichier, hors de la boucle d'événements
+            msg_path = str(await area.write_async("message.msg", file_content))
+            logger.info("Fichier temporaire créé: %s", msg_path)
         
-        logger.info(f"[{request_id}] 📧 PDF principal créé: {len(main_pdf)} bytes")
-        logger.info(f"[{request_id}] 📎 Pièces jointes PDF trouvées: {len(attachment_pdfs)}")
+        # Profilage à la demande (administrateurs) ou au-delà du seuil de latence
+        profile_requested = request.headers.get("X-Profile", "").lower() in ("1", "true")
+        if profile_requested and not is_admin(current_user):
+            logger.warning("En-tête X-Profile ignoré: droits administrateur requis")
+            profile_requested = False
+        profiler = RequestProfiler(
+            request_id,
+            on_demand=profile_requested,
+            slow_threshold=settings.profile_slow_threshold
+        )
         
-        # Fusion si demandée
-        if merge_attachments:
-            if attachment_pdfs:
-                logger.info(f"[{request_id}] 🔄 Fusion de {len(attachment_pdfs)} PDF(s) avec le mail principal...")
-                final_pdf = converter.merge_pdfs(main_pdf, attachment_pdfs, request_id)
-                attachments_count = len(attachment_pdfs)
-                logger.info(f"[{request_id}] ✅ Fusion terminée: {len(final_pdf)} bytes au total")
-            else:
-                logger.info(f"[{request_id}] ❌ Aucune pièce jointe PDF à fusionner")
-                final_pdf = main_pdf
-                attachments_count = 0
-        else:
-            logger.info(f"[{request_id}] ⏭️ Fusion désactivée par l'utilisateur")
-            final_pdf = main_pdf
-            attachments_count = 0
+        # Conversion et fusion dans un worker du pool
+        (final_pdf, attachments_count), conversion_time = await conversion_pool.run_in_lane(
+            lane, profiler.run, _timed, _run_conversion, msg_path, request_id, strict_mode, merge_attachments,
+            str(area.path)
+        )
         
         processing_time = time.time() - start_time
-        output_filename = f"{Path(file.filename).stem}.pdf"
+        output_size = len(final_pdf)
+        output_filename = f"{Path(filename).stem}.pdf"
+        
+        # Ressources consommées, consultables par identifiant de requête
+        timings = get_request_timings()
+        resources = None
+        if timings is not None:
+            resources = observe_request_resources(timings)
+            resources["scratch_bytes"] = await run_in_threadpool(area.usage)
+            cost_model.observe(manifest, conversion_time)
+            usage_store.put(request_id, {
+                "request_id": request_id,
+                "user_id": user_id,
+                "filename": filename,
+                "file_size": file_size,
+                "sha256": upload.sha256,
+                "lane": lane,
+                "output_size": len(final_pdf),
+                "processing_time": processing_time,
+                **resources
+            })
         
         # Logging de la conversion
-        log_conversion_info(request_id, file.filename, file_size, processing_time)
+        log_conversion_info(request_id, filename, file_size, processing_time, resources)
+        
+        output_path = None
+        if write_output:
+            output_path = await run_in_threadpool(write_beside, source_path, final_pdf, overwrite)
+            logger.info("PDF écrit à côté du fichier source: %s", output_path)
         
         # Préparation de la réponse
-        response_data = ConversionResponse(
+        result = ConversionResult(
             request_id=request_id,
-            filename=file.filename,
+            filename=filename,
             output_filename=output_filename,
             file_size=file_size,
             output_size=len(final_pdf),
             processing_time=processing_time,
             attachments_processed=attachments_count,
-            created_at=datetime.utcnow()
+            created_at=datetime.utcnow(),
+            sha256=upload.sha256,
+            lane=lane,
+            output_path=str(output_path) if output_path is not None else None
         )
         
-        logger.info(f"[{request_id}] Conversion réussie - Taille finale: {len(final_pdf)} bytes")
+        logger.info("Conversion réussie - Taille finale: %s bytes", len(final_pdf))
+        CONVERSIONS.inc(outcome="success")
         
-        # Retour du PDF avec les métadonnées dans les headers
-        return Response(
-            content=final_pdf,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={output_filename}",
-                "X-Request-ID": request_id,
-                "X-Processing-Time": str(processing_time),
-                "X-Attachments-Processed": str(attachments_count),
-                "X-Original-Size": str(file_size),
-                "X-Output-Size": str(len(final_pdf))
-            }
-        )
+        # Métadonnées dans les headers de la réponse PDF
+        headers = {
+            **_response_headers(request, request_id),
+            "Content-Disposition": f"attachment; filename={output_filename}",
+            "X-Processing-Time": str(processing_time),
+            "X-Attachments-Processed": str(attachments_count),
+            "X-Original-Size": str(file_size),
+            "X-Content-SHA256": upload.sha256,
+            "X-Output-Size": str(len(final_pdf)),
+            "X-Conversion-Lane": lane
+        }
+        if timings is not None:
+            headers["Server-Timing"] = timings.server_timing(total=processing_time)
+        if profiler.captured:
+            headers["X-Profile-Captured"] = profiler.captured
+        
+        return final_pdf, result, headers
         
     except UnauthorizedAttachmentError as e:
         # Erreur de pièces jointes non autorisées - code 400
-        log_error(request_id, e, {"filename": file.filename, "file_size": file_size})
+        log_error(request_id, e, {"filename": filename, "file_size": file_size}, expected=True)
+        CONVERSIONS.inc(outcome="rejected")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)  # Message direct sans préfixe
         )
+    except OutputExistsError as e:
+        # PDF apparu à côté du fichier source pendant la conversion - code 409
+        log_error(request_id, e, {"filename": filename}, expected=True)
+        CONVERSIONS.inc(outcome="rejected")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except MSGConversionError as e:
-        log_error(request_id, e, {"filename": file.filename, "file_size": file_size})
+        log_error(request_id, e, {"filename": filename, "file_size": file_size})
+        CONVERSIONS.inc(outcome="failed")
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=f"Erreur de conversion: {str(e)}"
         )
     except Exception as e:
-        log_error(request_id, e, {"filename": file.filename, "file_size": file_size})
+        log_error(request_id, e, {"filename": filename, "file_size": file_size})
+        CONVERSIONS.inc(outcome="error")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Erreur interne du serveur"
         )
     finally:
-        # Nettoyage du fichier temporaire
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.debug(f"[{request_id}] Fichier temporaire supprimé: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"[{request_id}] Impossible de supprimer le fichier temporaire: {e}")
+        admission_controller.release(ticket, time.monotonic() - admitted_at)
+        
+        # Coût réel imputé à l'utilisateur, y compris pour une conversion échouée
+        timings = get_request_timings()
+        cpu_seconds = summarize(timings.stages)[0] if timings is not None else 0.0
+        usage_ledger.record(user_id, cpu_seconds, output_size)
+        
+        # Nettoyage de l'espace de travail
+        try:
+            await scratch.aclose()
+        except Exception as e:
+            logger.warning("Impossible de supprimer l'espace de travail: %s", e)
+
+
+async def _complete_async_conversion(
+    request: Request,
+    current_user: Dict[str, Any],
+    request_id: str,
+    start_time: float,
+    filename: str,
+    upload: IngestedUpload,
+    manifest: MessageManifest,
+    estimate: CostEstimate,
+    lane: str,
+    merge_attachments: bool,
+    strict_mode: bool,
+    source_path: Optional[Path],
+    write_output: bool,
+    callback_url: str,
+    overwrite: bool = False
+) -> None:
+    """Conversion en arrière-plan puis enregistrement de sa livraison par webhook"""
+    set_request_id(request_id)
+    try:
+        final_pdf, result, headers = await _run_pipeline(
+            request, current_user, request_id, start_time, filename, upload,
+            manifest, estimate, lane, merge_attachments, strict_mode, source_path, write_output, overwrite
+        )
+    except HTTPException as e:
+        payload = WebhookPayload(request_id=request_id, status="failed", status_code=e.status_code, detail=str(e.detail))
+        body, headers = payload.model_dump_json().encode(), {"Content-Type": "application/json"}
+    else:
+        if settings.webhook_payload == "pdf" and result.output_path is None:
+            # PDF dans le corps, métadonnées dans les en-têtes comme pour une réponse synchrone
+            body = final_pdf
+            headers = {name: value for name, value in headers.items() if name.startswith("X-") or name == "Content-Disposition"}
+            headers["Content-Type"] = "application/pdf"
+        else:
+            payload = WebhookPayload(request_id=request_id, status="succeeded", status_code=status.HTTP_200_OK, result=result)
+            body, headers = payload.model_dump_json().encode(), {"Content-Type": "application/json"}
+    finally:
+        # Projection d'un fichier local : fermée une fois la conversion terminée
+        if source_path is not None:
+            upload.content.close()
+    
+    try:
+        await webhook_dispatcher.enqueue(request_id, callback_url, body, headers)
+    except sqlite3.Error as e:
+        # File des livraisons inaccessible : le résultat est perdu pour l'appelant
+        log_error(request_id, e, {"callback_url": callback_url})
+        return
+    logger.info("Livraison du résultat enregistrée: %s", callback_url)
 
 
 @app.exception_handler(JWTError)
@@ -264,28 +1021,26 @@ async def jwt_exception_handler(request, exc: JWTError):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc: HTTPException):
     """Gestionnaire d'exception HTTP personnalisé"""
-    request_id = str(uuid.uuid4())
+    request_id = get_request_id() or str(uuid.uuid4())
     
-    logger.warning(f"[{request_id}] HTTP Exception: {exc.status_code} - {exc.detail}")
+    logger.warning("HTTP Exception: %s - %s", exc.status_code, exc.detail)
     
     # Retourner le format standard FastAPI pour les tests
-    from fastapi.responses import JSONResponse
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
-        headers={"X-Request-ID": request_id}
+        headers={**(exc.headers or {}), "X-Request-ID": request_id}
     )
 
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc: Exception):
     """Gestionnaire d'exception général"""
-    request_id = str(uuid.uuid4())
+    request_id = get_request_id() or str(uuid.uuid4())
     
     log_error(request_id, exc)
     
     # Retourner le format standard FastAPI pour les tests
-    from fastapi.responses import JSONResponse
     return JSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "Erreur interne du serveur"},
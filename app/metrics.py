@@ -0,0 +1,459 @@
+"""
+Métriques applicatives exposées au format texte Prometheus
+
+Implémentation minimale en mémoire (compteurs, jauges, histogrammes) sans
+dépendance externe : le endpoint /metrics sérialise simplement le registre.
+"""
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.resource_usage import ResourceProbe, StageUsage, summarize
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape_label_value(value: str) -> str:
+    """Échappe une valeur de label selon le format d'exposition"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    """Formate un ensemble de labels ({a="x",b="y"})"""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Formate une valeur numérique"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Classe de base des métriques avec gestion des labels"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Construit la clé d'une série à partir des labels"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Labels invalides pour {self.name}: {sorted(labels)} (attendus: {list(self.labelnames)})")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self) -> List[str]:
+        """Retourne les lignes d'échantillons de la métrique"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Sérialise la métrique (HELP, TYPE et échantillons)"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.collect())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Compteur monotone"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Incrémente le compteur"""
+        if amount < 0:
+            raise ValueError("Un compteur ne peut pas décroître")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """Valeur courante d'une série"""
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Metric):
+    """Jauge, éventuellement calculée à la lecture via une fonction"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels) -> None:
+        """Fixe la valeur de la jauge"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Calcule la valeur (sans labels) au moment de la collecte"""
+        self._function = function
+
+    def get(self, **labels) -> float:
+        """Valeur courante d'une série"""
+        if self._function is not None and not labels:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(Metric):
+    """Histogramme à buckets cumulatifs"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par série : [compteurs par bucket (+Inf inclus), somme, nombre]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Enregistre une observation"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def get_count(self, **labels) -> int:
+        """Nombre d'observations d'une série"""
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def get_sum(self, **labels) -> float:
+        """Somme des observations d'une série"""
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0.0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(series[0]), series[1], series[2])) for key, series in self._series.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registre des métriques exposées par /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Enregistre une métrique (le nom doit être unique)"""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Sérialise toutes les métriques au format d'exposition texte"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Crée et enregistre un compteur"""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (),
+          function: Optional[Callable[[], float]] = None) -> Gauge:
+    """Crée et enregistre une jauge"""
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Crée et enregistre un histogramme"""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Métriques du pipeline de conversion
+STAGE_DURATION = histogram(
+    "msgtopdf_stage_duration_seconds",
+    "Durée des étapes du pipeline de conversion",
+    ["stage"]
+)
+ATTACHMENT_DURATION = histogram(
+    "msgtopdf_attachment_conversion_seconds",
+    "Durée de traitement d'une pièce jointe par type",
+    ["attachment_type"]
+)
+ATTACHMENTS = counter(
+    "msgtopdf_attachments_total",
+    "Pièces jointes rencontrées par type",
+    ["attachment_type"]
+)
+BYTES_RECEIVED = counter("msgtopdf_bytes_received_total", "Octets de fichiers .msg reçus")
+BYTES_SENT = counter("msgtopdf_bytes_sent_total", "Octets de PDF renvoyés")
+UPLOADS_REJECTED = counter(
+    "msgtopdf_upload_rejected_total",
+    "Envois refusés avant analyse du corps, par motif",
+    ["reason"]
+)
+UPLOADS_DECOMPRESSED = counter("msgtopdf_upload_decompressed_total", "Envois reçus compressés (gzip)")
+CONVERSIONS = counter("msgtopdf_conversions_total", "Conversions terminées par résultat", ["outcome"])
+JWKS_CACHE_HITS = counter("msgtopdf_jwks_cache_hits_total", "Utilisations du cache JWKS")
+JWKS_REFRESHES = counter("msgtopdf_jwks_refreshes_total", "Rafraîchissements des clés JWKS", ["outcome"])
+
+# Consommation de ressources par étape et par requête
+MEMORY_BUCKETS = tuple(2 ** n * 1024 * 1024 for n in range(0, 12))  # 1 MB .. 2 GB
+STAGE_CPU = histogram(
+    "msgtopdf_stage_cpu_seconds",
+    "Temps CPU des étapes du pipeline de conversion",
+    ["stage"]
+)
+STAGE_PEAK_RSS_GROWTH = histogram(
+    "msgtopdf_stage_peak_rss_growth_bytes",
+    "Croissance du pic de mémoire résidente par étape",
+    ["stage"],
+    buckets=MEMORY_BUCKETS
+)
+REQUEST_CPU = histogram("msgtopdf_request_cpu_seconds", "Temps CPU total d'une conversion")
+REQUEST_PEAK_RSS_GROWTH = histogram(
+    "msgtopdf_request_peak_rss_growth_bytes",
+    "Croissance du pic de mémoire résidente sur une conversion",
+    buckets=MEMORY_BUCKETS
+)
+IMAGE_PIXELS = histogram(
+    "msgtopdf_image_pixels",
+    "Nombre de pixels des images décodées",
+    buckets=tuple(10 ** n for n in range(4, 10))
+)
+MERGED_PAGES = histogram(
+    "msgtopdf_merged_pages",
+    "Nombre de pages des PDFs fusionnés",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
+
+# Noms des étapes dans l'en-tête Server-Timing
+SERVER_TIMING_NAMES = {
+    "auth": "auth",
+    "upload_read": "upload",
+    "manifest": "manifest",
+    "parse": "parse",
+    "strict_validation": "validate",
+    "main_render": "render",
+    "attachment_image": "images",
+    "attachment_pdf": "pdfs",
+    "merge": "merge",
+}
+
+
+class RequestTimings:
+    """Durées et ressources par étape, pièces jointes par type et forme des entrées pour une requête"""
+
+    __slots__ = ("stages", "attachments", "images", "merged_pages")
+
+    def __init__(self):
+        self.stages: Dict[str, StageUsage] = {}
+        self.attachments: Dict[str, int] = {}
+        self.images: List[Tuple[int, int]] = []
+        self.merged_pages: List[int] = []
+
+    @property
+    def durations(self) -> Dict[str, float]:
+        """Durée cumulée par étape"""
+        return {stage: usage.wall_time for stage, usage in self.stages.items()}
+
+    def usage(self, stage: str) -> StageUsage:
+        """Accumulateur de ressources d'une étape"""
+        usage = self.stages.get(stage)
+        if usage is None:
+            usage = self.stages[stage] = StageUsage()
+        return usage
+
+    def count_attachment(self, attachment_type: str) -> None:
+        """Comptabilise une pièce jointe"""
+        self.attachments[attachment_type] = self.attachments.get(attachment_type, 0) + 1
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Construit la valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+        entries = []
+        for stage, name in SERVER_TIMING_NAMES.items():
+            if stage in self.stages:
+                entries.append(f"{name};dur={self.stages[stage].wall_time * 1000:.1f}")
+        for attachment_type, count in sorted(self.attachments.items()):
+            entries.append(f'attachments-{attachment_type};desc="{count}"')
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+    def resource_report(self) -> Dict[str, Any]:
+        """Rapport des ressources consommées (étapes, totaux et forme des entrées)"""
+        cpu, peak = summarize(self.stages)
+        return {
+            "cpu_time": cpu,
+            "peak_rss_growth": peak,
+            "stages": {stage: usage.to_dict() for stage, usage in self.stages.items()},
+            "attachments": dict(self.attachments),
+            "images": [{"width": width, "height": height} for width, height in self.images],
+            "merged_pages": list(self.merged_pages),
+        }
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> Tuple[RequestTimings, object]:
+    """Associe un nouvel accumulateur de durées au contexte courant"""
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    return timings, token
+
+
+def reset_request_timings(token: object) -> None:
+    """Détache l'accumulateur de durées du contexte courant"""
+    _request_timings.reset(token)
+
+
+def get_request_timings() -> Optional[RequestTimings]:
+    """Accumulateur de durées de la requête courante (None hors requête)"""
+    return _request_timings.get()
+
+
+def _on_event_loop() -> bool:
+    """Indique si l'appelant s'exécute sur le thread d'une boucle d'événements"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@contextmanager
+def _measure(usage_key: str, metric: Histogram, **labels) -> Iterator[None]:
+    """
+    Mesure une étape : durée seule hors requête, durée et ressources
+    (CPU, RSS, pic RSS) lorsqu'une requête est en cours
+
+    Sur la boucle d'événements, l'étape peut attendre pendant que d'autres
+    requêtes s'exécutent : seule sa durée est mesurée, les ressources ne
+    l'étant que dans les threads de travail.
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            metric.observe(time.perf_counter() - start, **labels)
+        return
+
+    probe = ResourceProbe(resources=not _on_event_loop())
+    try:
+        yield
+    finally:
+        usage = timings.usage(usage_key)
+        cpu_before, peak_before = usage.cpu_time, usage.peak_rss_growth
+        metric.observe(probe.finish(usage), **labels)
+        if probe.resources:
+            STAGE_CPU.observe(usage.cpu_time - cpu_before, stage=usage_key)
+            STAGE_PEAK_RSS_GROWTH.observe(usage.peak_rss_growth - peak_before, stage=usage_key)
+
+
+def observe_stage(stage: str):
+    """Mesure la durée (et les ressources, en requête) d'une étape du pipeline"""
+    return _measure(stage, STAGE_DURATION, stage=stage)
+
+
+def count_attachment(attachment_type: str) -> None:
+    """Comptabilise une pièce jointe (métrique globale et requête courante)"""
+    ATTACHMENTS.inc(attachment_type=attachment_type)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.count_attachment(attachment_type)
+
+
+@contextmanager
+def observe_attachment(attachment_type: str) -> Iterator[None]:
+    """Mesure le traitement d'une pièce jointe et la comptabilise"""
+    count_attachment(attachment_type)
+    with _measure(f"attachment_{attachment_type}", ATTACHMENT_DURATION, attachment_type=attachment_type):
+        yield
+
+
+def record_image(width: int, height: int) -> None:
+    """Enregistre les dimensions d'une image décodée"""
+    IMAGE_PIXELS.observe(width * height)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.images.append((width, height))
+
+
+def record_merged_pages(pages: int) -> None:
+    """Enregistre le nombre de pages d'un PDF fusionné"""
+    MERGED_PAGES.observe(pages)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.merged_pages.append(pages)
+
+
+def observe_request_resources(timings: RequestTimings) -> Dict[str, Any]:
+    """Publie les ressources totales d'une conversion et retourne son rapport"""
+    report = timings.resource_report()
+    REQUEST_CPU.observe(report["cpu_time"])
+    REQUEST_PEAK_RSS_GROWTH.observe(report["peak_rss_growth"])
+    return report
+
+
+def render_metrics() -> str:
+    """Retourne le texte d'exposition de toutes les métriques"""
+    return REGISTRY.render()
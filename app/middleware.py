@@ -0,0 +1,214 @@
+"""
+Middlewares ASGI de l'application
+"""
+import time
+import zlib
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+from app.metrics import (
+    STAGE_DURATION, UPLOADS_DECOMPRESSED, UPLOADS_REJECTED, start_request_timings, reset_request_timings
+)
+
+
+class RequestTimingMiddleware:
+    """
+    Mesure les étapes des requêtes de conversion
+
+    Associe un accumulateur de durées au contexte de la requête (alimenté par
+    l'authentification et le pipeline, puis restitué via Server-Timing) et
+    mesure le temps d'écriture de la réponse, du début de l'envoi au dernier bloc.
+    Middleware ASGI pur : aucune mise en mémoire tampon du corps de la réponse.
+    """
+
+    def __init__(self, app, path_prefix: str = "/convert"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        started = None
+
+        async def timed_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = time.perf_counter()
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and started is not None:
+                STAGE_DURATION.observe(time.perf_counter() - started, stage="response_write")
+
+        _, token = start_request_timings()
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            reset_request_timings(token)
+
+
+class BodySizeLimitMiddleware:
+    """
+    Limite la taille du corps des requêtes d'envoi avant toute analyse
+
+    Un Content-Length annoncé au-delà de la limite est refusé (413) sans lire
+    le corps. Sinon les octets sont comptés au fil de la réception et la
+    lecture est interrompue dès que la limite est franchie (corps transmis par
+    blocs ou Content-Length mensonger) : un envoi trop volumineux n'est jamais
+    reçu en entier ni écrit sur disque par l'analyseur multipart.
+    """
+
+    def __init__(self, app, max_body_size: int, path_prefix: str = "/convert"):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = None
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    content_length = None
+                break
+
+        if content_length is not None and content_length > self.max_body_size:
+            UPLOADS_REJECTED.inc(reason="content_length")
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": f"Fichier trop volumineux: {content_length} bytes annoncés. "
+                                   f"Limite: {self.max_body_size} bytes"},
+                headers={"Connection": "close"}
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    UPLOADS_REJECTED.inc(reason="stream")
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Fichier trop volumineux: plus de {self.max_body_size} bytes reçus",
+                        headers={"Connection": "close"}
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+# Taille maximale produite par un appel au décompresseur
+DECOMPRESSION_CHUNK_SIZE = 1024 * 1024
+
+
+class GzipRequestMiddleware:
+    """
+    Décompresse au fil de la réception les envois en Content-Encoding: gzip
+
+    L'application reçoit le corps décompressé, sans les en-têtes
+    Content-Encoding et Content-Length du corps compressé. La limite de taille
+    porte sur les octets décompressés, produits par tranches bornées : une
+    bombe de décompression est interrompue (413) dès la limite franchie, sans
+    jamais être décompressée en entier. Tout autre encodage est refusé (415),
+    un flux gzip invalide ou tronqué aussi (400).
+    """
+
+    def __init__(self, app, max_body_size: int, path_prefix: str = "/convert"):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = None
+        for name, value in scope.get("headers", ()):
+            if name == b"content-encoding":
+                encoding = value.decode("latin-1").strip().lower()
+                break
+
+        if encoding in (None, "", "identity"):
+            await self.app(scope, receive, send)
+            return
+
+        if encoding not in ("gzip", "x-gzip"):
+            UPLOADS_REJECTED.inc(reason="encoding")
+            response = JSONResponse(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                content={"detail": f"Encodage de contenu non supporté: {encoding}. Encodage accepté: gzip"}
+            )
+            await response(scope, receive, send)
+            return
+
+        UPLOADS_DECOMPRESSED.inc()
+        headers = [
+            (name, value) for name, value in scope.get("headers", ())
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        scope = {**scope, "headers": headers}
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        produced = 0
+        finished = False
+
+        def invalid(detail: str) -> HTTPException:
+            UPLOADS_REJECTED.inc(reason="gzip")
+            return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+        def decompress(data: bytes) -> bytes:
+            nonlocal decompressor, produced
+            output = []
+            while True:
+                try:
+                    chunk = decompressor.decompress(data, DECOMPRESSION_CHUNK_SIZE)
+                except zlib.error:
+                    raise invalid("Corps gzip invalide")
+                produced += len(chunk)
+                if produced > self.max_body_size:
+                    UPLOADS_REJECTED.inc(reason="decompressed")
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Fichier trop volumineux: plus de {self.max_body_size} bytes après décompression",
+                        headers={"Connection": "close"}
+                    )
+                output.append(chunk)
+                if decompressor.eof:
+                    # Membres gzip concaténés : un nouveau membre commence
+                    data = decompressor.unused_data
+                    if not data:
+                        break
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                else:
+                    data = decompressor.unconsumed_tail
+                    # Tranche incomplète sans entrée restante : tout est produit
+                    if not data and len(chunk) < DECOMPRESSION_CHUNK_SIZE:
+                        break
+            return b"".join(output)
+
+        async def decompressing_receive():
+            nonlocal finished
+            if finished:
+                return await receive()
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            body = decompress(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished = True
+                if not decompressor.eof:
+                    raise invalid("Corps gzip tronqué")
+            return {**message, "body": body}
+
+        await self.app(scope, decompressing_receive, send)
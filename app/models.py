@@ -2,7 +2,7 @@
 Modèles Pydantic pour l'API
 """
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
@@ -26,6 +26,68 @@ class ConversionResponse(BaseModel):
     created_at: datetime = Field(description="Date et heure de création")
 
 
+class ConversionResult(ConversionResponse):
+    """Modèle pour le résultat complet d'une conversion (webhooks, conversion par référence)"""
+    sha256: str = Field(description="Empreinte SHA-256 du fichier original")
+    lane: str = Field(description="Voie de conversion retenue")
+    output_path: Optional[str] = Field(default=None, description="Chemin du PDF écrit à côté du fichier source")
+
+
+class ConversionAcceptedResponse(BaseModel):
+    """Modèle pour une conversion asynchrone acceptée (202), dont le résultat sera livré par webhook"""
+    request_id: str = Field(description="Identifiant unique de la requête")
+    status: str = Field(default="accepted", description="Statut de la conversion")
+    filename: str = Field(description="Nom du fichier original")
+    file_size: int = Field(description="Taille du fichier original en bytes")
+    sha256: str = Field(description="Empreinte SHA-256 du fichier original")
+    lane: str = Field(description="Voie de conversion retenue")
+    wall_time_estimate: float = Field(description="Temps de conversion estimé en secondes")
+    callback_url: str = Field(description="URL à laquelle le résultat sera livré")
+
+
+class WebhookPayload(BaseModel):
+    """Modèle pour la notification de fin d'une conversion asynchrone"""
+    request_id: str = Field(description="Identifiant unique de la requête")
+    status: str = Field(description="succeeded ou failed")
+    status_code: int = Field(description="Code HTTP qu'aurait reçu une conversion synchrone")
+    detail: Optional[str] = Field(default=None, description="Motif de l'échec")
+    result: Optional[ConversionResult] = Field(default=None, description="Résultat de la conversion réussie")
+    completed_at: datetime = Field(default_factory=datetime.utcnow, description="Date et heure de fin")
+
+
+class PathConversionRequest(BaseModel):
+    """Modèle pour une conversion par référence à un fichier local"""
+    path: str = Field(description="Chemin absolu du fichier .msg, sous un répertoire autorisé")
+    merge_attachments: bool = Field(default=True, description="Fusionner les PDFs et images en pièces jointes")
+    strict_mode: bool = Field(default=False, description="Refuser la conversion si des pièces jointes non autorisées sont présentes")
+    dry_run: bool = Field(default=False, description="Retourner le coût estimé sans convertir")
+    write_output: bool = Field(default=False, description="Écrire le PDF à côté du fichier source et ne retourner que les métadonnées")
+    overwrite: bool = Field(default=False, description="Remplacer un PDF déjà présent à côté du fichier source (write_output)")
+    callback_url: Optional[str] = Field(default=None, description="URL de rappel : conversion asynchrone, résultat livré par webhook")
+
+
+class PathConversionResponse(ConversionResult):
+    """Modèle pour le résultat d'une conversion par référence écrite à côté du fichier source"""
+    source_path: str = Field(description="Chemin résolu du fichier .msg")
+    output_path: str = Field(description="Chemin du PDF écrit")
+
+
+class CostEstimateResponse(BaseModel):
+    """Modèle pour le coût estimé d'une conversion (dry-run, sans conversion)"""
+    request_id: str = Field(description="Identifiant unique de la requête")
+    filename: str = Field(description="Nom du fichier original")
+    file_size: int = Field(description="Taille du fichier original en bytes")
+    sha256: str = Field(description="Empreinte SHA-256 du fichier original")
+    lane: str = Field(description="Voie de conversion retenue")
+    memory_estimate: int = Field(description="Mémoire estimée en bytes")
+    wall_time_estimate: float = Field(description="Temps de conversion estimé en secondes")
+    attachments: Dict[str, int] = Field(description="Pièces jointes par type")
+    image_pixels: int = Field(description="Total des pixels des images lus dans leurs en-têtes")
+    pdf_pages: int = Field(description="Total des pages des PDFs lues dans leur arbre des pages")
+    readable: bool = Field(description="Inventaire des pièces jointes lisible")
+    calibration_samples: int = Field(description="Conversions mesurées ayant servi à la calibration")
+
+
 class ErrorResponse(BaseModel):
     """Modèle pour les réponses d'erreur"""
     error: str = Field(description="Type d'erreur")
@@ -42,9 +104,95 @@ class HealthResponse(BaseModel):
     jwks_status: str = Field(description="Statut de la connexion JWKS")
 
 
+class LivenessResponse(BaseModel):
+    """Modèle pour la sonde de vivacité (aucune entrée/sortie)"""
+    status: str = Field(description="Statut du processus")
+    uptime: float = Field(description="Temps écoulé depuis le démarrage en secondes")
+
+
+class ReadinessResponse(BaseModel):
+    """Modèle pour la sonde de disponibilité avec indicateurs de capacité"""
+    status: str = Field(description="ready ou not_ready")
+    reasons: list = Field(default_factory=list, description="Raisons de l'indisponibilité")
+    queue_depth: int = Field(description="Conversions en attente d'un worker")
+    busy_workers: int = Field(description="Workers de conversion occupés")
+    max_workers: int = Field(description="Nombre total de workers de conversion")
+    jwks_cache_age: Optional[float] = Field(default=None, description="Âge du cache JWKS en secondes")
+    memory_limit: Optional[int] = Field(default=None, description="Limite mémoire en bytes")
+    memory_used: Optional[int] = Field(default=None, description="Mémoire utilisée en bytes")
+    memory_headroom: Optional[int] = Field(default=None, description="Mémoire encore disponible en bytes")
+    memory_reserved: int = Field(default=0, description="Mémoire réservée par les conversions admises en bytes")
+    memory_budget: Optional[int] = Field(default=None, description="Budget mémoire des conversions en bytes")
+    lanes: Dict[str, Dict[str, int]] = Field(default_factory=dict, description="Admission et workers par voie de conversion")
+    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Horodatage")
+
+
 class UserInfo(BaseModel):
     """Modèle pour les informations utilisateur extraites du JWT"""
     user_id: str = Field(description="Identifiant utilisateur")
     email: Optional[str] = Field(default=None, description="Email utilisateur")
     roles: list = Field(default_factory=list, description="Rôles utilisateur")
-    token_exp: Optional[datetime] = Field(default=None, description="Date d'expiration du token")
\ No newline at end of file
+    token_exp: Optional[datetime] = Field(default=None, description="Date d'expiration du token")
+
+
+class ProfileInfo(BaseModel):
+    """Modèle décrivant un profil de conversion enregistré"""
+    request_id: str = Field(description="Identifiant de la requête profilée")
+    kind: str = Field(description="cprofile (à la demande) ou sampled (seuil de latence)")
+    size: int = Field(description="Taille du fichier de profil en bytes")
+    created_at: datetime = Field(description="Date de capture")
+
+
+class ResourceReport(BaseModel):
+    """Modèle pour les ressources consommées par une conversion"""
+    request_id: str = Field(description="Identifiant de la requête")
+    user_id: str = Field(description="Identifiant utilisateur")
+    filename: str = Field(description="Nom du fichier original")
+    file_size: int = Field(description="Taille du fichier original en bytes")
+    sha256: Optional[str] = Field(default=None, description="Empreinte SHA-256 du fichier original")
+    lane: Optional[str] = Field(default=None, description="Voie de conversion selon le coût estimé")
+    output_size: int = Field(description="Taille du PDF généré en bytes")
+    processing_time: float = Field(description="Temps de traitement en secondes")
+    cpu_time: float = Field(description="Temps CPU total des étapes en secondes")
+    peak_rss_growth: int = Field(description="Croissance du pic de mémoire résidente en bytes")
+    stages: Dict[str, Dict[str, Any]] = Field(description="Durée, CPU, RSS, pic RSS et octets alloués par étape")
+    attachments: Dict[str, int] = Field(description="Pièces jointes par type")
+    images: list = Field(default_factory=list, description="Dimensions (pixels) des images décodées")
+    merged_pages: list = Field(default_factory=list, description="Nombre de pages de chaque PDF fusionné")
+    scratch_bytes: int = Field(default=0, description="Occupation de l'espace de travail temporaire en bytes")
+
+
+class SubjectUsage(BaseModel):
+    """Modèle pour la consommation d'un utilisateur sur la fenêtre glissante"""
+    subject: str = Field(description="Identifiant utilisateur (sujet JWT)")
+    window_seconds: float = Field(description="Durée de la fenêtre glissante en secondes")
+    cpu_seconds: float = Field(description="Temps CPU de conversion consommé en secondes")
+    output_bytes: int = Field(description="Octets de PDF produits")
+    conversions: int = Field(description="Nombre de conversions")
+
+
+class AllocationSnapshot(BaseModel):
+    """Modèle décrivant un snapshot tracemalloc"""
+    id: int = Field(description="Identifiant du snapshot")
+    taken_at: float = Field(description="Horodatage (epoch) de la prise du snapshot")
+    traced: int = Field(description="Mémoire suivie au moment du snapshot en bytes")
+    peak: int = Field(description="Pic de mémoire suivie en bytes")
+
+
+class AllocationStatus(BaseModel):
+    """Modèle pour l'état du suivi des allocations"""
+    tracing: bool = Field(description="tracemalloc actif")
+    frames: int = Field(description="Profondeur de pile enregistrée par allocation")
+    traced: int = Field(description="Mémoire actuellement suivie en bytes")
+    peak: int = Field(description="Pic de mémoire suivie en bytes")
+    overhead: int = Field(description="Mémoire utilisée par tracemalloc lui-même en bytes")
+    snapshots: List[AllocationSnapshot] = Field(default_factory=list, description="Snapshots disponibles")
+
+
+class AllocationDiffEntry(BaseModel):
+    """Modèle pour une ligne de comparaison entre deux snapshots"""
+    size_diff: int = Field(description="Variation de la taille allouée en bytes")
+    size: int = Field(description="Taille allouée dans le snapshot le plus récent en bytes")
+    count_diff: int = Field(description="Variation du nombre de blocs")
+    count: int = Field(description="Nombre de blocs dans le snapshot le plus récent")
+    traceback: List[str] = Field(description="Pile d'allocation (fichier:ligne)")
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+Profilage des conversions
+
+Deux déclencheurs par requête :
+- à la demande (en-tête réservé aux administrateurs) : profil cProfile complet,
+  enregistré au format pstats (`<request_id>.prof`)
+- au-delà d'un seuil de latence : la pile du worker est échantillonnée pendant
+  la conversion et, si elle s'avère lente, conservée au format "collapsed
+  stacks" compatible flamegraph (`<request_id>.collapsed`)
+
+Un échantillonneur continu à basse fréquence agrège en outre les piles de tous
+les threads du worker, pour voir en production où passe le temps.
+"""
+import cProfile
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_EXTENSIONS = {"cprofile": ".prof", "sampled": ".collapsed"}
+MAX_STACK_DEPTH = 128
+
+# Feuilles de pile correspondant à un thread inactif (attente de travail ou d'E/S)
+IDLE_LEAVES = {
+    "concurrent.futures.thread:_worker",
+    "selectors:select",
+    "threading:wait",
+    "threading:_wait_for_tstate_lock",
+    "queue:get",
+    "app.profiling:_run",
+}
+
+
+def format_stack(frame, limit: int = MAX_STACK_DEPTH) -> str:
+    """Formate une pile au format collapsed (racine;...;feuille)"""
+    parts = []
+    while frame is not None and len(parts) < limit:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", code.co_filename)
+        parts.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+def render_collapsed(counts: Dict[str, int]) -> str:
+    """Sérialise des piles agrégées (une ligne "pile nombre" par pile)"""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+class ThreadStackSampler:
+    """Échantillonne périodiquement la pile des threads surveillés"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._watched: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, thread_id: int) -> None:
+        """Commence l'échantillonnage d'un thread"""
+        with self._lock:
+            self._watched[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-stack-sampler", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, thread_id: int) -> Counter:
+        """Arrête l'échantillonnage d'un thread et retourne ses piles agrégées"""
+        with self._lock:
+            return self._watched.pop(thread_id, Counter())
+
+    def _run(self) -> None:
+        """Boucle d'échantillonnage (thread démon)"""
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._watched:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, counts in self._watched.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        counts[format_stack(frame)] += 1
+
+
+class SamplingProfiler:
+    """
+    Échantillonneur continu (temps réel) des piles de tous les threads
+
+    Les piles sont agrégées par groupe de threads (nom sans suffixe numérique),
+    les threads inactifs sont ignorés et le nombre de piles distinctes est borné.
+    """
+
+    def __init__(self, interval: float, max_stacks: int = 10000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._counts: Counter = Counter()
+        self._samples = 0
+        self._since = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Indique si l'échantillonneur tourne"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Démarre l'échantillonnage en arrière-plan"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info("Échantillonneur de piles démarré (%.0f ms)", self.interval * 1000)
+
+    def stop(self) -> None:
+        """Arrête l'échantillonnage"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2 + 1)
+            self._thread = None
+
+    def _loop(self) -> None:
+        """Boucle d'échantillonnage (thread démon)"""
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug("Échantillonnage de piles échoué: %s", e)
+
+    def sample(self) -> None:
+        """Prend un échantillon des piles de tous les threads actifs"""
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = format_stack(frame)
+            if stack.rsplit(";", 1)[-1] in IDLE_LEAVES:
+                continue
+            group = re.sub(r"[-_]\d+$", "", names.get(thread_id, "unknown"))
+            stacks.append(f"{group};{stack}")
+
+        with self._lock:
+            self._samples += 1
+            for stack in stacks:
+                if stack in self._counts or len(self._counts) < self.max_stacks:
+                    self._counts[stack] += 1
+                else:
+                    self._counts["[truncated]"] += 1
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Any]:
+        """Retourne les piles agrégées (et remet à zéro si demandé)"""
+        with self._lock:
+            result = {"counts": dict(self._counts), "samples": self._samples, "since": self._since}
+            if reset:
+                self._counts = Counter()
+                self._samples = 0
+                self._since = time.time()
+        return result
+
+
+class ProfileStore:
+    """Stockage des profils sur disque, indexés par identifiant de requête"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def _path(self, request_id: str, kind: str) -> Path:
+        """Chemin d'un profil (l'identifiant doit être un UUID)"""
+        return self.directory / f"{uuid.UUID(request_id)}{PROFILE_EXTENSIONS[kind]}"
+
+    def save_cprofile(self, request_id: str, profiler: cProfile.Profile) -> Path:
+        """Enregistre un profil cProfile au format pstats"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(request_id, "cprofile")
+        profiler.dump_stats(str(path))
+        self._prune()
+        return path
+
+    def save_collapsed(self, request_id: str, counts: Dict[str, int]) -> Path:
+        """Enregistre des piles échantillonnées au format collapsed"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(request_id, "sampled")
+        path.write_text(render_collapsed(counts))
+        self._prune()
+        return path
+
+    def find(self, request_id: str) -> Optional[Path]:
+        """Retourne le profil d'une requête s'il existe"""
+        try:
+            candidates = [self._path(request_id, kind) for kind in PROFILE_EXTENSIONS]
+        except ValueError:
+            return None
+        for path in candidates:
+            if path.is_file():
+                return path
+        return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Liste les profils disponibles, du plus récent au plus ancien"""
+        profiles = []
+        for path in self._files():
+            kind = next((k for k, ext in PROFILE_EXTENSIONS.items() if path.suffix == ext), None)
+            stat = path.stat()
+            profiles.append({
+                "request_id": path.stem,
+                "kind": kind,
+                "size": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime),
+            })
+        return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+    def _files(self) -> List[Path]:
+        """Fichiers de profils présents dans le répertoire"""
+        if not self.directory.is_dir():
+            return []
+        return [p for p in self.directory.iterdir() if p.suffix in PROFILE_EXTENSIONS.values() and p.is_file()]
+
+    def _prune(self) -> None:
+        """Supprime les profils les plus anciens au-delà de la limite"""
+        files = sorted(self._files(), key=lambda p: p.stat().st_mtime)
+        for path in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning("Impossible de supprimer le profil %s: %s", path, e)
+
+
+profile_store = ProfileStore(settings.profile_dir, settings.profile_max_files)
+stack_sampler = ThreadStackSampler(settings.profile_sample_interval_ms / 1000)
+sampling_profiler = SamplingProfiler(settings.sampling_profiler_interval_ms / 1000)
+
+
+class RequestProfiler:
+    """Profilage d'une conversion exécutée dans un worker"""
+
+    def __init__(self, request_id: str, on_demand: bool = False, slow_threshold: Optional[float] = None,
+                 store: ProfileStore = None, sampler: ThreadStackSampler = None):
+        self.request_id = request_id
+        self.on_demand = on_demand
+        self.slow_threshold = slow_threshold or None
+        self.store = store or profile_store
+        self.sampler = sampler or stack_sampler
+        self.captured: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Indique si un profil peut être capturé pour cette requête"""
+        return self.on_demand or self.slow_threshold is not None
+
+    def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Exécute la fonction en la profilant selon le déclencheur configuré"""
+        if self.on_demand:
+            return self._run_cprofile(func, args, kwargs)
+        if self.slow_threshold is not None:
+            return self._run_sampled(func, args, kwargs)
+        return func(*args, **kwargs)
+
+    def _run_cprofile(self, func, args, kwargs) -> Any:
+        """Profil déterministe complet (à la demande)"""
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            try:
+                path = self.store.save_cprofile(self.request_id, profiler)
+                self.captured = "cprofile"
+                logger.info("🔬 Profil enregistré: %s", path)
+            except Exception as e:
+                logger.warning("Impossible d'enregistrer le profil: %s", e)
+
+    def _run_sampled(self, func, args, kwargs) -> Any:
+        """Échantillonnage conservé uniquement si la conversion dépasse le seuil"""
+        thread_id = threading.get_ident()
+        self.sampler.watch(thread_id)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            counts = self.sampler.unwatch(thread_id)
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.slow_threshold and counts:
+                try:
+                    path = self.store.save_collapsed(self.request_id, counts)
+                    self.captured = "sampled"
+                    logger.warning(
+                        "🐢 Conversion lente (%.2fs), profil échantillonné enregistré: %s", elapsed, path
+                    )
+                except Exception as e:
+                    logger.warning("Impossible d'enregistrer le profil: %s", e)
@@ -0,0 +1,128 @@
+"""
+Mesure de la consommation de ressources (CPU, mémoire) par étape de conversion
+
+- CPU : temps CPU du thread qui exécute l'étape (time.thread_time)
+- RSS : variation de la mémoire résidente du processus (/proc/self/statm)
+- pic RSS : croissance du maximum historique du processus (getrusage), c'est-à-dire
+  de combien l'étape a repoussé le pic mémoire qui dimensionne le conteneur
+- octets alloués : variation de la mémoire suivie par tracemalloc, uniquement
+  lorsque tracemalloc est actif (sinon None : aucun coût ajouté)
+
+Les mesures RSS étant globales au processus, elles sont approximatives quand
+plusieurs conversions s'exécutent en parallèle.
+
+Une étape exécutée sur la boucle d'événements (authentification, réception,
+inventaire) attend des E/S : pendant ses await, d'autres requêtes consomment du
+CPU sur le même thread. Seule sa durée est donc mesurée ; CPU et mémoire ne sont
+relevés que pour les étapes exécutées entièrement dans un thread de travail
+(conversion et fusion), les seules imputées aux quotas.
+"""
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+PROC_STATM = "/proc/self/statm"
+
+
+def read_rss() -> int:
+    """Mémoire résidente actuelle du processus en bytes (0 si indisponible)"""
+    try:
+        with open(PROC_STATM, "rb") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def read_peak_rss() -> int:
+    """Maximum historique de mémoire résidente du processus en bytes"""
+    # ru_maxrss est exprimé en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class StageUsage:
+    """Ressources consommées par une étape (cumulées si l'étape se répète)"""
+    calls: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    rss_delta: int = 0
+    peak_rss_growth: int = 0
+    allocated: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation sérialisable"""
+        return asdict(self)
+
+
+class ResourceProbe:
+    """Relevé des compteurs de ressources au début d'une étape"""
+
+    __slots__ = ("wall", "resources", "cpu", "rss", "peak", "traced")
+
+    def __init__(self, resources: bool = True):
+        self.wall = time.perf_counter()
+        self.resources = resources
+        if not resources:
+            return
+        self.cpu = time.thread_time()
+        self.rss = read_rss()
+        self.peak = read_peak_rss()
+        self.traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+    def finish(self, usage: StageUsage) -> float:
+        """
+        Cumule dans `usage` les ressources consommées depuis le relevé, retourne la durée
+
+        Sans relevé des ressources (resources=False), seule la durée est cumulée.
+        """
+        wall = time.perf_counter() - self.wall
+        usage.calls += 1
+        usage.wall_time += wall
+        if not self.resources:
+            return wall
+        usage.cpu_time += time.thread_time() - self.cpu
+        usage.rss_delta += read_rss() - self.rss
+        usage.peak_rss_growth += max(read_peak_rss() - self.peak, 0)
+        if self.traced is not None and tracemalloc.is_tracing():
+            usage.allocated = (usage.allocated or 0) + tracemalloc.get_traced_memory()[0] - self.traced
+        return wall
+
+
+class UsageStore:
+    """Historique borné des rapports de ressources, indexé par identifiant de requête"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, request_id: str, report: Dict[str, Any]) -> None:
+        """Enregistre le rapport d'une requête (éjecte le plus ancien si plein)"""
+        with self._lock:
+            self._entries[request_id] = report
+            self._entries.move_to_end(request_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Rapport d'une requête (None si inconnu ou éjecté)"""
+        with self._lock:
+            return self._entries.get(request_id)
+
+
+usage_store = UsageStore(settings.resource_history_size)
+
+
+def summarize(stages: Dict[str, StageUsage]) -> Tuple[float, int]:
+    """Temps CPU total et croissance totale du pic RSS sur l'ensemble des étapes"""
+    cpu = sum(usage.cpu_time for usage in stages.values())
+    peak = sum(usage.peak_rss_growth for usage in stages.values())
+    return cpu, peak
@@ -0,0 +1,246 @@
+"""
+Contrôle d'admission des conversions
+
+Le nombre de conversions simultanées est borné ; au-delà, les requêtes
+attendent dans une file bornée pendant une durée limitée. Quand la
+file est pleine ou que l'attente expire, la requête est refusée
+immédiatement avec une estimation du délai avant nouvel essai, plutôt que
+d'ajouter une conversion de plus à un processus déjà saturé.
+
+Chaque conversion réserve en outre sa mémoire estimée : elle n'est admise
+que si la réservation tient dans le budget mémoire des workers et si la
+marge mémoire réelle (cgroup ou /proc/meminfo) reste suffisante. Une
+conversion plus coûteuse que le budget entier est refusée d'emblée.
+
+Les conversions peuvent être réparties en voies (voir app.services.lanes) :
+chaque voie a sa file d'attente et sa limite de conversions simultanées, le
+budget mémoire restant commun. Une grosse conversion en tête de sa voie ne
+bloque ainsi pas les petites des autres voies.
+
+Dans une voie, la place libérée va à la conversion la plus courte (temps
+estimé), avec vieillissement : chaque seconde d'attente retranche `aging`
+secondes à son coût, si bien qu'une grosse conversion finit toujours par
+passer. À coût égal, l'ordre d'arrivée est conservé.
+
+L'état est manipulé uniquement depuis la boucle d'événements : aucun verrou.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Optional
+
+from app.logging_config import get_logger
+from app.metrics import counter, histogram
+from app.services.capacity import MemoryStatus, read_memory_status
+from app.services.lanes import DEFAULT_LANE
+
+logger = get_logger(__name__)
+
+# Poids de la dernière mesure dans la moyenne glissante du temps de service
+SERVICE_TIME_SMOOTHING = 0.2
+
+ADMISSIONS = counter(
+    "msgtopdf_admission_total",
+    "Décisions d'admission des conversions",
+    labelnames=("outcome",)
+)
+ADMISSION_WAIT = histogram(
+    "msgtopdf_admission_wait_seconds",
+    "Attente en file avant admission d'une conversion",
+    labelnames=("lane",)
+)
+
+
+class AdmissionRejectedError(Exception):
+    """Exception pour une conversion refusée faute de capacité"""
+
+    def __init__(self, message: str, reason: str, retry_after: Optional[int]):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class AdmissionTicket:
+    """Place de conversion demandée puis accordée"""
+    memory: int = 0
+    lane: str = DEFAULT_LANE
+    cost: float = 0.0
+    enqueued_at: float = 0.0
+    waiter: Optional[asyncio.Future] = None
+
+
+class AdmissionController:
+    """
+    Limite de conversions simultanées et de mémoire réservée, avec file d'attente bornée
+
+    `lanes` associe à chaque voie sa limite de conversions simultanées ; la
+    file d'attente est bornée à `max_queue` par voie.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 memory_budget: Optional[int] = None, min_free_memory: int = 0,
+                 memory_status: Callable[[], MemoryStatus] = read_memory_status,
+                 lanes: Optional[Dict[str, int]] = None, aging: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_concurrent = max(1, max_concurrent)
+        lanes = lanes or {DEFAULT_LANE: self.max_concurrent}
+        self.lane_limits = {lane: max(1, limit) for lane, limit in lanes.items()}
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.memory_budget = memory_budget
+        self.min_free_memory = min_free_memory
+        self.aging = aging
+        self.service_time = 1.0
+        self._memory_status = memory_status
+        self._clock = clock
+        self._active = 0
+        self._lane_active = dict.fromkeys(self.lane_limits, 0)
+        self._reserved = 0
+        self._waiters: Dict[str, Deque[AdmissionTicket]] = {lane: deque() for lane in self.lane_limits}
+
+    @property
+    def active(self) -> int:
+        """Nombre de conversions admises en cours"""
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        """Nombre de requêtes en attente d'admission"""
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def lane_status(self) -> Dict[str, Dict[str, int]]:
+        """Limite, conversions admises et file d'attente de chaque voie"""
+        return {
+            lane: {"limit": limit, "active": self._lane_active[lane], "queued": len(self._waiters[lane])}
+            for lane, limit in self.lane_limits.items()
+        }
+
+    @property
+    def reserved_memory(self) -> int:
+        """Mémoire réservée par les conversions admises (bytes)"""
+        return self._reserved
+
+    def retry_after(self, lane: str = None) -> int:
+        """Délai estimé (secondes) avant qu'une place se libère pour un nouvel arrivant"""
+        if lane is None:
+            rounds = (self.queued + 1) / self.max_concurrent
+        else:
+            rounds = (len(self._waiters[lane]) + 1) / self.lane_limits[lane]
+        return max(1, math.ceil(self.service_time * rounds))
+
+    def _fits(self, memory: int, lane: str = DEFAULT_LANE) -> bool:
+        """Indique si une conversion de ce coût mémoire peut démarrer maintenant dans la voie"""
+        if self._active >= self.max_concurrent:
+            return False
+        if self._lane_active[lane] >= self.lane_limits[lane]:
+            return False
+        if self.memory_budget is not None and self._reserved + memory > self.memory_budget:
+            return False
+        if memory and self.min_free_memory:
+            headroom = self._memory_status().headroom
+            if headroom is not None and headroom - memory < self.min_free_memory:
+                return False
+        return True
+
+    def _grant(self, ticket: AdmissionTicket) -> None:
+        """Attribue la place et la réservation mémoire"""
+        self._active += 1
+        self._lane_active[ticket.lane] += 1
+        self._reserved += ticket.memory
+
+    async def acquire(self, memory: int = 0, lane: str = DEFAULT_LANE, cost: float = 0.0) -> AdmissionTicket:
+        """
+        Attend une place de conversion dans la voie et réserve la mémoire estimée
+
+        `cost` est le temps de conversion estimé (secondes), utilisé pour
+        servir les conversions les plus courtes en premier.
+
+        Raises:
+            AdmissionRejectedError: Si la conversion dépasse le budget mémoire,
+                si la file est pleine ou si l'attente expire
+        """
+        ticket = AdmissionTicket(memory=memory, lane=lane, cost=cost)
+        waiters = self._waiters[lane]
+        if self.memory_budget is not None and memory > self.memory_budget:
+            ADMISSIONS.inc(outcome="too_large")
+            raise AdmissionRejectedError(
+                f"Conversion trop coûteuse: {memory // (1024 * 1024)} MB estimés, "
+                f"budget mémoire {self.memory_budget // (1024 * 1024)} MB",
+                "too_large", None
+            )
+
+        if not waiters and self._fits(memory, lane):
+            self._grant(ticket)
+            ADMISSIONS.inc(outcome="admitted")
+            ADMISSION_WAIT.observe(0.0, lane=lane)
+            return ticket
+
+        if len(waiters) >= self.max_queue:
+            ADMISSIONS.inc(outcome="queue_full")
+            raise AdmissionRejectedError(
+                "Capacité de conversion saturée, réessayez plus tard", "queue_full", self.retry_after(lane)
+            )
+
+        ticket.waiter = asyncio.get_running_loop().create_future()
+        ticket.enqueued_at = self._clock()
+        waiters.append(ticket)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(ticket.waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(ticket)
+            ADMISSIONS.inc(outcome="timeout")
+            logger.warning("⏳ Attente d'admission expirée après %.1fs", time.monotonic() - start)
+            raise AdmissionRejectedError(
+                "Délai d'attente de conversion dépassé, réessayez plus tard", "timeout", self.retry_after(lane)
+            )
+        except asyncio.CancelledError:
+            if ticket.waiter.done() and not ticket.waiter.cancelled():
+                # La place venait d'être accordée : on la rend
+                self.release(ticket)
+            else:
+                self._discard(ticket)
+            raise
+        ADMISSIONS.inc(outcome="admitted")
+        ADMISSION_WAIT.observe(time.monotonic() - start, lane=lane)
+        return ticket
+
+    def release(self, ticket: AdmissionTicket, service_time: float = None) -> None:
+        """Libère une place et sa réservation, puis admet les suivants qui tiennent"""
+        if service_time is not None:
+            self.service_time += SERVICE_TIME_SMOOTHING * (service_time - self.service_time)
+        self._active -= 1
+        self._lane_active[ticket.lane] -= 1
+        self._reserved -= ticket.memory
+        self._wake()
+
+    def _next(self, waiters: Deque[AdmissionTicket]) -> AdmissionTicket:
+        """Demandeur prioritaire : coût estimé le plus faible après vieillissement"""
+        now = self._clock()
+        return min(waiters, key=lambda ticket: ticket.cost - self.aging * (now - ticket.enqueued_at))
+
+    def _wake(self) -> None:
+        """Admet, voie par voie et par priorité, les demandeurs qui tiennent dans la capacité libre"""
+        for lane, waiters in self._waiters.items():
+            if any(ticket.waiter.done() for ticket in waiters):
+                self._waiters[lane] = waiters = deque(ticket for ticket in waiters if not ticket.waiter.done())
+            while waiters:
+                ticket = self._next(waiters)
+                # Le prioritaire n'est pas doublé : une grosse conversion finit par obtenir sa mémoire
+                if not self._fits(ticket.memory, ticket.lane):
+                    break
+                waiters.remove(ticket)
+                self._grant(ticket)
+                ticket.waiter.set_result(None)
+
+    def _discard(self, ticket: AdmissionTicket) -> None:
+        """Retire un demandeur de la file"""
+        try:
+            self._waiters[ticket.lane].remove(ticket)
+        except ValueError:
+            pass
+        # Le demandeur retiré bloquait peut-être ceux qui le suivent
+        self._wake()
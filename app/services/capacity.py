@@ -0,0 +1,190 @@
+"""
+Suivi de la capacité de conversion : pool de workers et mémoire disponible
+
+Toutes les lectures de ce module sont locales (compteurs en mémoire, /proc,
+/sys/fs/cgroup) afin de pouvoir être utilisées par les sondes de santé sans
+jamais bloquer sur une entrée/sortie réseau.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from app.logging_config import get_logger
+from app.services.lanes import DEFAULT_LANE
+
+logger = get_logger(__name__)
+
+CGROUP_V2_MEMORY_MAX = "/sys/fs/cgroup/memory.max"
+CGROUP_V2_MEMORY_CURRENT = "/sys/fs/cgroup/memory.current"
+CGROUP_V1_MEMORY_LIMIT = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+CGROUP_V1_MEMORY_USAGE = "/sys/fs/cgroup/memory/memory.usage_in_bytes"
+PROC_MEMINFO = "/proc/meminfo"
+
+
+class ConversionPool:
+    """
+    Pool de threads dédié aux conversions, avec compteurs de charge
+
+    Les workers peuvent être répartis entre plusieurs voies (voir
+    app.services.lanes) : chaque voie a ses propres threads, si bien qu'une
+    voie saturée n'occupe jamais les workers des autres.
+    """
+
+    def __init__(self, max_workers: int, lanes: Optional[Dict[str, int]] = None):
+        if not lanes:
+            lanes = {DEFAULT_LANE: max_workers}
+        self._executors = {
+            lane: ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"msg-convert-{lane}")
+            for lane, workers in lanes.items()
+        }
+        self.lane_workers = {lane: max(1, workers) for lane, workers in lanes.items()}
+        self.max_workers = sum(self.lane_workers.values())
+        self._lock = threading.Lock()
+        self._queued = dict.fromkeys(lanes, 0)
+        self._busy = dict.fromkeys(lanes, 0)
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Exécute une fonction bloquante dans la première voie du pool"""
+        return await self.run_in_lane(next(iter(self._executors)), func, *args, **kwargs)
+
+    async def run_in_lane(self, lane: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Exécute une fonction bloquante dans les workers d'une voie sans bloquer la boucle d'événements
+
+        Le contexte (contextvars) de l'appelant est propagé au thread de travail.
+        """
+        loop = asyncio.get_running_loop()
+        state = {"started": False, "abandoned": False}
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, self._execute, lane, state, func, args, kwargs)
+
+        with self._lock:
+            self._queued[lane] += 1
+        try:
+            return await loop.run_in_executor(self._executors[lane], call)
+        finally:
+            with self._lock:
+                if not state["started"]:
+                    # Annulé avant d'avoir démarré : la tâche ne s'exécutera pas
+                    state["abandoned"] = True
+                    self._queued[lane] -= 1
+
+    def _execute(self, lane: str, state: Dict[str, bool], func: Callable[..., Any], args, kwargs) -> Any:
+        """Exécution dans le thread de travail avec mise à jour des compteurs"""
+        with self._lock:
+            if state["abandoned"]:
+                return None
+            state["started"] = True
+            self._queued[lane] -= 1
+            self._busy[lane] += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._busy[lane] -= 1
+
+    @property
+    def queue_depth(self) -> int:
+        """Nombre de conversions en attente d'un worker"""
+        return sum(self._queued.values())
+
+    @property
+    def busy_workers(self) -> int:
+        """Nombre de workers occupés"""
+        return sum(self._busy.values())
+
+    def lane_status(self) -> Dict[str, Dict[str, int]]:
+        """Workers, workers occupés et file d'attente de chaque voie"""
+        return {
+            lane: {"workers": workers, "busy": self._busy[lane], "queued": self._queued[lane]}
+            for lane, workers in self.lane_workers.items()
+        }
+
+    def shutdown(self) -> None:
+        """Arrête le pool sans attendre les conversions en cours"""
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
+
+
+@dataclass
+class MemoryStatus:
+    """État mémoire du conteneur (ou de l'hôte à défaut de cgroup)"""
+    limit: Optional[int]
+    used: Optional[int]
+    headroom: Optional[int]
+    source: str
+
+
+def _read_int(path: str) -> Optional[int]:
+    """Lit un entier dans un fichier de /sys ou /proc (None si absent ou illimité)"""
+    try:
+        with open(path, "r") as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    if not value or value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _read_meminfo() -> Dict[str, int]:
+    """Lit /proc/meminfo (valeurs en bytes)"""
+    values = {}
+    try:
+        with open(PROC_MEMINFO, "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if parts:
+                    values[key] = int(parts[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def read_memory_status() -> MemoryStatus:
+    """
+    Retourne la mémoire disponible en privilégiant la limite cgroup (v2 puis v1)
+
+    Sans limite cgroup effective, la mémoire disponible de l'hôte est utilisée.
+    """
+    meminfo = _read_meminfo()
+    total = meminfo.get("MemTotal")
+
+    for limit_path, usage_path, source in (
+        (CGROUP_V2_MEMORY_MAX, CGROUP_V2_MEMORY_CURRENT, "cgroup_v2"),
+        (CGROUP_V1_MEMORY_LIMIT, CGROUP_V1_MEMORY_USAGE, "cgroup_v1"),
+    ):
+        used = _read_int(usage_path)
+        if used is None:
+            continue
+        limit = _read_int(limit_path)
+        # cgroup v1 exprime "illimité" par une valeur énorme
+        if limit is not None and (total is None or limit < total):
+            return MemoryStatus(limit=limit, used=used, headroom=max(limit - used, 0), source=source)
+
+    if total is None:
+        return MemoryStatus(limit=None, used=None, headroom=None, source="unknown")
+
+    available = meminfo.get("MemAvailable", meminfo.get("MemFree", 0))
+    return MemoryStatus(limit=total, used=total - available, headroom=available, source="meminfo")
+
+
+def default_memory_budget(configured_mb: int, fraction: float = 0.75) -> Optional[int]:
+    """
+    Budget mémoire des conversions en bytes
+
+    Valeur configurée si elle est positive, sinon une fraction de la limite
+    mémoire (cgroup ou hôte). None si la limite est inconnue.
+    """
+    if configured_mb > 0:
+        return configured_mb * 1024 * 1024
+    limit = read_memory_status().limit
+    return int(limit * fraction) if limit else None
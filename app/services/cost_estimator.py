@@ -0,0 +1,132 @@
+"""
+Estimation du coût d'une conversion à partir de l'inventaire du .msg
+
+L'estimation mémoire majore le pic de mémoire d'une conversion :
+- le fichier .msg et ses copies (lecture, parsing, PDF principal)
+- la plus grande image décodée (pixels x octets par pixel, plus la copie de
+  conversion, ou à défaut une expansion de la taille compressée) : les
+  images sont décodées l'une après l'autre, seul le décodage le plus coûteux
+  compte
+- les sorties accumulées jusqu'à la fusion : PDF de chaque image (de l'ordre
+  de sa taille compressée) et chaque PDF joint relu puis réécrit
+
+L'estimation du temps de conversion est linéaire en la taille du fichier,
+le nombre de pièces jointes, les mégapixels des images et les pages des PDFs.
+
+L'estimation du temps est ensuite corrigée par CostModel d'après le temps
+d'exécution mesuré des conversions (rapport médian mesuré/estimé, hors attente
+d'un worker). L'estimation mémoire n'est pas calibrée : les mesures mémoire
+(RSS, pic RSS, tracemalloc) sont globales au processus et ne peuvent pas être
+imputées à une conversion lorsque plusieurs s'exécutent en parallèle.
+"""
+import statistics
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque
+
+from app.services.manifest import MessageManifest
+
+MB = 1024 * 1024
+
+BASE_MEMORY = 32 * MB
+UPLOAD_MEMORY_FACTOR = 3
+IMAGE_BYTES_PER_PIXEL = 4
+IMAGE_MEMORY_FACTOR = 2
+IMAGE_EXPANSION_FALLBACK = 10
+PDF_MEMORY_FACTOR = 3
+
+# Temps de conversion a priori (secondes), avant calibration
+BASE_TIME = 0.2
+TIME_PER_UPLOAD_MB = 0.02
+TIME_PER_ATTACHMENT = 0.01
+TIME_PER_MEGAPIXEL = 0.05
+TIME_PER_PDF_PAGE = 0.01
+# Sans nombre de pages lisible : une page estimée par tranche de 100 Ko
+PDF_BYTES_PER_PAGE = 100 * 1024
+# Sans dimensions lisibles : une image compressée d'1 Mo estimée à 10 mégapixels
+IMAGE_PIXELS_PER_BYTE = 10
+
+# Calibration
+CALIBRATION_MIN_SAMPLES = 20
+CALIBRATION_FACTOR_RANGE = (0.1, 10.0)
+
+
+@dataclass
+class CostEstimate:
+    """Coût estimé d'une conversion"""
+    memory: int
+    wall_time: float
+
+
+def estimate_memory(manifest: MessageManifest) -> int:
+    """Mémoire estimée (bytes) nécessaire à la conversion"""
+    largest_decode = 0
+    output = 0
+    for attachment in manifest.attachments:
+        if attachment.kind == "image":
+            if attachment.pixels is not None:
+                decode = attachment.pixels * IMAGE_BYTES_PER_PIXEL * IMAGE_MEMORY_FACTOR
+            else:
+                decode = attachment.size * IMAGE_EXPANSION_FALLBACK
+            largest_decode = max(largest_decode, decode)
+            output += attachment.size
+        elif attachment.kind == "pdf":
+            output += attachment.size * PDF_MEMORY_FACTOR
+    return BASE_MEMORY + UPLOAD_MEMORY_FACTOR * manifest.upload_size + largest_decode + output
+
+
+def estimate_wall_time(manifest: MessageManifest) -> float:
+    """Temps de conversion estimé (secondes), avant calibration"""
+    wall_time = BASE_TIME + TIME_PER_UPLOAD_MB * manifest.upload_size / MB
+    wall_time += TIME_PER_ATTACHMENT * len(manifest.attachments)
+    for attachment in manifest.attachments:
+        if attachment.kind == "image":
+            pixels = attachment.pixels if attachment.pixels is not None else attachment.size * IMAGE_PIXELS_PER_BYTE
+            wall_time += TIME_PER_MEGAPIXEL * pixels / 1_000_000
+        elif attachment.kind == "pdf":
+            pages = attachment.pages if attachment.pages is not None else attachment.size // PDF_BYTES_PER_PAGE + 1
+            wall_time += TIME_PER_PDF_PAGE * pages
+    return wall_time
+
+
+def _clamp(factor: float) -> float:
+    """Borne un facteur de correction"""
+    low, high = CALIBRATION_FACTOR_RANGE
+    return min(max(factor, low), high)
+
+
+class CostModel:
+    """
+    Estimations de coût, le temps corrigé par l'historique des conversions mesurées
+
+    Manipulé uniquement depuis la boucle d'événements : aucun verrou.
+    """
+
+    def __init__(self, history_size: int = 500, min_samples: int = CALIBRATION_MIN_SAMPLES):
+        self.min_samples = min_samples
+        # Par conversion : rapport temps d'exécution mesuré/estimé
+        self._history: Deque[float] = deque(maxlen=max(1, history_size))
+        self.time_factor = 1.0
+
+    @property
+    def samples(self) -> int:
+        """Nombre de conversions mesurées dans l'historique"""
+        return len(self._history)
+
+    def estimate(self, manifest: MessageManifest) -> CostEstimate:
+        """Coût estimé et calibré d'une conversion"""
+        return CostEstimate(
+            memory=estimate_memory(manifest),
+            wall_time=estimate_wall_time(manifest) * self.time_factor
+        )
+
+    def observe(self, manifest: MessageManifest, wall_time: float) -> None:
+        """Enregistre le temps d'exécution mesuré d'une conversion et recalibre le facteur de temps"""
+        self._history.append(wall_time / estimate_wall_time(manifest))
+        if len(self._history) >= self.min_samples:
+            self.time_factor = _clamp(statistics.median(self._history))
+
+    def reset(self) -> None:
+        """Oublie l'historique et revient aux estimations a priori"""
+        self._history.clear()
+        self.time_factor = 1.0
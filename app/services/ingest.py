@@ -0,0 +1,119 @@
+"""
+Réception des fichiers .msg en un seul passage
+
+Chaque bloc reçu est vérifié, haché (SHA-256, pour le cache et la
+déduplication), compté et copié dans un tampon unique, sans relecture ni copie
+intermédiaire :
+- les premiers octets doivent porter la signature d'un conteneur OLE
+  (D0 CF 11 E0 A1 B1 1A E1) : tout autre contenu est refusé dès le premier
+  bloc, avant fichier temporaire et analyse par extract_msg ;
+- la réception s'arrête dès que la taille maximale est dépassée ;
+- le tampon est une projection mmap anonyme privée, agrandie par doublement
+  (mremap, sans recopie des octets reçus) puis ramenée à la taille reçue : le pic
+  mémoire reste celui du fichier plus un bloc, et le contenu est lu ensuite
+  comme une projection (inventaire sans copie).
+"""
+import hashlib
+import mmap
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Union
+
+from fastapi import UploadFile
+
+from app.metrics import BYTES_RECEIVED
+
+OLE_SIGNATURE = bytes.fromhex("D0CF11E0A1B11AE1")
+INGEST_CHUNK_SIZE = 1024 * 1024
+
+# Corps brut de /convert/raw
+RAW_MSG_CONTENT_TYPE = "application/vnd.ms-outlook"
+RAW_MSG_DEFAULT_FILENAME = "message.msg"
+
+
+class InvalidUploadError(Exception):
+    """Exception pour un contenu qui n'est pas un fichier .msg (conteneur OLE)"""
+    pass
+
+
+class UploadTooLargeError(Exception):
+    """Exception pour un fichier dépassant la taille maximale"""
+    pass
+
+
+@dataclass
+class IngestedUpload:
+    """Fichier reçu : contenu (projection mmap du tampon de réception ou d'un fichier local), taille et empreinte SHA-256"""
+    content: Union[bytes, mmap.mmap]
+    size: int
+    sha256: str
+
+
+class UploadIngestor:
+    """Vérification de signature, hachage et comptage d'un envoi au fil des blocs"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer: Optional[mmap.mmap] = None
+        self._head = b""
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Traite un bloc reçu
+
+        Raises:
+            InvalidUploadError: Si le début du contenu n'est pas une signature OLE
+            UploadTooLargeError: Si la taille maximale est dépassée
+        """
+        if not chunk:
+            return
+        if len(self._head) < len(OLE_SIGNATURE):
+            self._head += chunk[:len(OLE_SIGNATURE) - len(self._head)]
+            if not OLE_SIGNATURE.startswith(self._head):
+                raise InvalidUploadError("Le fichier n'est pas un message Outlook (.msg) valide")
+        self.size += len(chunk)
+        BYTES_RECEIVED.inc(len(chunk))
+        if self.size > self.max_size:
+            raise UploadTooLargeError(f"Fichier trop volumineux. Limite: {self.max_size} bytes")
+        self._hash.update(chunk)
+        self._reserve(self.size)
+        self._buffer[self.size - len(chunk):self.size] = chunk
+
+    def _reserve(self, size: int) -> None:
+        """Agrandit le tampon pour contenir `size` octets (capacité doublée, bornée par la taille maximale)"""
+        if self._buffer is None:
+            # Projection privée : une projection anonyme partagée ne peut pas être agrandie
+            self._buffer = mmap.mmap(-1, max(size, min(INGEST_CHUNK_SIZE, self.max_size)), flags=mmap.MAP_PRIVATE)
+        elif size > len(self._buffer):
+            self._buffer.resize(max(size, min(2 * len(self._buffer), self.max_size)))
+
+    def finish(self) -> IngestedUpload:
+        """
+        Termine la réception
+
+        Raises:
+            InvalidUploadError: Si le contenu est plus court que la signature OLE
+        """
+        if len(self._head) < len(OLE_SIGNATURE):
+            raise InvalidUploadError("Le fichier n'est pas un message Outlook (.msg) valide")
+        content, self._buffer = self._buffer, None
+        content.resize(self.size)
+        return IngestedUpload(content=content, size=self.size, sha256=self._hash.hexdigest())
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: int = INGEST_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Blocs d'un fichier multipart"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def ingest_upload(chunks: AsyncIterator[bytes], max_size: int) -> IngestedUpload:
+    """Reçoit un fichier .msg bloc par bloc (signature, taille et empreinte en un passage)"""
+    ingestor = UploadIngestor(max_size)
+    async for chunk in chunks:
+        ingestor.feed(chunk)
+    return ingestor.finish()
@@ -0,0 +1,110 @@
+"""
+Voies de conversion selon le coût estimé
+
+Les petits messages (texte seul, quelques centaines de Ko) ne doivent pas
+attendre derrière des envois de photos de plusieurs dizaines de Mo. Chaque
+conversion est orientée vers une voie d'après son coût mémoire estimé
+(taille du fichier et inventaire des pièces jointes) ; chaque voie a sa propre
+file d'admission, sa part de conversions simultanées et ses propres workers.
+
+Format de configuration : "voie=coût_max_MB/part", séparés par des virgules,
+dans l'ordre croissant des coûts ; un coût maximal de 0 signifie "sans borne"
+(dernière voie). Exemple : "interactive=48/0.5,bulk=0/0.5".
+"""
+from dataclasses import dataclass
+from typing import Dict, List
+
+from app.metrics import counter
+
+DEFAULT_LANE = "default"
+
+LANE_ROUTED = counter(
+    "msgtopdf_conversion_lane_total",
+    "Conversions admises dans chaque voie",
+    labelnames=("lane",)
+)
+
+
+@dataclass(frozen=True)
+class Lane:
+    """Voie de conversion : coût estimé maximal (bytes, 0 = sans borne) et part des workers"""
+    name: str
+    max_cost: int
+    share: float
+
+
+def parse_lanes(value: str) -> List[Lane]:
+    """
+    Parse la configuration des voies
+
+    Sans voie configurée, une voie unique sans borne reçoit tous les workers.
+    """
+    lanes = []
+    for item in value.split(","):
+        name, sep, spec = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        parts = [part.strip() for part in spec.split("/")]
+        if len(parts) != 2:
+            raise ValueError(f"Voie de conversion invalide: {item.strip()}")
+        share = float(parts[1])
+        if share <= 0:
+            raise ValueError(f"Part de workers invalide pour la voie {name.strip()}: {parts[1]}")
+        lanes.append(Lane(name.strip(), int(float(parts[0]) * 1024 * 1024), share))
+    if not lanes:
+        return [Lane(DEFAULT_LANE, 0, 1.0)]
+    if lanes[-1].max_cost:
+        raise ValueError("La dernière voie de conversion doit être sans borne (coût maximal 0)")
+    return lanes
+
+
+def check_capacity(lanes: List[Lane], capacities: Dict[str, int]) -> None:
+    """
+    Vérifie que chaque capacité configurée (paramètre -> valeur) offre au moins une place par voie
+
+    Raises:
+        ValueError: Si une capacité est inférieure au nombre de voies
+    """
+    for setting, total in capacities.items():
+        if total < len(lanes):
+            names = ", ".join(lane.name for lane in lanes)
+            raise ValueError(
+                f"Capacité insuffisante: {setting}={total} pour {len(lanes)} voies de conversion ({names})"
+            )
+
+
+def split_capacity(lanes: List[Lane], total: int) -> Dict[str, int]:
+    """
+    Répartit une capacité (workers, conversions simultanées) entre les voies, au moins 1 par voie
+
+    Méthode du plus fort reste : les parts somment exactement à la capacité. Une
+    capacité inférieure au nombre de voies (refusée au démarrage par
+    check_capacity) donne une place à chaque voie.
+    """
+    if total < len(lanes):
+        return {lane.name: 1 for lane in lanes}
+    shares = sum(lane.share for lane in lanes)
+    quotas = [total * lane.share / shares for lane in lanes]
+    parts = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(lanes)), key=lambda i: quotas[i] - parts[i], reverse=True)
+    for i in by_remainder[:total - sum(parts)]:
+        parts[i] += 1
+    # Une voie sans part en reçoit une, prise à la voie la mieux dotée
+    for i, part in enumerate(parts):
+        if part == 0:
+            parts[parts.index(max(parts))] -= 1
+            parts[i] = 1
+    return {lane.name: part for lane, part in zip(lanes, parts)}
+
+
+def select_lane(lanes: List[Lane], cost: int) -> Lane:
+    """
+    Première voie dont la borne couvre le coût estimé
+
+    Le compteur de la voie n'est incrémenté qu'à l'admission de la conversion
+    (LANE_ROUTED), pas pour un dry-run ou une conversion refusée.
+    """
+    for lane in lanes:
+        if not lane.max_cost or cost <= lane.max_cost:
+            return lane
+    return lanes[-1]
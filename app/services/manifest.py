@@ -0,0 +1,325 @@
+"""
+Inventaire rapide des pièces jointes d'un fichier .msg
+
+Le fichier .msg est un conteneur OLE : la table des répertoires donne la
+taille de chaque pièce jointe sans la décoder. Les flux ne sont jamais lus en
+entier : seuls les secteurs couvrant les plages utiles sont lus. Pour les
+images, seul l'en-tête est analysé afin d'obtenir les dimensions, sans décoder
+les pixels. Pour les PDFs, le nombre de pages est lu dans l'arbre des pages,
+atteint depuis la fin du fichier (startxref, table xref, trailer, catalogue) ;
+sinon il reste inconnu et l'estimation se rabat sur la taille du PDF.
+Cet inventaire sert à estimer le coût d'une conversion avant de l'admettre,
+donc avant toute réservation mémoire : sa consommation doit rester bornée.
+"""
+import io
+import mmap
+import re
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+import olefile
+from PIL import Image
+
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp'}
+IMAGE_HEADER_BYTES = 64 * 1024
+
+# Lectures bornées d'un PDF : fin du fichier, trailer ou objet, en-tête de sous-section xref
+PDF_TAIL_BYTES = 2048
+PDF_READ_BYTES = 16 * 1024
+PDF_LINE_BYTES = 64
+PDF_XREF_ENTRY_BYTES = 20
+PDF_MAX_SECTIONS = 32
+PDF_MAX_SUBSECTIONS = 1024
+
+PDF_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF")
+PDF_ROOT = re.compile(rb"/Root\s+(\d+)\s+(\d+)\s+R")
+PDF_PAGES = re.compile(rb"/Pages\s+(\d+)\s+(\d+)\s+R")
+PDF_COUNT = re.compile(rb"/Count\s+(\d+)")
+PDF_PREV = re.compile(rb"/Prev\s+(\d+)")
+PDF_XREF = re.compile(rb"xref\s")
+PDF_XREF_SUBSECTION = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*\r?\n")
+PDF_TRAILER = re.compile(rb"\s*trailer")
+
+# Lecture d'une plage (position, longueur) d'un contenu
+ReadAt = Callable[[int, int], bytes]
+
+# Attributs internes d'OleFileIO (olefile 0.47) utilisés pour lire les secteurs d'un flux
+OLEFILE_INTERNALS = ("direntries", "_find", "fat", "fp", "sectorsize", "minisectorcutoff")
+
+ATTACHMENT_PREFIX = "__attach_version1.0_#"
+ATTACH_DATA_BINARY = "__substg1.0_37010102"
+ATTACH_DATA_OBJECT = "__substg1.0_3701000D"
+# Nom long puis nom court, en Unicode (001F) ou en 8 bits (001E)
+ATTACH_FILENAME_STREAMS = (
+    ("__substg1.0_3707001F", "utf-16-le"),
+    ("__substg1.0_3704001F", "utf-16-le"),
+    ("__substg1.0_3707001E", "latin-1"),
+    ("__substg1.0_3704001E", "latin-1"),
+)
+
+
+@dataclass
+class AttachmentInfo:
+    """Description d'une pièce jointe issue de l'inventaire"""
+    filename: str
+    kind: str  # pdf, image, message ou other
+    size: int
+    pixels: Optional[int] = None
+    pages: Optional[int] = None
+
+
+@dataclass
+class MessageManifest:
+    """Inventaire d'un fichier .msg"""
+    upload_size: int
+    attachments: List[AttachmentInfo] = field(default_factory=list)
+    readable: bool = True
+
+    def count(self, kind: str) -> int:
+        """Nombre de pièces jointes d'un type"""
+        return sum(1 for attachment in self.attachments if attachment.kind == kind)
+
+
+def attachment_kind(filename: str) -> str:
+    """Type de pièce jointe d'après l'extension"""
+    suffix = Path(filename.lower()).suffix
+    if suffix == ".pdf":
+        return "pdf"
+    if suffix in IMAGE_EXTENSIONS:
+        return "image"
+    return "other"
+
+
+def _read_filename(ole: olefile.OleFileIO, storage: str) -> str:
+    """Nom de fichier d'une pièce jointe"""
+    for stream, encoding in ATTACH_FILENAME_STREAMS:
+        path = f"{storage}/{stream}"
+        if ole.exists(path):
+            return ole.openstream(path).read().decode(encoding, errors="replace").rstrip("\x00")
+    return ""
+
+
+class StreamReader:
+    """
+    Lecture de plages d'un flux du conteneur OLE sans charger le flux entier
+
+    olefile lit un flux entier à son ouverture : pour les flux stockés dans la
+    FAT, seuls les secteurs couvrant la plage demandée sont lus, d'après la
+    chaîne des secteurs du flux. Les petits flux (mini-stream, moins de 4 Ko)
+    sont lus via olefile, de même que tout flux si les attributs internes
+    d'olefile utilisés (OLEFILE_INTERNALS) venaient à manquer.
+    """
+
+    def __init__(self, ole: olefile.OleFileIO, path: str):
+        self.size = ole.get_size(path)
+        self._ole = ole
+        self._path = path
+        self._sectors: Optional[array] = None
+        if all(hasattr(ole, name) for name in OLEFILE_INTERNALS) and self.size >= ole.minisectorcutoff:
+            entry = ole.direntries[ole._find(path)]
+            self._sectors = self._sector_chain(entry.isectStart)
+
+    def _sector_chain(self, start: int) -> array:
+        """Secteurs du flux, dans l'ordre (4 octets par secteur)"""
+        fat = self._ole.fat
+        needed = -(-self.size // self._ole.sectorsize)
+        sectors = array("I")
+        sector = start
+        while len(sectors) < needed:
+            if sector >= len(fat) or sector >= olefile.MAXREGSECT:
+                raise IOError(f"Chaîne de secteurs invalide pour {self._path}")
+            sectors.append(sector)
+            sector = fat[sector]
+        return sectors
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Octets [offset, offset + length) du flux, tronqués à sa fin"""
+        length = min(length, self.size - offset)
+        if offset < 0 or length <= 0:
+            return b""
+        if self._sectors is None:
+            stream = self._ole.openstream(self._path)
+            stream.seek(offset)
+            return stream.read(length)
+
+        sector_size = self._ole.sectorsize
+        first, last = offset // sector_size, (offset + length - 1) // sector_size
+        chunks = []
+        for index in range(first, last + 1):
+            self._ole.fp.seek(sector_size * (self._sectors[index] + 1))
+            chunks.append(self._ole.fp.read(sector_size))
+        start = offset - first * sector_size
+        return b"".join(chunks)[start:start + length]
+
+
+def _read_image_pixels(reader: StreamReader) -> Optional[int]:
+    """Nombre de pixels d'une image d'après son en-tête (None si illisible)"""
+    try:
+        header = reader.read(0, IMAGE_HEADER_BYTES)
+        with Image.open(io.BytesIO(header)) as image:
+            width, height = image.size
+        return width * height
+    except Exception:
+        return None
+
+
+def _read_xref_section(read: ReadAt, offset: int) -> Tuple[List[Tuple[int, int, int]], bytes]:
+    """
+    Table xref classique à la position donnée
+
+    Returns:
+        Tuple contenant (sous-sections (premier objet, nombre d'objets, position des
+        entrées), dictionnaire du trailer qui suit la table)
+    """
+    if not PDF_XREF.match(read(offset, 5)):
+        raise ValueError("Table xref attendue")
+    position = offset + 4
+    subsections = []
+    for _ in range(PDF_MAX_SUBSECTIONS):
+        line = read(position, PDF_LINE_BYTES)
+        if PDF_TRAILER.match(line):
+            trailer = read(position, PDF_READ_BYTES)
+            end = trailer.find(b"startxref")
+            return subsections, trailer[:end if end >= 0 else len(trailer)]
+        match = PDF_XREF_SUBSECTION.match(line)
+        if not match:
+            raise ValueError("Sous-section xref illisible")
+        first, count = int(match.group(1)), int(match.group(2))
+        subsections.append((first, count, position + match.end()))
+        position += match.end() + count * PDF_XREF_ENTRY_BYTES
+    raise ValueError("Table xref trop longue")
+
+
+def _object_offset(read: ReadAt, sections: List[List[Tuple[int, int, int]]], number: int) -> Optional[int]:
+    """Position d'un objet d'après les tables xref, de la plus récente à la plus ancienne"""
+    for subsections in sections:
+        for first, count, entries in subsections:
+            if first <= number < first + count:
+                entry = read(entries + (number - first) * PDF_XREF_ENTRY_BYTES, PDF_XREF_ENTRY_BYTES)
+                if entry[17:18] != b"n":
+                    return None
+                return int(entry[:10])
+    return None
+
+
+def _read_object(read: ReadAt, sections: List[List[Tuple[int, int, int]]],
+                 reference: Tuple[bytes, bytes]) -> Optional[bytes]:
+    """Début du corps de l'objet "n g obj" (au plus PDF_READ_BYTES)"""
+    number, generation = reference
+    offset = _object_offset(read, sections, int(number))
+    if offset is None:
+        return None
+    data = read(offset, PDF_READ_BYTES)
+    match = re.match(rb"\s*" + number + rb"\s+" + generation + rb"\s+obj\b", data)
+    if not match:
+        return None
+    end = data.find(b"endobj", match.end())
+    return data[match.end():end if end >= 0 else len(data)]
+
+
+def read_pdf_page_count(read: ReadAt, size: int) -> Optional[int]:
+    """
+    Nombre de pages d'un PDF par lectures bornées depuis sa fin
+
+    startxref désigne la dernière table xref ; son trailer désigne le catalogue
+    (/Root), qui désigne la racine de l'arbre des pages et son /Count. Les mises
+    à jour incrémentales sont suivies par /Prev. None si le PDF utilise des flux
+    xref (objets compressés) ou si sa structure est illisible (table xref ou
+    entrée corrompue, position hors du fichier).
+    """
+    tail = read(max(0, size - PDF_TAIL_BYTES), PDF_TAIL_BYTES)
+    matches = list(PDF_STARTXREF.finditer(tail))
+    if not matches:
+        return None
+    offset = int(matches[-1].group(1))
+    sections = []
+    root = None
+    try:
+        for _ in range(PDF_MAX_SECTIONS):
+            subsections, trailer = _read_xref_section(read, offset)
+            sections.append(subsections)
+            root = root or PDF_ROOT.search(trailer)
+            previous = PDF_PREV.search(trailer)
+            if not previous:
+                break
+            offset = int(previous.group(1))
+    except (ValueError, IndexError, OSError):
+        if not sections:
+            return None
+    try:
+        catalog = _read_object(read, sections, root.groups()) if root else None
+        pages = PDF_PAGES.search(catalog) if catalog else None
+        tree = _read_object(read, sections, pages.groups()) if pages else None
+    except (ValueError, IndexError, OSError):
+        return None
+    count = PDF_COUNT.search(tree) if tree else None
+    return int(count.group(1)) if count else None
+
+
+def pdf_page_count(data: bytes) -> Optional[int]:
+    """Nombre de pages d'un PDF en mémoire (voir read_pdf_page_count)"""
+    return read_pdf_page_count(lambda offset, length: data[offset:offset + length], len(data))
+
+
+def _inspect_attachment(ole: olefile.OleFileIO, path: str, info: AttachmentInfo) -> None:
+    """
+    Dimensions d'une image ou nombre de pages d'un PDF joint
+
+    Une pièce jointe illisible garde pixels/pages à None (estimation d'après sa
+    taille) sans rendre illisible le reste de l'inventaire.
+    """
+    try:
+        if info.kind == "image":
+            info.pixels = _read_image_pixels(StreamReader(ole, path))
+        elif info.kind == "pdf":
+            reader = StreamReader(ole, path)
+            info.pages = read_pdf_page_count(reader.read, reader.size)
+    except Exception as e:
+        logger.debug("Pièce jointe %s illisible: %s", info.filename, e)
+
+
+def read_manifest(data: Union[bytes, mmap.mmap]) -> MessageManifest:
+    """
+    Inventaire des pièces jointes d'un fichier .msg en mémoire
+
+    Une projection mmap est lue directement, sans copie.
+
+    Un contenu qui n'est pas un conteneur OLE lisible donne un inventaire vide
+    marqué comme illisible : l'estimation se rabat alors sur la taille du fichier.
+    """
+    manifest = MessageManifest(upload_size=len(data))
+    try:
+        ole = olefile.OleFileIO(data if isinstance(data, mmap.mmap) else io.BytesIO(data))
+    except Exception:
+        manifest.readable = False
+        return manifest
+
+    try:
+        storages = sorted({
+            entry[0] for entry in ole.listdir(streams=True, storages=True)
+            if entry and entry[0].startswith(ATTACHMENT_PREFIX)
+        })
+        for storage in storages:
+            filename = _read_filename(ole, storage)
+            data_path = f"{storage}/{ATTACH_DATA_BINARY}"
+            if ole.exists(data_path):
+                kind = attachment_kind(filename)
+                info = AttachmentInfo(filename=filename, kind=kind, size=ole.get_size(data_path))
+                _inspect_attachment(ole, data_path, info)
+            elif ole.exists(f"{storage}/{ATTACH_DATA_OBJECT}"):
+                info = AttachmentInfo(filename=filename, kind="message", size=0)
+            else:
+                info = AttachmentInfo(filename=filename, kind="other", size=0)
+            manifest.attachments.append(info)
+    except Exception as e:
+        logger.debug("Inventaire des pièces jointes incomplet: %s", e)
+        manifest.readable = False
+    finally:
+        ole.close()
+    return manifest
@@ -4,7 +4,9 @@ Service de conversion des fichiers .msg en PDF
 import os
 import tempfile
 import uuid
-from typing import List, Tuple, Optional
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import List, Tuple, Optional, Union
 from pathlib import Path
 import extract_msg
 from reportlab.lib.pagesizes import A4
@@ -19,6 +21,8 @@ from PIL import Image
 
 from app.config import settings
 from app.logging_config import get_logger
+from app.metrics import observe_stage, observe_attachment, count_attachment, record_image, record_merged_pages
+from app.services.spill import AttachmentData, open_attachment, spill
 
 logger = get_logger(__name__)
 
@@ -33,6 +37,13 @@ class UnauthorizedAttachmentError(MSGConversionError):
     pass
 
 
+@dataclass
+class PendingImage:
+    """Image jointe à convertir en PDF une fois le message fermé"""
+    filename: str
+    data: AttachmentData
+
+
 class MSGConverter:
     """Service de conversion des fichiers .msg en PDF"""
     
@@ -127,7 +138,8 @@ class MSGConverter:
             alignment=1
         )
     
-    def convert_msg_to_pdf(self, msg_file_path: str, request_id: str, strict_mode: bool = False) -> Tuple[bytes, List[bytes]]:
+    def convert_msg_to_pdf(self, msg_file_path: str, request_id: str, strict_mode: bool = False,
+                           spill_dir: Optional[str] = None) -> Tuple[bytes, List[AttachmentData]]:
         """
         Convertit un fichier .msg en PDF et retourne les PDFs des pièces jointes
         
@@ -135,44 +147,56 @@ class MSGConverter:
             msg_file_path: Chemin vers le fichier .msg
             request_id: ID de la requête pour le logging
             strict_mode: Si True, refuse la conversion si des pièces jointes non autorisées sont présentes
+            spill_dir: Répertoire de travail où déverser les pièces jointes volumineuses
             
         Returns:
-            Tuple contenant (PDF du mail, Liste des PDFs des pièces jointes)
+            Tuple contenant (PDF du mail, Liste des PDFs des pièces jointes, en mémoire ou déversés sur disque)
         """
-        logger.info(f"[{request_id}] Début de conversion du fichier: {msg_file_path}")
+        logger.info("Début de conversion du fichier: %s", msg_file_path)
         
+        msg = None
         try:
             # Extraction du message
-            msg = extract_msg.Message(msg_file_path)
+            with observe_stage("parse"):
+                msg = extract_msg.Message(msg_file_path)
             
             # Validation stricte des pièces jointes si activée
             if strict_mode:
-                self._validate_attachments_strict(msg, request_id)
+                with observe_stage("strict_validation"):
+                    self._validate_attachments_strict(msg, request_id)
             
             # Création du PDF principal
-            main_pdf = self._create_main_pdf(msg, request_id)
+            with observe_stage("main_render"):
+                main_pdf = self._create_main_pdf(msg, request_id)
             
-            # Traitement des pièces jointes
-            attachment_pdfs = self._process_attachments(msg, request_id, strict_mode)
+            # Traitement des pièces jointes (les volumineuses sont déversées sur disque)
+            attachments = self._process_attachments(msg, request_id, strict_mode, spill_dir)
             
-            logger.info(f"[{request_id}] Conversion terminée avec succès")
+            # Le message fermé libère le contenu des pièces jointes chargé par extract_msg
+            # avant la conversion des images
+            msg.close()
+            msg = None
+            attachment_pdfs = self._render_attachments(attachments, request_id, spill_dir)
+            
+            logger.info("Conversion terminée avec succès")
             return main_pdf, attachment_pdfs
             
         except UnauthorizedAttachmentError:
             # Re-lancer l'UnauthorizedAttachmentError directement (ne pas l'encapsuler)
             raise
         except Exception as e:
-            logger.error(f"[{request_id}] Erreur lors de la conversion: {e}")
+            logger.error("Erreur lors de la conversion: %s", e)
             raise MSGConversionError(f"Erreur de conversion: {e}")
         finally:
-            try:
-                msg.close()
-            except:
-                pass
+            if msg is not None:
+                try:
+                    msg.close()
+                except:
+                    pass
     
     def _create_main_pdf(self, msg: extract_msg.Message, request_id: str) -> bytes:
         """Crée le PDF principal à partir du message"""
-        logger.debug(f"[{request_id}] Création du PDF principal")
+        logger.debug("Création du PDF principal")
         
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(
@@ -422,13 +446,16 @@ class MSGConverter:
         except:
             return str(date)
     
-    def _convert_image_to_pdf(self, image_data: bytes, filename: str, request_id: str) -> bytes:
-        """Convertit une image en PDF"""
-        logger.debug(f"[{request_id}] Conversion de l'image {filename} en PDF")
+    def _convert_image_to_pdf(self, image_data: AttachmentData, filename: str, request_id: str) -> bytes:
+        """Convertit une image en PDF (lue en mémoire ou par projection depuis le disque)"""
+        logger.debug("Conversion de l'image %s en PDF", filename)
         
         try:
-            # Ouvrir l'image avec Pillow
-            image = Image.open(io.BytesIO(image_data))
+            # Ouvrir l'image avec Pillow, pixels décodés avant de fermer la projection
+            with open_attachment(image_data) as stream:
+                image = Image.open(stream)
+                image.load()
+            record_image(*image.size)
             
             # Convertir en RGB si nécessaire (pour gérer les images PNG avec transparence, etc.)
             if image.mode != 'RGB':
@@ -479,11 +506,11 @@ class MSGConverter:
             buffer.seek(0)
             
             result = buffer.getvalue()
-            logger.info(f"[{request_id}] Image {filename} convertie en PDF ({len(result)} bytes)")
+            logger.info("Image %s convertie en PDF (%s bytes)", filename, len(result))
             return result
             
         except Exception as e:
-            logger.error(f"[{request_id}] Erreur lors de la conversion de l'image {filename}: {e}")
+            logger.error("Erreur lors de la conversion de l'image %s: %s", filename, e)
             raise MSGConversionError(f"Erreur de conversion d'image {filename}: {e}")
     
     def _is_supported_image(self, filename: str) -> bool:
@@ -509,28 +536,35 @@ class MSGConverter:
                 
                 if not self._is_supported_attachment(filename):
                     unauthorized_files.append(filename)
-                    logger.warning(f"[{request_id}] ❌ Pièce jointe non autorisée détectée: {filename}")
+                    logger.warning("❌ Pièce jointe non autorisée détectée: %s", filename)
                     
             except Exception as e:
-                logger.error(f"[{request_id}] ❌ Erreur lors de la validation de la pièce jointe {i}: {e}")
+                logger.error("❌ Erreur lors de la validation de la pièce jointe %s: %s", i, e)
                 unauthorized_files.append(f"attachment_{i}")
         
         if unauthorized_files:
             error_msg = f"Pièces jointes non autorisées détectées: {', '.join(unauthorized_files)}. Seuls les PDFs et images (JPG, PNG, GIF, BMP, TIFF, WebP) sont acceptés."
-            logger.error(f"[{request_id}] ❌ Conversion refusée en mode strict: {error_msg}")
+            logger.error("❌ Conversion refusée en mode strict: %s", error_msg)
             raise UnauthorizedAttachmentError(error_msg)
         
-        logger.info(f"[{request_id}] ✅ Toutes les pièces jointes sont autorisées ({len(msg.attachments)} fichiers validés)")
+        logger.info("✅ Toutes les pièces jointes sont autorisées (%s fichiers validés)", len(msg.attachments))
     
-    def _process_attachments(self, msg: extract_msg.Message, request_id: str, strict_mode: bool = False) -> List[bytes]:
-        """Traite les pièces jointes et retourne les PDFs"""
+    def _process_attachments(self, msg: extract_msg.Message, request_id: str, strict_mode: bool = False,
+                             spill_dir: Optional[str] = None) -> List[Union[AttachmentData, PendingImage]]:
+        """
+        Traite les pièces jointes et retourne les PDFs et les images à convertir
+        
+        Les contenus au-delà du seuil sont déversés dans spill_dir ; les images sont
+        converties ensuite par _render_attachments, une fois le message fermé.
+        """
+        threshold = settings.attachment_spill_threshold
         pdf_attachments = []
         
         if not msg.attachments:
-            logger.info(f"[{request_id}] ❌ Aucune pièce jointe trouvée dans le message")
+            logger.info("❌ Aucune pièce jointe trouvée dans le message")
             return pdf_attachments
         
-        logger.info(f"[{request_id}] 📎 Traitement de {len(msg.attachments)} pièce(s) jointe(s)")
+        logger.info("📎 Traitement de %s pièce(s) jointe(s)", len(msg.attachments))
         
         for i, attachment in enumerate(msg.attachments):
             try:
@@ -538,81 +572,110 @@ class MSGConverter:
                 raw_filename = attachment.longFilename or attachment.shortFilename or f"attachment_{i}"
                 filename = raw_filename.rstrip('\x00').strip()  # Supprime les caractères null et espaces
                 file_size = len(attachment.data) if attachment.data else 0
-                logger.info(f"[{request_id}] 📄 Pièce jointe {i+1}: '{filename}' ({file_size} bytes)")
+                logger.info("📄 Pièce jointe %s: '%s' (%s bytes)", i+1, filename, file_size)
                 
                 # Vérification du type de fichier
                 if filename.lower().endswith('.pdf'):
-                    if attachment.data and len(attachment.data) > 0:
-                        pdf_attachments.append(attachment.data)
-                        logger.info(f"[{request_id}] ✅ PDF ajouté pour fusion: {filename} ({len(attachment.data)} bytes)")
-                    else:
-                        logger.warning(f"[{request_id}] ⚠️ Pièce jointe PDF vide ignorée: {filename}")
+                    with observe_attachment("pdf"):
+                        if attachment.data and len(attachment.data) > 0:
+                            pdf_attachments.append(spill(attachment.data, spill_dir, threshold))
+                            logger.info("✅ PDF ajouté pour fusion: %s (%s bytes)", filename, len(attachment.data))
+                        else:
+                            logger.warning("⚠️ Pièce jointe PDF vide ignorée: %s", filename)
                 elif self._is_supported_image(filename):
                     if attachment.data and len(attachment.data) > 0:
-                        # Convertir l'image en PDF
-                        try:
-                            image_pdf = self._convert_image_to_pdf(attachment.data, filename, request_id)
-                            pdf_attachments.append(image_pdf)
-                            logger.info(f"[{request_id}] ✅ Image convertie et ajoutée pour fusion: {filename} ({len(image_pdf)} bytes)")
-                        except Exception as e:
-                            logger.error(f"[{request_id}] ❌ Erreur lors de la conversion de l'image {filename}: {e}")
-                            continue
+                        # Conversion en PDF différée
+                        pdf_attachments.append(PendingImage(filename, spill(attachment.data, spill_dir, threshold)))
                     else:
-                        logger.warning(f"[{request_id}] ⚠️ Pièce jointe image vide ignorée: {filename}")
+                        count_attachment("image")
+                        logger.warning("⚠️ Pièce jointe image vide ignorée: %s", filename)
                 else:
+                    count_attachment("unsupported")
                     if strict_mode:
                         # En mode strict, cela ne devrait pas arriver car on a déjà validé
-                        logger.error(f"[{request_id}] ❌ ERREUR: Pièce jointe non autorisée détectée après validation: {filename}")
+                        logger.error("❌ ERREUR: Pièce jointe non autorisée détectée après validation: %s", filename)
                     else:
-                        logger.info(f"[{request_id}] ❌ Type de fichier non supporté ignoré: {filename}")
+                        logger.info("❌ Type de fichier non supporté ignoré: %s", filename)
                     
             except Exception as e:
-                logger.error(f"[{request_id}] ❌ Erreur lors du traitement de la pièce jointe {i}: {e}")
+                logger.error("❌ Erreur lors du traitement de la pièce jointe %s: %s", i, e)
                 continue
         
         if pdf_attachments:
-            logger.info(f"[{request_id}] 🎯 {len(pdf_attachments)} PDF(s) prêts pour la fusion (PDFs originaux + images converties)")
+            logger.info("🎯 %s PDF(s) prêts pour la fusion (PDFs originaux + images converties)", len(pdf_attachments))
         else:
-            logger.info(f"[{request_id}] ❌ Aucun PDF ni image supportée trouvé dans les pièces jointes")
+            logger.info("❌ Aucun PDF ni image supportée trouvé dans les pièces jointes")
         
         return pdf_attachments
     
-    def merge_pdfs(self, main_pdf: bytes, attachment_pdfs: List[bytes], request_id: str) -> bytes:
+    def _render_attachments(self, attachments: List[Union[AttachmentData, PendingImage]], request_id: str,
+                            spill_dir: Optional[str] = None) -> List[AttachmentData]:
+        """Convertit les images en attente en PDF, dans l'ordre des pièces jointes"""
+        threshold = settings.attachment_spill_threshold
+        pdf_attachments = []
+        for item in attachments:
+            if not isinstance(item, PendingImage):
+                pdf_attachments.append(item)
+                continue
+            with observe_attachment("image"):
+                try:
+                    image_pdf = self._convert_image_to_pdf(item.data, item.filename, request_id)
+                except Exception as e:
+                    logger.error("❌ Erreur lors de la conversion de l'image %s: %s", item.filename, e)
+                    continue
+                pdf_attachments.append(spill(image_pdf, spill_dir, threshold))
+                logger.info("✅ Image convertie et ajoutée pour fusion: %s (%s bytes)", item.filename, len(image_pdf))
+        return pdf_attachments
+    
+    def merge_pdfs(self, main_pdf: bytes, attachment_pdfs: List[AttachmentData], request_id: str) -> bytes:
         """Fusionne le PDF principal avec les PDFs des pièces jointes"""
         if not attachment_pdfs:
-            logger.debug(f"[{request_id}] Aucun PDF à fusionner, retour du PDF principal")
+            logger.debug("Aucun PDF à fusionner, retour du PDF principal")
             return main_pdf
         
-        logger.info(f"[{request_id}] Fusion de {len(attachment_pdfs)} PDF(s) de pièces jointes")
+        logger.info("Fusion de %s PDF(s) de pièces jointes", len(attachment_pdfs))
+        
+        with observe_stage("merge"):
+            return self._merge_pdfs(main_pdf, attachment_pdfs, request_id)
+    
+    def _merge_pdfs(self, main_pdf: bytes, attachment_pdfs: List[AttachmentData], request_id: str) -> bytes:
+        """
+        Effectue la fusion des PDFs avec PyPDF2
         
+        Les PDFs déversés sur disque sont lus par projection, gardée ouverte jusqu'à
+        l'écriture du PDF final (les pages y sont relues à l'écriture).
+        """
         try:
-            writer = PdfWriter()
-            
-            # Ajout du PDF principal
-            main_reader = PdfReader(io.BytesIO(main_pdf))
-            for page in main_reader.pages:
-                writer.add_page(page)
-            
-            # Ajout des PDFs des pièces jointes
-            for i, pdf_data in enumerate(attachment_pdfs):
-                try:
-                    reader = PdfReader(io.BytesIO(pdf_data))
-                    for page in reader.pages:
-                        writer.add_page(page)
-                    logger.debug(f"[{request_id}] PDF de pièce jointe {i+1} fusionné")
-                except Exception as e:
-                    logger.error(f"[{request_id}] Erreur lors de la fusion du PDF {i+1}: {e}")
-                    continue
-            
-            # Génération du PDF final
-            output_buffer = io.BytesIO()
-            writer.write(output_buffer)
-            output_buffer.seek(0)
+            with ExitStack() as streams:
+                writer = PdfWriter()
+                
+                # Ajout du PDF principal
+                main_reader = PdfReader(io.BytesIO(main_pdf))
+                for page in main_reader.pages:
+                    writer.add_page(page)
+                record_merged_pages(len(main_reader.pages))
+                
+                # Ajout des PDFs des pièces jointes
+                for i, pdf_data in enumerate(attachment_pdfs):
+                    try:
+                        reader = PdfReader(streams.enter_context(open_attachment(pdf_data)))
+                        for page in reader.pages:
+                            writer.add_page(page)
+                        record_merged_pages(len(reader.pages))
+                        logger.debug("PDF de pièce jointe %s fusionné", i+1)
+                    except Exception as e:
+                        logger.error("Erreur lors de la fusion du PDF %s: %s", i+1, e)
+                        continue
+                
+                # Génération du PDF final
+                output_buffer = io.BytesIO()
+                writer.write(output_buffer)
+                output_buffer.seek(0)
             
             result = output_buffer.getvalue()
-            logger.info(f"[{request_id}] Fusion terminée, taille finale: {len(result)} bytes")
+            logger.info("Fusion terminée, taille finale: %s bytes", len(result))
             return result
             
         except Exception as e:
-            logger.error(f"[{request_id}] Erreur lors de la fusion des PDFs: {e}")
+            logger.error("Erreur lors de la fusion des PDFs: %s", e)
             raise MSGConversionError(f"Erreur de fusion: {e}")
\ No newline at end of file
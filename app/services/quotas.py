@@ -0,0 +1,177 @@
+"""
+Comptabilité du coût réel des conversions par utilisateur (sujet JWT)
+
+Le temps CPU (mesuré par étape, voir app.resource_usage) et les octets de
+PDF produits sont cumulés par sujet sur une fenêtre glissante, découpée en
+tranches de temps. Des quotas par rôle peuvent être appliqués à ces totaux.
+
+Format de configuration : "rôle=secondes_cpu/mégaoctets_produits" par
+fenêtre, séparés par des virgules, 0 signifiant "illimité". Exemple :
+"default=600/500,batch=6000/10000".
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from app.config import settings
+
+DEFAULT_ROLE = "default"
+WINDOW_SLICES = 60
+
+
+@dataclass(frozen=True)
+class QuotaPolicy:
+    """Quotas applicables à un sujet sur la fenêtre (0 = illimité)"""
+    cpu_seconds: float = 0
+    output_bytes: int = 0
+
+
+class _Slice:
+    """Consommation cumulée sur une tranche de la fenêtre"""
+
+    __slots__ = ("start", "cpu_seconds", "output_bytes", "conversions")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.cpu_seconds = 0.0
+        self.output_bytes = 0
+        self.conversions = 0
+
+
+def parse_quotas(value: str) -> Dict[str, QuotaPolicy]:
+    """Parse la configuration des quotas par rôle"""
+    quotas = {}
+    for item in value.split(","):
+        role, sep, spec = item.partition("=")
+        if not sep or not role.strip():
+            continue
+        parts = [part.strip() for part in spec.split("/")]
+        if len(parts) != 2:
+            raise ValueError(f"Quota invalide pour le rôle {role.strip()}: {spec}")
+        quotas[role.strip()] = QuotaPolicy(float(parts[0]), int(float(parts[1]) * 1024 * 1024))
+    return quotas
+
+
+def quota_for_roles(quotas: Dict[str, QuotaPolicy], roles: Iterable[str]) -> QuotaPolicy:
+    """Quota le plus permissif parmi les rôles de l'utilisateur (défaut sinon)"""
+    matching = [quotas[role] for role in roles if role in quotas]
+    if not matching:
+        return quotas.get(DEFAULT_ROLE, QuotaPolicy())
+
+    def loosest(values):
+        values = list(values)
+        return 0 if 0 in values else max(values)
+
+    return QuotaPolicy(
+        cpu_seconds=loosest(q.cpu_seconds for q in matching),
+        output_bytes=loosest(q.output_bytes for q in matching)
+    )
+
+
+class UsageLedger:
+    """Consommation par sujet sur une fenêtre glissante"""
+
+    def __init__(self, window: float, max_subjects: int = 10000, clock=time.time):
+        self.window = window
+        self.slice_duration = window / WINDOW_SLICES
+        self.max_subjects = max_subjects
+        self._clock = clock
+        self._subjects: "OrderedDict[str, Deque[_Slice]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, subject: str, cpu_seconds: float, output_bytes: int = 0) -> None:
+        """Ajoute la consommation d'une conversion au sujet"""
+        now = self._clock()
+        start = now - now % self.slice_duration
+        with self._lock:
+            slices = self._subjects.get(subject)
+            if slices is None:
+                slices = self._subjects[subject] = deque()
+            self._subjects.move_to_end(subject)
+            if not slices or slices[-1].start != start:
+                slices.append(_Slice(start))
+            current = slices[-1]
+            current.cpu_seconds += cpu_seconds
+            current.output_bytes += output_bytes
+            current.conversions += 1
+            self._prune(slices, now)
+            while len(self._subjects) > self.max_subjects:
+                self._subjects.popitem(last=False)
+
+    def usage(self, subject: str) -> Dict[str, Any]:
+        """Consommation du sujet sur la fenêtre"""
+        now = self._clock()
+        with self._lock:
+            slices = self._subjects.get(subject)
+            if slices is not None:
+                self._prune(slices, now)
+            return self._totals(subject, slices or ())
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Sujets les plus consommateurs de CPU sur la fenêtre"""
+        now = self._clock()
+        with self._lock:
+            for subject in list(self._subjects):
+                slices = self._subjects[subject]
+                self._prune(slices, now)
+                if not slices:
+                    del self._subjects[subject]
+            totals = [self._totals(subject, slices) for subject, slices in self._subjects.items()]
+        return sorted(totals, key=lambda t: t["cpu_seconds"], reverse=True)[:limit]
+
+    def retry_after(self, subject: str, policy: QuotaPolicy) -> Optional[int]:
+        """
+        Délai (secondes) avant de repasser sous le quota, None si le quota n'est pas atteint
+
+        Le délai correspond à l'expiration des tranches les plus anciennes
+        nécessaire pour repasser sous chaque quota dépassé.
+        """
+        if not policy.cpu_seconds and not policy.output_bytes:
+            return None
+        now = self._clock()
+        with self._lock:
+            slices = self._subjects.get(subject)
+            if not slices:
+                return None
+            self._prune(slices, now)
+            cpu = sum(s.cpu_seconds for s in slices)
+            output = sum(s.output_bytes for s in slices)
+            if not ((policy.cpu_seconds and cpu >= policy.cpu_seconds)
+                    or (policy.output_bytes and output >= policy.output_bytes)):
+                return None
+            expires_at = now
+            for current in slices:
+                cpu -= current.cpu_seconds
+                output -= current.output_bytes
+                expires_at = current.start + self.slice_duration + self.window
+                if ((not policy.cpu_seconds or cpu < policy.cpu_seconds)
+                        and (not policy.output_bytes or output < policy.output_bytes)):
+                    break
+        return max(1, math.ceil(expires_at - now))
+
+    def reset(self) -> None:
+        """Oublie toute la consommation enregistrée"""
+        with self._lock:
+            self._subjects.clear()
+
+    def _prune(self, slices: Deque[_Slice], now: float) -> None:
+        """Retire les tranches sorties de la fenêtre"""
+        while slices and slices[0].start + self.slice_duration <= now - self.window:
+            slices.popleft()
+
+    def _totals(self, subject: str, slices: Iterable[_Slice]) -> Dict[str, Any]:
+        """Totaux d'un sujet"""
+        slices = list(slices)
+        return {
+            "subject": subject,
+            "window_seconds": self.window,
+            "cpu_seconds": sum(s.cpu_seconds for s in slices),
+            "output_bytes": sum(s.output_bytes for s in slices),
+            "conversions": sum(s.conversions for s in slices),
+        }
+
+
+usage_ledger = UsageLedger(settings.quota_window_seconds)
@@ -0,0 +1,188 @@
+"""
+Limitation de débit par utilisateur (sujet JWT)
+
+Chaque sujet dispose d'un seau de jetons (débit soutenu + rafale) et d'un
+plafond de conversions simultanées. Les politiques sont définies par rôle ;
+un utilisateur ayant plusieurs rôles obtient, dimension par dimension, la
+limite la plus permissive.
+
+Format de configuration : "rôle=requêtes_par_minute/rafale/simultanées",
+séparés par des virgules, 0 signifiant "illimité". Exemple :
+"default=60/20/4,batch=600/100/16,admin=0/0/0".
+
+Le coût d'une vérification est constant (un accès dictionnaire et quelques
+opérations arithmétiques) ; l'état n'est manipulé que depuis la boucle
+d'événements, sans verrou.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+DEFAULT_ROLE = "default"
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Limites applicables à un sujet (0 = illimité)"""
+    per_minute: float = 0
+    burst: int = 0
+    max_concurrent: int = 0
+
+    @property
+    def rate(self) -> float:
+        """Jetons regagnés par seconde"""
+        return self.per_minute / 60
+
+    @property
+    def capacity(self) -> int:
+        """Taille du seau (au moins un jeton)"""
+        return max(self.burst, 1)
+
+
+@dataclass
+class RateLimitDecision:
+    """Résultat d'une vérification de limite"""
+    allowed: bool
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    reset: Optional[int] = None
+    retry_after: Optional[int] = None
+    reason: Optional[str] = None
+
+    def headers(self) -> Dict[str, str]:
+        """En-têtes RateLimit-* (et Retry-After en cas de refus)"""
+        headers = {}
+        if self.limit is not None:
+            headers["RateLimit-Limit"] = str(self.limit)
+            headers["RateLimit-Remaining"] = str(self.remaining)
+            headers["RateLimit-Reset"] = str(self.reset)
+        if self.retry_after is not None:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class _SubjectState:
+    """Seau de jetons et conversions en cours d'un sujet"""
+
+    __slots__ = ("tokens", "updated_at", "active")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        self.active = 0
+
+
+def parse_policies(value: str) -> Dict[str, RateLimitPolicy]:
+    """Parse la configuration des politiques par rôle"""
+    policies = {}
+    for item in value.split(","):
+        role, sep, spec = item.partition("=")
+        if not sep or not role.strip():
+            continue
+        parts = [part.strip() for part in spec.split("/")]
+        if len(parts) != 3:
+            raise ValueError(f"Politique de limitation invalide pour le rôle {role.strip()}: {spec}")
+        policies[role.strip()] = RateLimitPolicy(float(parts[0]), int(parts[1]), int(parts[2]))
+    return policies
+
+
+def policy_for_roles(policies: Dict[str, RateLimitPolicy], roles: Iterable[str]) -> RateLimitPolicy:
+    """Politique la plus permissive parmi les rôles de l'utilisateur (défaut sinon)"""
+    matching = [policies[role] for role in roles if role in policies]
+    if not matching:
+        return policies.get(DEFAULT_ROLE, RateLimitPolicy())
+    if len(matching) == 1:
+        return matching[0]
+
+    def loosest(values):
+        values = list(values)
+        return 0 if 0 in values else max(values)
+
+    return RateLimitPolicy(
+        per_minute=loosest(p.per_minute for p in matching),
+        burst=loosest(p.burst for p in matching),
+        max_concurrent=loosest(p.max_concurrent for p in matching)
+    )
+
+
+class RateLimiter:
+    """Seaux de jetons et plafonds de concurrence par sujet, en mémoire"""
+
+    def __init__(self, max_subjects: int = 10000, clock=time.monotonic):
+        self.max_subjects = max_subjects
+        self._clock = clock
+        self._subjects: "OrderedDict[str, _SubjectState]" = OrderedDict()
+
+    def acquire(self, subject: str, policy: RateLimitPolicy) -> RateLimitDecision:
+        """
+        Vérifie les limites du sujet et consomme un jeton si la requête est acceptée
+
+        Une requête acceptée occupe une place de concurrence jusqu'à release().
+        """
+        now = self._clock()
+        state = self._state(subject, policy, now)
+
+        if policy.max_concurrent and state.active >= policy.max_concurrent:
+            decision = self._decision(state, policy, allowed=False)
+            decision.reason = "concurrency"
+            decision.retry_after = 1
+            return decision
+
+        if policy.per_minute:
+            if state.tokens < 1:
+                decision = self._decision(state, policy, allowed=False)
+                decision.reason = "rate"
+                decision.retry_after = max(1, math.ceil((1 - state.tokens) / policy.rate))
+                return decision
+            state.tokens -= 1
+
+        state.active += 1
+        return self._decision(state, policy, allowed=True)
+
+    def release(self, subject: str) -> None:
+        """Libère la place de concurrence d'une requête acceptée"""
+        state = self._subjects.get(subject)
+        if state is not None and state.active > 0:
+            state.active -= 1
+
+    def active(self, subject: str) -> int:
+        """Nombre de requêtes en cours pour un sujet"""
+        state = self._subjects.get(subject)
+        return state.active if state is not None else 0
+
+    def reset(self) -> None:
+        """Oublie tous les sujets"""
+        self._subjects.clear()
+
+    def _state(self, subject: str, policy: RateLimitPolicy, now: float) -> _SubjectState:
+        """État du sujet, seau rechargé selon le temps écoulé"""
+        state = self._subjects.get(subject)
+        if state is None:
+            state = _SubjectState(policy.capacity, now)
+            self._subjects[subject] = state
+            self._evict()
+        else:
+            self._subjects.move_to_end(subject)
+            if policy.per_minute:
+                state.tokens = min(policy.capacity, state.tokens + (now - state.updated_at) * policy.rate)
+            state.updated_at = now
+        return state
+
+    def _evict(self) -> None:
+        """Éjecte les sujets les moins récents, sauf s'ils ont des requêtes en cours"""
+        while len(self._subjects) > self.max_subjects:
+            subject, state = next(iter(self._subjects.items()))
+            if state.active:
+                break
+            del self._subjects[subject]
+
+    @staticmethod
+    def _decision(state: _SubjectState, policy: RateLimitPolicy, allowed: bool) -> RateLimitDecision:
+        """Décision avec les valeurs des en-têtes RateLimit-*"""
+        if not policy.per_minute:
+            return RateLimitDecision(allowed=allowed)
+        remaining = int(state.tokens)
+        reset = math.ceil((policy.capacity - state.tokens) / policy.rate)
+        return RateLimitDecision(allowed=allowed, limit=policy.capacity, remaining=remaining, reset=reset)
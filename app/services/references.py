@@ -0,0 +1,128 @@
+"""
+Conversion par référence à un fichier local
+
+Les appelants qui partagent l'hôte ou un volume avec l'API désignent un
+fichier .msg par son chemin au lieu de l'envoyer : le fichier est projeté en
+mémoire (mmap, lecture seule) et converti sans copie de réception ni fichier
+temporaire. Seuls les fichiers situés sous les répertoires autorisés
+(REFERENCE_ROOTS) sont accessibles, après résolution des liens symboliques et
+des composants "..".
+
+Le PDF écrit à côté du fichier source ne remplace un fichier existant que sur
+demande explicite (overwrite).
+
+Le fichier ne doit pas être tronqué pendant la conversion : un accès au-delà
+de la nouvelle fin d'une projection provoque un SIGBUS.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import List
+
+from app.services.ingest import IngestedUpload, InvalidUploadError, OLE_SIGNATURE, UploadTooLargeError
+
+
+class ReferenceNotAllowedError(Exception):
+    """Exception pour un chemin hors des répertoires autorisés"""
+    pass
+
+
+class ReferenceNotFoundError(Exception):
+    """Exception pour un chemin autorisé qui ne désigne pas un fichier"""
+    pass
+
+
+class OutputExistsError(Exception):
+    """Exception pour un PDF déjà présent à côté du fichier source, sans remplacement demandé"""
+    pass
+
+
+def parse_roots(value: str) -> List[Path]:
+    """Répertoires autorisés, séparés par des virgules, résolus en chemins réels"""
+    return [Path(os.path.realpath(item.strip())) for item in value.split(",") if item.strip()]
+
+
+def resolve_reference(path: str, roots: List[Path]) -> Path:
+    """
+    Résout un chemin désigné par l'appelant
+
+    Raises:
+        ReferenceNotAllowedError: Si la conversion par référence est désactivée, si le
+            chemin n'est pas absolu ou s'il sort des répertoires autorisés
+        ReferenceNotFoundError: Si le chemin ne désigne pas un fichier
+    """
+    if not roots:
+        raise ReferenceNotAllowedError("Conversion par référence désactivée")
+    if not os.path.isabs(path):
+        raise ReferenceNotAllowedError(f"Chemin absolu attendu: {path}")
+    resolved = Path(os.path.realpath(path))
+    if not any(resolved.is_relative_to(root) for root in roots):
+        raise ReferenceNotAllowedError(f"Chemin hors des répertoires autorisés: {path}")
+    if not resolved.is_file():
+        raise ReferenceNotFoundError(f"Fichier introuvable: {path}")
+    return resolved
+
+
+def map_reference(path: Path, max_size: int) -> IngestedUpload:
+    """
+    Projette un fichier .msg en mémoire et calcule son empreinte
+
+    Le contenu de l'IngestedUpload retourné est la projection (mmap) : à fermer
+    par l'appelant une fois la conversion terminée.
+
+    Raises:
+        UploadTooLargeError: Si le fichier dépasse la taille maximale
+        InvalidUploadError: Si le fichier ne porte pas la signature OLE
+    """
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        if size > max_size:
+            raise UploadTooLargeError(f"Fichier trop volumineux. Limite: {max_size} bytes")
+        if size < len(OLE_SIGNATURE):
+            raise InvalidUploadError("Le fichier n'est pas un message Outlook (.msg) valide")
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped[:len(OLE_SIGNATURE)] != OLE_SIGNATURE:
+        mapped.close()
+        raise InvalidUploadError("Le fichier n'est pas un message Outlook (.msg) valide")
+    return IngestedUpload(content=mapped, size=size, sha256=hashlib.sha256(mapped).hexdigest())
+
+
+def output_beside(source: Path) -> Path:
+    """Chemin du PDF écrit à côté du fichier source (même nom, extension .pdf)"""
+    return source.with_suffix(".pdf")
+
+
+def write_beside(source: Path, pdf: bytes, overwrite: bool = False) -> Path:
+    """
+    Écrit le PDF à côté du fichier source (même nom, extension .pdf)
+
+    Écriture atomique : fichier temporaire dans le même répertoire puis
+    renommage, un lecteur ne voit jamais de PDF partiel. Sans overwrite, le
+    fichier temporaire est lié au nom final, ce qui échoue si ce nom existe.
+
+    Raises:
+        OutputExistsError: Si le PDF existe déjà et que son remplacement n'est pas demandé
+    """
+    target = output_beside(source)
+    fd, temp_path = tempfile.mkstemp(dir=source.parent, prefix=f".{target.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(pdf)
+        if overwrite:
+            os.replace(temp_path, target)
+        else:
+            try:
+                os.link(temp_path, target)
+            except FileExistsError:
+                raise OutputExistsError(f"Le fichier existe déjà: {target}")
+            os.unlink(temp_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return target
@@ -0,0 +1,223 @@
+"""
+Espace de travail temporaire des conversions
+
+Toutes les écritures temporaires (fichier .msg reçu, pièces jointes déversées)
+passent par un répertoire propre à la requête, créé sous TEMP_DIR dans un
+sous-répertoire réservé à l'API :
+- les écritures et la suppression sont faites hors de la boucle d'événements ;
+- l'occupation de chaque requête est mesurée (octets écrits et déversés) ;
+- un nettoyeur supprime, au démarrage puis périodiquement, les répertoires
+  plus anciens que l'âge maximal et qu'aucune requête de ce processus
+  n'utilise : ceux laissés par un worker arrêté brutalement (plantage, OOM).
+
+TEMP_DIR peut être un montage tmpfs : les fichiers y occupent alors de la
+mémoire (et du swap) plutôt que du disque, ce qui est signalé au démarrage.
+L'âge maximal doit dépasser la durée de la plus longue conversion, les autres
+processus partageant le répertoire n'étant connus que par leurs fichiers.
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from app.logging_config import get_logger
+from app.metrics import counter, histogram
+
+logger = get_logger(__name__)
+
+SCRATCH_DIRNAME = "msgtopdf"
+
+SCRATCH_BYTES = histogram(
+    "msgtopdf_scratch_bytes",
+    "Occupation de l'espace de travail temporaire par requête",
+    buckets=(0, 64 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024,
+             256 * 1024 * 1024, 1024 * 1024 * 1024)
+)
+SCRATCH_ORPHANS = counter(
+    "msgtopdf_scratch_orphans_removed_total",
+    "Répertoires de travail orphelins supprimés par le nettoyeur"
+)
+
+
+def is_tmpfs(path: Path, mounts: str = "/proc/self/mounts") -> bool:
+    """Indique si un répertoire est sur un montage tmpfs (point de montage le plus long contenant le chemin)"""
+    try:
+        with open(mounts) as handle:
+            entries = [line.split() for line in handle]
+    except OSError:
+        return False
+    resolved = os.path.realpath(path)
+    best, fstype = "", None
+    for entry in entries:
+        if len(entry) < 3:
+            continue
+        mount_point = entry[1].replace("\\040", " ")
+        if (resolved == mount_point or resolved.startswith(mount_point.rstrip("/") + "/")) \
+                and len(mount_point) >= len(best):
+            best, fstype = mount_point, entry[2]
+    return fstype == "tmpfs"
+
+
+def directory_size(path: Path) -> int:
+    """Taille totale des fichiers d'un répertoire"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class ScratchArea:
+    """Répertoire de travail d'une requête"""
+
+    def __init__(self, request_id: str, path: Path):
+        self.request_id = request_id
+        self.path = path
+
+    def write(self, name: str, data: bytes) -> Path:
+        """Écrit un fichier dans le répertoire de travail (appel bloquant)"""
+        target = self.path / name
+        with open(target, "wb") as handle:
+            handle.write(data)
+        return target
+
+    async def write_async(self, name: str, data: bytes) -> Path:
+        """Écrit un fichier hors de la boucle d'événements"""
+        return await asyncio.to_thread(self.write, name, data)
+
+    def usage(self) -> int:
+        """Octets actuellement occupés (fichiers écrits et pièces jointes déversées)"""
+        return directory_size(self.path)
+
+
+class ScratchSpace:
+    """Gestionnaire de l'espace de travail temporaire et de son nettoyeur"""
+
+    def __init__(
+        self,
+        temp_dir: str,
+        max_age: float = 3600.0,
+        janitor_interval: float = 300.0,
+        clock: Callable[[], float] = time.time
+    ):
+        self.root = Path(temp_dir) / SCRATCH_DIRNAME
+        self.max_age = max_age
+        self.janitor_interval = janitor_interval
+        self._clock = clock
+        self._active: Dict[str, ScratchArea] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> int:
+        """Répertoires de travail en cours d'utilisation"""
+        return len(self._active)
+
+    def _create(self, request_id: str) -> ScratchArea:
+        """Crée le répertoire de travail d'une requête (appel bloquant)"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = Path(tempfile.mkdtemp(dir=self.root, prefix=f"{request_id}-"))
+        return ScratchArea(request_id, path)
+
+    def _remove(self, area: ScratchArea) -> int:
+        """Mesure puis supprime le répertoire de travail d'une requête (appel bloquant)"""
+        size = area.usage()
+        shutil.rmtree(area.path, ignore_errors=True)
+        return size
+
+    @asynccontextmanager
+    async def area(self, request_id: str) -> AsyncIterator[ScratchArea]:
+        """Répertoire de travail d'une requête, supprimé à la sortie du bloc"""
+        area = await asyncio.to_thread(self._create, request_id)
+        self._active[area.path.name] = area
+        try:
+            yield area
+        finally:
+            try:
+                size = await asyncio.to_thread(self._remove, area)
+                SCRATCH_BYTES.observe(size)
+                logger.debug("Espace de travail supprimé: %s (%s bytes)", area.path, size)
+            finally:
+                self._active.pop(area.path.name, None)
+
+    def sweep(self) -> int:
+        """
+        Supprime les répertoires de travail orphelins (appel bloquant)
+
+        Returns:
+            Nombre d'entrées supprimées
+        """
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return 0
+        deadline = self._clock() - self.max_age
+        removed = 0
+        for entry in entries:
+            if entry.name in self._active:
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime > deadline:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError as e:
+                logger.warning("Impossible de supprimer l'orphelin %s: %s", entry.path, e)
+                continue
+            removed += 1
+        if removed:
+            SCRATCH_ORPHANS.inc(removed)
+            logger.info("🧹 %s répertoire(s) de travail orphelin(s) supprimé(s) dans %s", removed, self.root)
+        return removed
+
+    def free_bytes(self) -> int:
+        """Espace libre sur le système de fichiers de l'espace de travail"""
+        try:
+            return shutil.disk_usage(self.root if self.root.exists() else self.root.parent).free
+        except OSError:
+            return 0
+
+    @property
+    def running(self) -> bool:
+        """Indique si le nettoyeur périodique est actif"""
+        return self._task is not None and not self._task.done() and not self._task.get_loop().is_closed()
+
+    async def start(self) -> None:
+        """Nettoie les orphelins puis démarre le nettoyeur périodique"""
+        if self.running:
+            return
+        if is_tmpfs(self.root.parent):
+            logger.info("Espace de travail sur tmpfs: %s (fichiers temporaires en mémoire)", self.root)
+        await asyncio.to_thread(self.root.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(self.sweep)
+        if self.janitor_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrête le nettoyeur"""
+        task, self._task = self._task, None
+        if task is None or task.done() or task.get_loop().is_closed():
+            return
+        task.cancel()
+        if task.get_loop() is asyncio.get_running_loop():
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        """Boucle du nettoyeur"""
+        while True:
+            await asyncio.sleep(self.janitor_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except OSError as e:
+                logger.error("Nettoyage de l'espace de travail impossible: %s", e)
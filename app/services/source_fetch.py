@@ -0,0 +1,181 @@
+"""
+Récupération des fichiers .msg par URL (stockage objet compatible S3)
+
+Les messages déjà présents dans un stockage objet sont lus directement par
+l'API au lieu d'être téléchargés puis renvoyés par le client :
+- seuls les hôtes autorisés (SOURCE_HOSTS, "hôte" ou "hôte:port") sont
+  contactés, en http ou https, sans suivre de redirection (une redirection
+  pourrait mener hors de la liste) ;
+- un client HTTP asynchrone partagé garde les connexions ouvertes (keep-alive)
+  d'une requête à l'autre, dans la limite d'un pool borné ;
+- le corps est reçu bloc par bloc dans le même passage que les envois
+  (signature OLE, taille, empreinte), un Content-Length annoncé au-delà de la
+  taille maximale étant refusé avant lecture ;
+- délais de connexion et de lecture entre deux blocs, plus un délai total
+  pour l'ensemble de la récupération.
+"""
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import httpx
+
+from app.metrics import counter
+from app.services.ingest import INGEST_CHUNK_SIZE, IngestedUpload, UploadTooLargeError, ingest_upload
+
+SOURCE_FETCHES = counter(
+    "msgtopdf_source_fetch_total",
+    "Récupérations de fichiers .msg par URL, par résultat",
+    labelnames=("outcome",)
+)
+
+
+class SourceNotAllowedError(Exception):
+    """Exception pour une URL dont l'hôte ou le schéma n'est pas autorisé"""
+    pass
+
+
+class SourceFetchError(Exception):
+    """Exception pour une récupération échouée (hôte injoignable, statut d'erreur, délai dépassé)"""
+
+    def __init__(self, message: str, timeout: bool = False):
+        super().__init__(message)
+        self.timeout = timeout
+
+
+def parse_hosts(value: str) -> List[Tuple[str, Optional[int]]]:
+    """Hôtes autorisés "hôte" ou "hôte:port", séparés par des virgules"""
+    hosts = []
+    for item in value.split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        host, sep, port = item.rpartition(":")
+        if sep and port.isdigit():
+            hosts.append((host, int(port)))
+        else:
+            hosts.append((item, None))
+    return hosts
+
+
+def disallowed_reason(url: str, hosts: List[Tuple[str, Optional[int]]]) -> Optional[str]:
+    """Motif du refus d'une URL hors des hôtes autorisés (None si elle est autorisée)"""
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return f"URL invalide: {url}"
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return f"URL http(s) attendue: {url}"
+    host = parts.hostname.lower()
+    port = port or (443 if parts.scheme == "https" else 80)
+    if not any(host == allowed and (allowed_port is None or port == allowed_port) for allowed, allowed_port in hosts):
+        return f"Hôte non autorisé: {parts.hostname}"
+    return None
+
+
+def source_filename(url: str) -> str:
+    """Nom du fichier désigné par une URL (dernier segment du chemin)"""
+    return unquote(urlsplit(url).path.rsplit("/", 1)[-1])
+
+
+class SourceFetcher:
+    """Récupération des fichiers .msg par URL via un pool de connexions partagé"""
+
+    def __init__(
+        self,
+        hosts: List[Tuple[str, Optional[int]]],
+        max_size: int,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        total_timeout: float = 120.0,
+        max_connections: int = 32,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.hosts = hosts
+        self.max_size = max_size
+        self.total_timeout = total_timeout
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Client partagé, créé à la première récupération"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                transport=self._transport,
+                follow_redirects=False
+            )
+        return self._client
+
+    def check(self, url: str) -> None:
+        """
+        Vérifie qu'une URL désigne un hôte autorisé
+
+        Raises:
+            SourceNotAllowedError: Si la récupération par URL est désactivée, si le
+                schéma n'est pas http(s) ou si l'hôte n'est pas autorisé
+        """
+        if not self.hosts:
+            raise SourceNotAllowedError("Conversion par URL désactivée")
+        reason = disallowed_reason(url, self.hosts)
+        if reason:
+            raise SourceNotAllowedError(reason)
+
+    async def fetch(self, url: str) -> IngestedUpload:
+        """
+        Récupère un fichier .msg (signature OLE, taille et empreinte vérifiées au fil de la réception)
+
+        Raises:
+            SourceNotAllowedError: Si l'URL n'est pas autorisée
+            SourceFetchError: Si la récupération échoue ou dépasse le délai total
+            UploadTooLargeError: Si le fichier dépasse la taille maximale
+            InvalidUploadError: Si le contenu n'est pas un conteneur OLE
+        """
+        self.check(url)
+        try:
+            upload = await asyncio.wait_for(self._fetch(url), timeout=self.total_timeout)
+        except asyncio.TimeoutError:
+            SOURCE_FETCHES.inc(outcome="timeout")
+            raise SourceFetchError(f"Délai de récupération dépassé ({self.total_timeout}s)", timeout=True)
+        except httpx.TimeoutException as e:
+            SOURCE_FETCHES.inc(outcome="timeout")
+            raise SourceFetchError(f"Délai de récupération dépassé: {type(e).__name__}", timeout=True)
+        except httpx.HTTPError as e:
+            SOURCE_FETCHES.inc(outcome="error")
+            raise SourceFetchError(f"Récupération impossible: {type(e).__name__}")
+        except SourceFetchError:
+            SOURCE_FETCHES.inc(outcome="error")
+            raise
+        except Exception:
+            SOURCE_FETCHES.inc(outcome="rejected")
+            raise
+        SOURCE_FETCHES.inc(outcome="success")
+        return upload
+
+    async def _fetch(self, url: str) -> IngestedUpload:
+        """Requête GET et réception du corps en flux"""
+        async with self._get_client().stream("GET", url) as response:
+            if response.status_code != 200:
+                raise SourceFetchError(f"Récupération impossible: statut {response.status_code}")
+            content_length = response.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_size:
+                raise UploadTooLargeError(
+                    f"Fichier trop volumineux: {content_length} bytes annoncés. Limite: {self.max_size} bytes"
+                )
+            return await ingest_upload(self._chunks(response), self.max_size)
+
+    @staticmethod
+    async def _chunks(response: httpx.Response) -> AsyncIterator[bytes]:
+        """Blocs du corps de la réponse (décompressé si la source l'encode)"""
+        async for chunk in response.aiter_bytes(INGEST_CHUNK_SIZE):
+            yield chunk
+
+    async def close(self) -> None:
+        """Ferme les connexions du pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,73 @@
+"""
+Pièces jointes volumineuses déversées sur disque
+
+Au-delà d'un seuil, le contenu d'une pièce jointe (PDF, image, PDF d'image)
+est écrit dans un fichier du répertoire de travail de la conversion au lieu
+de rester dans le tas Python. Il est ensuite relu par projection mmap
+(Pillow, lecteur PDF) : les pages lues appartiennent au cache du système de
+fichiers, récupérable par le noyau, et la mémoire de travail reste à peu près
+constante quel que soit le volume total des pièces jointes.
+"""
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Union
+
+from app.metrics import counter
+
+SPILLED_BYTES = counter("msgtopdf_attachment_spilled_bytes_total", "Octets de pièces jointes déversés sur disque")
+
+
+class SpilledAttachment:
+    """Contenu d'une pièce jointe déversé dans un fichier"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"SpilledAttachment({self.path!r}, {self.size})"
+
+    @contextmanager
+    def open(self) -> Iterator[mmap.mmap]:
+        """Projection en lecture seule du contenu"""
+        with open(self.path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+# Contenu d'une pièce jointe : en mémoire sous le seuil, sur disque au-delà
+AttachmentData = Union[bytes, SpilledAttachment]
+
+
+def spill(data: bytes, directory: Optional[str], threshold: int) -> AttachmentData:
+    """
+    Déverse un contenu sur disque s'il atteint le seuil
+
+    Sans répertoire de travail ou avec un seuil nul, le contenu reste en mémoire.
+    """
+    if directory is None or threshold <= 0 or len(data) < threshold:
+        return data
+    fd, path = tempfile.mkstemp(dir=directory, prefix="attachment-", suffix=".bin")
+    with os.fdopen(fd, "wb") as handle:
+        handle.write(data)
+    SPILLED_BYTES.inc(len(data))
+    return SpilledAttachment(path, len(data))
+
+
+@contextmanager
+def open_attachment(data: AttachmentData) -> Iterator[BinaryIO]:
+    """Flux de lecture d'un contenu, en mémoire ou projeté depuis le disque"""
+    if isinstance(data, SpilledAttachment):
+        with data.open() as mapped:
+            yield mapped
+    else:
+        yield io.BytesIO(data)
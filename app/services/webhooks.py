@@ -0,0 +1,359 @@
+"""
+Notifications de fin de conversion (webhooks)
+
+Une conversion demandée avec une URL de rappel est traitée en arrière-plan ;
+à la fin, son résultat (métadonnées, ou PDF si configuré) est livré par POST
+à cette URL par un livreur indépendant des workers de conversion :
+- les livraisons sont d'abord enregistrées dans une file SQLite : celles en
+  attente au redémarrage sont reprises ;
+- un client HTTP asynchrone partagé (keep-alive) et un nombre borné de
+  livraisons simultanées : un destinataire lent n'occupe qu'une place de
+  livraison, jamais un worker de conversion ;
+- en cas d'échec (erreur réseau, délai, statut 5xx, 408 ou 429), nouvelle
+  tentative après un backoff exponentiel avec gigue complète, jusqu'au
+  nombre maximal de tentatives ; un autre statut 4xx est définitif, de même
+  qu'une redirection 3xx (les redirections ne sont pas suivies).
+
+Les conversions asynchrones elles-mêmes s'exécutent dans des tâches du
+livreur (submit), détachées de la requête qui les a acceptées : la connexion
+est libérée dès la réponse 202.
+
+Seuls les hôtes autorisés (WEBHOOK_HOSTS) peuvent recevoir des rappels. La
+file SQLite est propre à un processus : un fichier par instance.
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from app.logging_config import get_logger
+from app.metrics import counter
+from app.services.source_fetch import disallowed_reason
+
+logger = get_logger(__name__)
+
+WEBHOOK_DELIVERIES = counter(
+    "msgtopdf_webhook_deliveries_total",
+    "Tentatives de livraison des webhooks, par résultat",
+    labelnames=("outcome",)
+)
+
+
+class CallbackNotAllowedError(Exception):
+    """Exception pour une URL de rappel hors des hôtes autorisés"""
+    pass
+
+
+@dataclass
+class Delivery:
+    """Livraison en attente"""
+    id: int
+    request_id: str
+    url: str
+    headers: Dict[str, str]
+    body: bytes
+    attempts: int
+
+
+def backoff_delay(attempts: int, base: float, maximum: float, rng: Callable[[], float] = random.random) -> float:
+    """Délai avant la tentative suivante : backoff exponentiel avec gigue complète"""
+    return rng() * min(maximum, base * 2 ** max(attempts - 1, 0))
+
+
+class DeliveryStore:
+    """
+    File des livraisons persistée dans SQLite
+
+    Appelée depuis des threads (hors de la boucle d'événements) : une seule
+    connexion, protégée par un verrou.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connexion ouverte à la première opération"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS deliveries ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " request_id TEXT NOT NULL,"
+                " url TEXT NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt REAL NOT NULL,"
+                " last_error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS deliveries_next ON deliveries (next_attempt)")
+        return self._conn
+
+    def add(self, request_id: str, url: str, headers: Dict[str, str], body: bytes, now: float) -> int:
+        """Enregistre une livraison, due immédiatement"""
+        with self._lock:
+            cursor = self._connection().execute(
+                "INSERT INTO deliveries (request_id, url, headers, body, next_attempt) VALUES (?, ?, ?, ?, ?)",
+                (request_id, url, json.dumps(headers), body, now)
+            )
+            return cursor.lastrowid
+
+    def due(self, now: float, limit: int, exclude: Set[int] = frozenset()) -> List[Delivery]:
+        """Livraisons dont l'échéance est passée, les plus anciennes d'abord"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, request_id, url, headers, body, attempts FROM deliveries"
+                " WHERE next_attempt <= ? ORDER BY next_attempt, id LIMIT ?",
+                (now, limit + len(exclude))
+            ).fetchall()
+        deliveries = [
+            Delivery(id=row[0], request_id=row[1], url=row[2], headers=json.loads(row[3]), body=row[4],
+                     attempts=row[5])
+            for row in rows if row[0] not in exclude
+        ]
+        return deliveries[:limit]
+
+    def next_due(self, exclude: Set[int] = frozenset()) -> Optional[float]:
+        """Prochaine échéance parmi les livraisons qui ne sont pas en cours"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, next_attempt FROM deliveries ORDER BY next_attempt LIMIT ?",
+                (len(exclude) + 1,)
+            ).fetchall()
+        for delivery_id, next_attempt in rows:
+            if delivery_id not in exclude:
+                return next_attempt
+        return None
+
+    def reschedule(self, delivery_id: int, attempts: int, next_attempt: float, error: str) -> None:
+        """Reprogramme une livraison échouée"""
+        with self._lock:
+            self._connection().execute(
+                "UPDATE deliveries SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+                (attempts, next_attempt, error, delivery_id)
+            )
+
+    def remove(self, delivery_id: int) -> None:
+        """Retire une livraison réussie ou abandonnée"""
+        with self._lock:
+            self._connection().execute("DELETE FROM deliveries WHERE id = ?", (delivery_id,))
+
+    def pending(self) -> int:
+        """Nombre de livraisons en attente"""
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+
+    def close(self) -> None:
+        """Ferme la connexion"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class WebhookDispatcher:
+    """Livreur de webhooks : file persistée, pool de connexions et concurrence bornée"""
+
+    def __init__(
+        self,
+        store: DeliveryStore,
+        hosts: List[Tuple[str, Optional[int]]],
+        max_concurrency: int = 8,
+        max_attempts: int = 8,
+        backoff_base: float = 1.0,
+        backoff_max: float = 300.0,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        clock: Callable[[], float] = time.time,
+        rng: Callable[[], float] = random.random
+    ):
+        self.store = store
+        self.hosts = hosts
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clock = clock
+        self._rng = rng
+        self._timeout = httpx.Timeout(timeout)
+        self._limits = httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Set[int] = set()
+        self._deliveries: Set[asyncio.Task] = set()
+        self._jobs: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        """Livraisons en cours"""
+        return len(self._in_flight)
+
+    def check(self, url: str) -> None:
+        """
+        Vérifie qu'une URL de rappel désigne un hôte autorisé
+
+        Raises:
+            CallbackNotAllowedError: Si les webhooks sont désactivés ou si l'hôte n'est pas autorisé
+        """
+        if not self.hosts:
+            raise CallbackNotAllowedError("Webhooks désactivés")
+        reason = disallowed_reason(url, self.hosts)
+        if reason:
+            raise CallbackNotAllowedError(reason)
+
+    async def enqueue(self, request_id: str, url: str, body: bytes, headers: Dict[str, str]) -> int:
+        """Enregistre une livraison et réveille le livreur"""
+        delivery_id = await asyncio.to_thread(self.store.add, request_id, url, headers, body, self._clock())
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return delivery_id
+
+    def submit(self, job: Coroutine[Any, Any, None]) -> asyncio.Task:
+        """Exécute une conversion asynchrone dans une tâche du livreur, indépendante de la requête"""
+        task = asyncio.create_task(job)
+        self._jobs.add(task)
+        task.add_done_callback(self._job_done)
+        return task
+
+    def _job_done(self, task: asyncio.Task) -> None:
+        """Fin d'une conversion asynchrone : une erreur inattendue est journalisée"""
+        self._jobs.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Conversion asynchrone interrompue", exc_info=task.exception())
+
+    async def join(self) -> None:
+        """Attend la fin des conversions asynchrones en cours"""
+        while self._jobs:
+            await asyncio.wait(set(self._jobs))
+
+    def start(self) -> None:
+        """Démarre le livreur (reprise des livraisons en attente comprise)"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Arrête le livreur
+
+        Les conversions asynchrones en cours disposent du délai pour enregistrer leur
+        livraison. Les livraisons interrompues restent dans la file et seront reprises
+        au prochain démarrage.
+        """
+        if self._jobs:
+            _, pending = await asyncio.wait(set(self._jobs), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._deliveries:
+            _, pending = await asyncio.wait(set(self._deliveries), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        await asyncio.to_thread(self.store.close)
+
+    async def _run(self) -> None:
+        """Boucle du livreur : lance les livraisons échues, puis attend la prochaine échéance ou un réveil"""
+        while True:
+            self._wakeup.clear()
+            try:
+                due = await asyncio.to_thread(
+                    self.store.due, self._clock(), self.max_concurrency, set(self._in_flight)
+                )
+                for delivery in due:
+                    await self._slots.acquire()
+                    self._in_flight.add(delivery.id)
+                    task = asyncio.create_task(self._deliver(delivery))
+                    self._deliveries.add(task)
+                    task.add_done_callback(self._deliveries.discard)
+                next_due = await asyncio.to_thread(self.store.next_due, set(self._in_flight))
+            except sqlite3.Error as e:
+                logger.error("File des webhooks indisponible: %s", e)
+                next_due = self._clock() + self.backoff_max
+            delay = None if next_due is None else max(0.0, next_due - self._clock())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Client partagé, créé à la première livraison"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                limits=self._limits,
+                transport=self._transport,
+                follow_redirects=False
+            )
+        return self._client
+
+    async def _deliver(self, delivery: Delivery) -> None:
+        """Une tentative de livraison, puis retrait ou reprogrammation"""
+        attempts = delivery.attempts + 1
+        try:
+            permanent = False
+            try:
+                response = await self._get_client().post(
+                    delivery.url,
+                    content=delivery.body,
+                    headers={**delivery.headers, "X-Request-ID": delivery.request_id,
+                             "X-Webhook-Attempt": str(attempts)}
+                )
+                if 200 <= response.status_code < 300:
+                    await asyncio.to_thread(self.store.remove, delivery.id)
+                    WEBHOOK_DELIVERIES.inc(outcome="delivered")
+                    logger.info("Webhook livré: %s (tentative %s)", delivery.request_id, attempts)
+                    return
+                error = f"statut {response.status_code}"
+                # Redirection (non suivie) ou 4xx : définitif, sauf délai dépassé et limitation de débit
+                permanent = 300 <= response.status_code < 500 and response.status_code not in (408, 429)
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+
+            if permanent or attempts >= self.max_attempts:
+                await asyncio.to_thread(self.store.remove, delivery.id)
+                WEBHOOK_DELIVERIES.inc(outcome="abandoned")
+                logger.warning("Webhook abandonné: %s après %s tentative(s) (%s)",
+                               delivery.request_id, attempts, error)
+                return
+            delay = backoff_delay(attempts, self.backoff_base, self.backoff_max, self._rng)
+            await asyncio.to_thread(self.store.reschedule, delivery.id, attempts, self._clock() + delay, error)
+            WEBHOOK_DELIVERIES.inc(outcome="retried")
+            logger.info("Webhook reprogrammé: %s dans %.1fs (%s)", delivery.request_id, delay, error)
+        except sqlite3.Error as e:
+            logger.error("File des webhooks indisponible: %s", e)
+        finally:
+            self._in_flight.discard(delivery.id)
+            self._slots.release()
+            self._wakeup.set()
@@ -0,0 +1,114 @@
+"""
+Benchmark du débit de réception : /convert (multipart) contre /convert/raw (corps brut)
+
+Envoie des corps de 50 Mo (signature OLE suivie d'octets aléatoires) en mode
+dry_run : seules la réception, la vérification, le hachage et l'inventaire
+sont exercés, sans conversion. L'API doit tourner localement, par exemple :
+
+    DISABLE_AUTH=true python run.py
+    python benchmark_ingest.py --size-mb 50 --requests 10
+
+Avec l'authentification activée, passer un jeton via --token.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+OLE_SIGNATURE = bytes.fromhex("D0CF11E0A1B11AE1")
+
+
+def build_payload(size_mb: int) -> bytes:
+    """Corps de test : signature OLE puis contenu aléatoire"""
+    return OLE_SIGNATURE + os.urandom(size_mb * 1024 * 1024 - len(OLE_SIGNATURE))
+
+
+def send_multipart(session: requests.Session, base_url: str, payload: bytes, headers: dict) -> requests.Response:
+    """Envoi multipart classique"""
+    return session.post(
+        f"{base_url}/convert",
+        files={"file": ("benchmark.msg", payload, "application/octet-stream")},
+        data={"dry_run": "true"},
+        headers=headers,
+        timeout=300
+    )
+
+
+def send_raw(session: requests.Session, base_url: str, payload: bytes, headers: dict) -> requests.Response:
+    """Envoi du corps brut"""
+    return session.post(
+        f"{base_url}/convert/raw?dry_run=true&filename=benchmark.msg",
+        data=payload,
+        headers={**headers, "Content-Type": "application/vnd.ms-outlook"},
+        timeout=300
+    )
+
+
+def run(name: str, send, session: requests.Session, base_url: str, payload: bytes, headers: dict,
+        count: int, warmup: int) -> dict:
+    """Mesure les durées d'un mode d'envoi"""
+    for _ in range(warmup):
+        send(session, base_url, payload, headers)
+
+    durations = []
+    for index in range(count):
+        start = time.perf_counter()
+        response = send(session, base_url, payload, headers)
+        duration = time.perf_counter() - start
+        if response.status_code != 200:
+            print(f"   ❌ {name} #{index + 1}: {response.status_code} {response.text[:200]}")
+            continue
+        durations.append(duration)
+
+    if not durations:
+        return {"name": name, "ok": 0}
+    size_mb = len(payload) / (1024 * 1024)
+    median = statistics.median(durations)
+    return {
+        "name": name,
+        "ok": len(durations),
+        "median": median,
+        "p95": sorted(durations)[int(0.95 * (len(durations) - 1))],
+        "throughput": size_mb / median,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de réception multipart / corps brut")
+    parser.add_argument("--url", default="http://localhost:8000", help="URL de l'API")
+    parser.add_argument("--size-mb", type=int, default=50, help="Taille des corps envoyés (Mo)")
+    parser.add_argument("--requests", type=int, default=10, help="Requêtes mesurées par mode")
+    parser.add_argument("--warmup", type=int, default=2, help="Requêtes d'échauffement par mode")
+    parser.add_argument("--token", default=os.getenv("JWT_TOKEN"), help="Jeton Bearer (ou JWT_TOKEN)")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    payload = build_payload(args.size_mb)
+    session = requests.Session()
+
+    print(f"📦 Benchmark de réception: {args.requests} x {args.size_mb} Mo par mode sur {args.url}")
+    results = [
+        run("multipart", send_multipart, session, args.url, payload, headers, args.requests, args.warmup),
+        run("raw", send_raw, session, args.url, payload, headers, args.requests, args.warmup),
+    ]
+
+    print(f"\n{'Mode':<12}{'OK':>5}{'Médiane (s)':>14}{'p95 (s)':>10}{'Débit (Mo/s)':>15}")
+    for result in results:
+        if not result["ok"]:
+            print(f"{result['name']:<12}{0:>5}")
+            continue
+        print(f"{result['name']:<12}{result['ok']:>5}{result['median']:>14.3f}"
+              f"{result['p95']:>10.3f}{result['throughput']:>15.1f}")
+
+    if all(result["ok"] for result in results):
+        gain = results[1]["throughput"] / results[0]["throughput"]
+        print(f"\n🚀 Corps brut: x{gain:.2f} par rapport au multipart")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
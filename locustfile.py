@@ -105,8 +105,8 @@ class MSGToPDFUser(HttpUser):
                     response.success()
                 else:
                     response.failure(f"PDF trop petit: {len(response.content)} bytes")
-            elif response.status_code == 422:
-                # Erreur de conversion normale (fichier mock invalide)
+            elif response.status_code in [400, 422]:
+                # Fichier mock refusé à la réception (pas de signature OLE) ou conversion impossible
                 response.success()  # C'est acceptable pour un fichier mock
             elif response.status_code == 401:
                 response.failure("Erreur d'authentification")
@@ -166,7 +166,7 @@ class MSGToPDFUser(HttpUser):
             timeout=60,  # Timeout plus long pour les gros fichiers
             catch_response=True
         ) as response:
-            if response.status_code in [200, 422]:
+            if response.status_code in [200, 400, 422]:
                 response.success()
             elif response.status_code == 413:
                 response.success()  # Fichier trop gros - acceptable
@@ -1,6 +1,7 @@
 """
 Configuration des tests pytest
 """
+import io
 import pytest
 import tempfile
 import os
@@ -15,6 +16,22 @@ from app.main import app
 from app.config import settings
 
 
+class FakeClock:
+    """Horloge contrôlée par le test"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Horloge contrôlée par le test, avancée via clock.now"""
+    return FakeClock()
+
+
 @pytest.fixture
 def client():
     """Client de test FastAPI"""
@@ -135,6 +152,14 @@ def setup_test_environment():
     import app.auth
     app.auth._jwks_cache = {}
     app.auth._cache_expiry = 0
+    app.auth._cache_fetched_at = 0
+    
+    # Instance considérée comme active (pas en cours d'arrêt)
+    import app.main
+    app.main.draining = False
+    app.main.rate_limiter.reset()
+    app.main.usage_ledger.reset()
+    app.main.cost_model.reset()
     
     yield
     
@@ -150,6 +175,25 @@ def sample_pdf_content():
     return b"%PDF-1.4\n1 0 obj\n<<\n/Type /Catalog\n/Pages 2 0 R\n>>\nendobj\n2 0 obj\n<<\n/Type /Pages\n/Kids [3 0 R]\n/Count 1\n>>\nendobj\n3 0 obj\n<<\n/Type /Page\n/Parent 2 0 R\n/MediaBox [0 0 612 792]\n>>\nendobj\nxref\n0 4\n0000000000 65535 f \n0000000009 00000 n \n0000000058 00000 n \n0000000115 00000 n \ntrailer\n<<\n/Size 4\n/Root 1 0 R\n>>\nstartxref\n174\n%%EOF"
 
 
+@pytest.fixture
+def blank_pdf_content():
+    """PDF réel d'une page blanche"""
+    from PyPDF2 import PdfWriter
+    writer = PdfWriter()
+    writer.add_blank_page(width=200, height=200)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def png_content():
+    """Image PNG réelle"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
 @pytest.fixture
 def mock_extract_msg():
     """Mock du module extract_msg"""
@@ -0,0 +1,289 @@
+"""
+Tests pour le contrôle d'admission des conversions
+"""
+import asyncio
+import pytest
+from app.services.admission import AdmissionController, AdmissionRejectedError, AdmissionTicket, ADMISSIONS
+from app.services.capacity import MemoryStatus
+
+MB = 1024 * 1024
+
+
+def memory_status(headroom):
+    """Lecture mémoire simulée"""
+    return lambda: MemoryStatus(limit=4096 * MB, used=4096 * MB - headroom, headroom=headroom, source="cgroup_v2")
+
+
+class TestAdmissionController:
+    """Tests pour le contrôleur d'admission"""
+
+    @pytest.mark.asyncio
+    async def test_admits_up_to_limit(self):
+        """Les conversions sont admises immédiatement sous la limite"""
+        controller = AdmissionController(max_concurrent=2, max_queue=0, queue_timeout=1)
+
+        first = await controller.acquire()
+        second = await controller.acquire()
+
+        assert controller.active == 2
+        assert controller.queued == 0
+
+        controller.release(first)
+        controller.release(second)
+        assert controller.active == 0
+
+    @pytest.mark.asyncio
+    async def test_queue_full_rejected(self):
+        """File pleine : refus immédiat avec délai de nouvel essai"""
+        controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=1)
+        before = ADMISSIONS.get(outcome="queue_full")
+        await controller.acquire()
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            await controller.acquire()
+
+        assert exc_info.value.reason == "queue_full"
+        assert exc_info.value.retry_after >= 1
+        assert ADMISSIONS.get(outcome="queue_full") == before + 1
+        assert controller.active == 1
+
+    @pytest.mark.asyncio
+    async def test_waiter_admitted_on_release(self):
+        """Une place libérée est transmise au premier en attente (FIFO)"""
+        controller = AdmissionController(max_concurrent=1, max_queue=2, queue_timeout=1)
+        ticket = await controller.acquire()
+        order = []
+
+        async def waiter(name):
+            granted = await controller.acquire()
+            order.append(name)
+            return granted
+
+        first = asyncio.ensure_future(waiter("premier"))
+        second = asyncio.ensure_future(waiter("second"))
+        await asyncio.sleep(0)
+        assert controller.queued == 2
+
+        controller.release(ticket)
+        ticket = await first
+        assert order == ["premier"]
+        assert controller.active == 1
+
+        controller.release(ticket)
+        ticket = await second
+        assert order == ["premier", "second"]
+        controller.release(ticket)
+        assert controller.active == 0
+
+    @pytest.mark.asyncio
+    async def test_wait_timeout(self):
+        """L'attente au-delà du délai est refusée et retirée de la file"""
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        await controller.acquire()
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            await controller.acquire()
+
+        assert exc_info.value.reason == "timeout"
+        assert controller.queued == 0
+        assert controller.active == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Un demandeur annulé (client déconnecté) libère sa place dans la file"""
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        ticket = await controller.acquire()
+
+        task = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert controller.queued == 0
+        controller.release(ticket)
+        assert controller.active == 0
+
+    def test_retry_after_from_service_time(self):
+        """Le délai de nouvel essai suit le temps de service moyen et la file"""
+        controller = AdmissionController(max_concurrent=2, max_queue=10, queue_timeout=1)
+        for _ in range(50):
+            controller._active = 1
+            controller.release(AdmissionTicket(), service_time=4.0)
+
+        assert controller.service_time == pytest.approx(4.0, rel=0.01)
+        assert controller.retry_after() == 2
+
+
+class TestMemoryAdmission:
+    """Tests pour la réservation mémoire à l'admission"""
+
+    @pytest.mark.asyncio
+    async def test_reservation_within_budget(self):
+        """La mémoire estimée est réservée puis rendue"""
+        controller = AdmissionController(4, 4, 1, memory_budget=100 * MB)
+
+        ticket = await controller.acquire(60 * MB)
+        assert controller.reserved_memory == 60 * MB
+
+        controller.release(ticket)
+        assert controller.reserved_memory == 0
+
+    @pytest.mark.asyncio
+    async def test_over_budget_rejected(self):
+        """Une conversion plus coûteuse que le budget entier est refusée d'emblée"""
+        controller = AdmissionController(4, 4, 1, memory_budget=100 * MB)
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            await controller.acquire(150 * MB)
+
+        assert exc_info.value.reason == "too_large"
+        assert exc_info.value.retry_after is None
+        assert controller.active == 0
+
+    @pytest.mark.asyncio
+    async def test_waits_for_memory(self):
+        """Sans mémoire disponible dans le budget, la conversion attend une libération"""
+        controller = AdmissionController(4, 4, 1, memory_budget=100 * MB)
+        big = await controller.acquire(80 * MB)
+
+        task = asyncio.ensure_future(controller.acquire(40 * MB))
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+        assert not task.done()
+
+        controller.release(big)
+        ticket = await task
+        assert controller.reserved_memory == 40 * MB
+        controller.release(ticket)
+
+    @pytest.mark.asyncio
+    async def test_fifo_head_not_overtaken(self):
+        """Une petite conversion ne double pas une grosse en tête de file"""
+        controller = AdmissionController(4, 4, 1, memory_budget=100 * MB)
+        running = await controller.acquire(70 * MB)
+
+        big = asyncio.ensure_future(controller.acquire(60 * MB))
+        await asyncio.sleep(0)
+        small = asyncio.ensure_future(controller.acquire(10 * MB))
+        await asyncio.sleep(0)
+        assert controller.queued == 2
+
+        controller.release(running)
+        big_ticket = await big
+        small_ticket = await small
+        assert controller.reserved_memory == 70 * MB
+        controller.release(big_ticket)
+        controller.release(small_ticket)
+
+    @pytest.mark.asyncio
+    async def test_cgroup_headroom_checked(self):
+        """La marge mémoire réelle doit rester au-dessus du minimum après réservation"""
+        controller = AdmissionController(4, 0, 1, memory_budget=1024 * MB, min_free_memory=256 * MB,
+                                         memory_status=memory_status(300 * MB))
+
+        ticket = await controller.acquire(40 * MB)
+        controller.release(ticket)
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            await controller.acquire(100 * MB)
+
+        assert exc_info.value.reason == "queue_full"
+
+
+class TestAdmissionLanes:
+    """Tests pour les files d'admission par voie"""
+
+    @pytest.mark.asyncio
+    async def test_small_not_blocked_by_bulk_queue(self):
+        """Une petite conversion n'attend pas derrière les grosses d'une autre voie"""
+        controller = AdmissionController(3, 4, 1, memory_budget=200 * MB, lanes={"interactive": 1, "bulk": 2})
+        running = await controller.acquire(150 * MB, "bulk")
+
+        big = asyncio.ensure_future(controller.acquire(100 * MB, "bulk"))
+        await asyncio.sleep(0)
+        assert controller.lane_status()["bulk"]["queued"] == 1
+
+        small = await controller.acquire(10 * MB, "interactive")
+        assert controller.lane_status()["interactive"]["active"] == 1
+        assert not big.done()
+
+        controller.release(small)
+        controller.release(running)
+        controller.release(await big)
+        assert controller.active == 0
+
+    @pytest.mark.asyncio
+    async def test_lane_limit(self):
+        """Chaque voie est bornée par sa propre part de conversions simultanées"""
+        controller = AdmissionController(3, 0, 1, lanes={"interactive": 2, "bulk": 1})
+        bulk = await controller.acquire(0, "bulk")
+
+        with pytest.raises(AdmissionRejectedError) as exc_info:
+            await controller.acquire(0, "bulk")
+        assert exc_info.value.reason == "queue_full"
+
+        first = await controller.acquire(0, "interactive")
+        second = await controller.acquire(0, "interactive")
+        assert controller.active == 3
+
+        for ticket in (bulk, first, second):
+            controller.release(ticket)
+
+
+class FakeClock:
+    """Horloge contrôlée par le test"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestShortestJobFirst:
+    """Tests pour l'ordonnancement par coût estimé avec vieillissement"""
+
+    @pytest.mark.asyncio
+    async def test_shortest_admitted_first(self):
+        """La place libérée va à la conversion estimée la plus courte"""
+        clock = FakeClock()
+        controller = AdmissionController(1, 4, 1, clock=clock)
+        running = await controller.acquire()
+        order = []
+
+        async def waiter(name, cost):
+            ticket = await controller.acquire(cost=cost)
+            order.append(name)
+            controller.release(ticket)
+
+        long = asyncio.ensure_future(waiter("longue", 30.0))
+        await asyncio.sleep(0)
+        short = asyncio.ensure_future(waiter("courte", 0.5))
+        await asyncio.sleep(0)
+
+        controller.release(running)
+        await asyncio.gather(long, short)
+        assert order == ["courte", "longue"]
+
+    @pytest.mark.asyncio
+    async def test_aging_prevents_starvation(self):
+        """Une conversion longue qui attend depuis assez longtemps passe devant"""
+        clock = FakeClock()
+        controller = AdmissionController(1, 4, 1, aging=1.0, clock=clock)
+        running = await controller.acquire()
+        order = []
+
+        async def waiter(name, cost):
+            ticket = await controller.acquire(cost=cost)
+            order.append(name)
+            controller.release(ticket)
+
+        long = asyncio.ensure_future(waiter("longue", 10.0))
+        await asyncio.sleep(0)
+        clock.now = 20.0
+        short = asyncio.ensure_future(waiter("courte", 0.5))
+        await asyncio.sleep(0)
+
+        controller.release(running)
+        await asyncio.gather(long, short)
+        assert order == ["longue", "courte"]
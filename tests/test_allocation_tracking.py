@@ -0,0 +1,77 @@
+"""
+Tests pour le suivi des allocations mémoire (tracemalloc)
+"""
+import tracemalloc
+import pytest
+from app.allocation_tracking import AllocationTracker, AllocationTrackingError, SnapshotNotFoundError
+
+
+@pytest.fixture
+def tracker():
+    """Suivi des allocations arrêté après chaque test"""
+    tracker = AllocationTracker(max_snapshots=2)
+    yield tracker
+    tracker.stop()
+
+
+class TestAllocationTracker:
+    """Tests pour le suivi des allocations"""
+    
+    def test_start_stop(self, tracker):
+        """tracemalloc n'est actif qu'entre start et stop"""
+        assert tracker.start(10)["tracing"] is True
+        assert tracemalloc.is_tracing()
+        
+        status = tracker.stop()
+        
+        assert status["tracing"] is False
+        assert status["snapshots"] == []
+        assert not tracemalloc.is_tracing()
+    
+    def test_snapshot_requires_tracing(self, tracker):
+        """Un snapshot exige que tracemalloc soit actif"""
+        with pytest.raises(AllocationTrackingError):
+            tracker.take_snapshot()
+    
+    def test_diff_shows_growth(self, tracker):
+        """La comparaison fait apparaître les allocations retenues entre deux snapshots"""
+        tracker.start(5)
+        first = tracker.take_snapshot()
+        retained = [bytearray(100000) for _ in range(10)]
+        second = tracker.take_snapshot()
+        
+        entries = tracker.diff(first["id"], second["id"], limit=5)
+        
+        assert entries[0]["size_diff"] >= 1000000
+        assert any("test_allocation_tracking.py" in frame for frame in entries[0]["traceback"])
+        del retained
+    
+    def test_snapshot_eviction(self, tracker):
+        """Seuls les derniers snapshots sont conservés"""
+        tracker.start(1)
+        first = tracker.take_snapshot()
+        tracker.take_snapshot()
+        third = tracker.take_snapshot()
+        
+        with pytest.raises(SnapshotNotFoundError):
+            tracker.diff(first["id"], third["id"])
+    
+    def test_snapshot_described_when_not_kept(self):
+        """Sans snapshot conservé, la description du snapshot pris est tout de même retournée"""
+        tracker = AllocationTracker(max_snapshots=0)
+        tracker.start(1)
+        try:
+            described = tracker.take_snapshot()
+        finally:
+            tracker.stop()
+        
+        assert described["id"] == 1
+        assert tracker.status()["snapshots"] == []
+    
+    def test_invalid_group_by(self, tracker):
+        """Un regroupement inconnu est refusé"""
+        tracker.start(1)
+        snapshot = tracker.take_snapshot()
+        
+        with pytest.raises(AllocationTrackingError):
+            tracker.diff(snapshot["id"], snapshot["id"], group_by="module")
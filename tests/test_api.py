@@ -6,6 +6,13 @@ import io
 from unittest.mock import patch, Mock
 from fastapi import status
 from app.services.msg_converter import MSGConversionError
+from app.services.rate_limiting import RateLimitPolicy
+from app.services.quotas import QuotaPolicy
+from app.services.ingest import OLE_SIGNATURE
+from app.services.cost_estimator import CostEstimate
+
+# Contenu de test portant la signature d'un conteneur OLE
+MSG_CONTENT = OLE_SIGNATURE + b"MSG file content"
 
 
 class TestHealthEndpoint:
@@ -35,6 +42,98 @@ class TestHealthEndpoint:
             data = response.json()
             assert data["status"] == "healthy"
             assert data["jwks_status"] == "error"
+    
+    def test_health_check_jwks_off_event_loop(self, client):
+        """La récupération des clés JWKS ne bloque pas la boucle d'événements"""
+        import asyncio
+        
+        def get_jwks():
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return {"keys": []}
+        
+        with patch('app.auth.get_jwks', side_effect=get_jwks) as mock_jwks:
+            response = client.get("/health")
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["jwks_status"] == "ok"
+        mock_jwks.assert_called_once()
+
+
+class TestHealthProbes:
+    """Tests pour les sondes de vivacité et de disponibilité"""
+    
+    def test_liveness_probe(self, client):
+        """La sonde de vivacité répond sans appeler JWKS"""
+        with patch('app.auth.get_jwks') as mock_jwks:
+            response = client.get("/health/live")
+            
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["status"] == "alive"
+            mock_jwks.assert_not_called()
+    
+    def test_readiness_probe_ready(self, client):
+        """La sonde de disponibilité expose les indicateurs de capacité"""
+        from app.services.capacity import MemoryStatus
+        memory = MemoryStatus(limit=4 * 1024**3, used=1024**3, headroom=3 * 1024**3, source="cgroup_v2")
+        
+        with patch('app.auth.get_jwks') as mock_jwks, \
+             patch('app.main.read_memory_status', return_value=memory):
+            response = client.get("/health/ready")
+            
+            assert response.status_code == status.HTTP_200_OK
+            data = response.json()
+            assert data["status"] == "ready"
+            assert data["queue_depth"] == 0
+            assert data["busy_workers"] == 0
+            assert data["max_workers"] >= 1
+            assert data["jwks_cache_age"] is None
+            assert data["memory_headroom"] == 3 * 1024**3
+            assert set(data["lanes"]) == {"interactive", "bulk"}
+            assert data["lanes"]["interactive"]["queued"] == 0
+            assert data["lanes"]["interactive"]["workers"] >= 1
+            mock_jwks.assert_not_called()
+    
+    def test_readiness_probe_low_memory(self, client):
+        """La sonde de disponibilité retourne 503 si la mémoire est insuffisante"""
+        from app.services.capacity import MemoryStatus
+        memory = MemoryStatus(limit=1024**3, used=1024**3, headroom=0, source="cgroup_v2")
+        
+        with patch('app.main.read_memory_status', return_value=memory):
+            response = client.get("/health/ready")
+            
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert "low_memory" in response.json()["reasons"]
+    
+    def test_readiness_probe_shutting_down(self, client):
+        """La sonde de disponibilité retourne 503 pendant l'arrêt"""
+        with patch('app.main.draining', True):
+            response = client.get("/health/ready")
+            
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert "shutting_down" in response.json()["reasons"]
+
+
+class TestMetricsEndpoint:
+    """Tests pour l'endpoint de métriques"""
+    
+    def test_metrics_exposition(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Les métriques par étape sont exposées au format texte"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            client.post("/convert", files=files, headers=auth_headers)
+        
+        response = client.get("/metrics")
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        body = response.text
+        assert 'msgtopdf_stage_duration_seconds_count{stage="upload_read"}' in body
+        assert 'msgtopdf_stage_duration_seconds_count{stage="response_write"}' in body
+        assert "msgtopdf_bytes_received_total" in body
+        assert 'msgtopdf_conversions_total{outcome="success"}' in body
+        assert "msgtopdf_conversion_queue_depth 0" in body
 
 
 class TestUserInfoEndpoint:
@@ -63,7 +162,7 @@ class TestConvertEndpoint:
     def test_convert_success(self, client, mock_auth, auth_headers, mock_msg_converter):
         """Test de conversion réussie"""
         # Préparation du fichier de test
-        file_content = b"MSG file content"
+        file_content = MSG_CONTENT
         files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
         data = {"merge_attachments": True}
         
@@ -80,9 +179,23 @@ class TestConvertEndpoint:
             mock_msg_converter.convert_msg_to_pdf.assert_called_once()
             mock_msg_converter.merge_pdfs.assert_called_once()
     
+    def test_convert_gzip_multipart(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Un envoi multipart compressé en gzip est décompressé au fil de la réception"""
+        import gzip
+        body = (b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"test.msg\"\r\n\r\n"
+                + MSG_CONTENT + b"\r\n--b--\r\n")
+        headers = {**auth_headers, "Content-Type": "multipart/form-data; boundary=b", "Content-Encoding": "gzip"}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", content=gzip.compress(body), headers=headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/pdf"
+        mock_msg_converter.convert_msg_to_pdf.assert_called_once()
+    
     def test_convert_without_merge(self, client, mock_auth, auth_headers, mock_msg_converter):
         """Test de conversion sans fusion des pièces jointes"""
-        file_content = b"MSG file content"
+        file_content = MSG_CONTENT
         files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
         data = {"merge_attachments": False}
         
@@ -95,9 +208,214 @@ class TestConvertEndpoint:
             mock_msg_converter.convert_msg_to_pdf.assert_called_once()
             mock_msg_converter.merge_pdfs.assert_not_called()
     
+    def test_convert_saturated_returns_503(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Capacité saturée : refus rapide 503 avec Retry-After, sans conversion"""
+        from app.services.admission import AdmissionController
+        from app.main import admission_lanes
+        controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=1, lanes=admission_lanes)
+        controller._active = 1
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.admission_controller', controller):
+            response = client.post("/convert", files=files, headers=auth_headers)
+            
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert int(response.headers["Retry-After"]) >= 1
+            mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+            assert controller.active == 1
+    
+    def test_convert_over_memory_budget_returns_413(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Une conversion estimée au-delà du budget mémoire est refusée sans attendre"""
+        from app.services.admission import AdmissionController
+        from app.main import admission_lanes
+        controller = AdmissionController(max_concurrent=4, max_queue=4, queue_timeout=1, memory_budget=1024,
+                                         lanes=admission_lanes)
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.admission_controller', controller):
+            response = client.post("/convert", files=files, headers=auth_headers)
+            
+            assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            assert "Retry-After" not in response.headers
+            mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+    
+    def test_convert_routed_to_lane(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Un petit message est orienté vers la voie la moins coûteuse, comptée à l'admission seulement"""
+        from app.main import conversion_lanes
+        from app.services.lanes import LANE_ROUTED
+        lane = conversion_lanes[0].name
+        before = LANE_ROUTED.get(lane=lane)
+        
+        with patch('app.main.converter', mock_msg_converter):
+            dry_run = client.post("/convert", files={"file": ("test.msg", io.BytesIO(MSG_CONTENT))},
+                                  data={"dry_run": True}, headers=auth_headers)
+            assert dry_run.json()["lane"] == lane
+            assert LANE_ROUTED.get(lane=lane) == before
+            response = client.post("/convert", files={"file": ("test.msg", io.BytesIO(MSG_CONTENT))},
+                                   headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["X-Conversion-Lane"] == lane
+        assert LANE_ROUTED.get(lane=lane) == before + 1
+    
+    def test_convert_dry_run(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Le dry-run retourne le coût estimé sans admettre ni convertir"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, data={"dry_run": True}, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["file_size"] == len(MSG_CONTENT)
+        assert len(data["sha256"]) == 64
+        assert data["memory_estimate"] > 0
+        assert data["wall_time_estimate"] > 0
+        assert data["readable"] is False
+        assert data["lane"] == "interactive"
+        assert response.headers["X-Request-ID"] == data["request_id"]
+        assert "RateLimit-Limit" in response.headers
+        assert "RateLimit-Remaining" in response.headers
+        mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+    
+    def test_convert_observed_by_cost_model(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Chaque conversion mesurée alimente la calibration des estimations"""
+        from app.main import cost_model
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert cost_model.samples == 1
+    
+    def test_cost_model_observes_execution_time(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Le temps observé est celui de l'exécution dans le worker, sans l'attente de la file"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        def timed(func, *args):
+            return func(*args), 0.25
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.cost_model') as cost_model, \
+             patch('app.main._timed', side_effect=timed):
+            cost_model.estimate.return_value = CostEstimate(memory=1024, wall_time=0.1)
+            response = client.post("/convert", files=files, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert cost_model.observe.call_args[0][1] == 0.25
+    
+    def test_convert_releases_admission(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """La place de conversion est libérée après la réponse, y compris en erreur"""
+        from app.main import admission_controller
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        mock_msg_converter.convert_msg_to_pdf.side_effect = MSGConversionError("boom")
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers=auth_headers)
+            
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+            assert admission_controller.active == 0
+    
+    def test_convert_uses_scratch_space(self, client, mock_auth, auth_headers, mock_msg_converter, tmp_path):
+        """Le fichier reçu est écrit dans l'espace de travail de la requête, supprimé après la réponse"""
+        from app.main import scratch_space
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        seen = {}
+        
+        def convert(path, request_id, strict_mode, spill_dir=None):
+            seen["content"] = open(path, "rb").read()
+            seen["path"], seen["spill_dir"] = path, spill_dir
+            return b"%PDF-1.4 main", []
+        mock_msg_converter.convert_msg_to_pdf.side_effect = convert
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch.object(scratch_space, 'root', tmp_path / "msgtopdf"):
+            response = client.post("/convert", files=files, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert seen["content"] == MSG_CONTENT
+        assert seen["path"].startswith(str(tmp_path / "msgtopdf"))
+        assert seen["path"].startswith(seen["spill_dir"])
+        assert list((tmp_path / "msgtopdf").iterdir()) == []
+        assert scratch_space.active == 0
+    
+    def test_convert_rate_limit_headers(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Les réponses portent les en-têtes RateLimit-* de l'utilisateur"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.rate_limit_policies', {"default": RateLimitPolicy(60, 5, 2)}):
+            response = client.post("/convert", files=files, headers=auth_headers)
+            
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["RateLimit-Limit"] == "5"
+            assert response.headers["RateLimit-Remaining"] == "4"
+            assert "RateLimit-Reset" in response.headers
+    
+    def test_convert_rate_limited(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Au-delà de la rafale, la conversion est refusée en 429 avec Retry-After"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.rate_limit_policies', {"default": RateLimitPolicy(60, 1, 0)}):
+            first = client.post("/convert", files=files, headers=auth_headers)
+            files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+            second = client.post("/convert", files=files, headers=auth_headers)
+            
+            assert first.status_code == status.HTTP_200_OK
+            assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+            assert second.headers["RateLimit-Remaining"] == "0"
+            assert int(second.headers["Retry-After"]) >= 1
+            assert mock_msg_converter.convert_msg_to_pdf.call_count == 1
+    
+    def test_convert_releases_user_concurrency(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """La place de concurrence de l'utilisateur est libérée après la requête"""
+        from app.main import rate_limiter
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.rate_limit_policies', {"default": RateLimitPolicy(0, 0, 1)}):
+            for _ in range(2):
+                files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+                response = client.post("/convert", files=files, headers=auth_headers)
+                assert response.status_code == status.HTTP_200_OK
+            
+            assert rate_limiter.active("test-user-123") == 0
+    
+    def test_convert_usage_recorded(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """La consommation de la conversion est imputée à l'utilisateur"""
+        from app.services.quotas import usage_ledger
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        usage = usage_ledger.usage("test-user-123")
+        assert usage["conversions"] == 1
+        assert usage["output_bytes"] == int(response.headers["X-Output-Size"])
+        assert usage["cpu_seconds"] >= 0
+    
+    def test_convert_quota_exceeded(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Quota de la fenêtre atteint : refus en 429 avec Retry-After, sans conversion"""
+        from app.services.quotas import usage_ledger
+        usage_ledger.record("test-user-123", cpu_seconds=10, output_bytes=0)
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.quota_policies', {"default": QuotaPolicy(cpu_seconds=5)}):
+            response = client.post("/convert", files=files, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers["Retry-After"]) >= 1
+        mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+    
     def test_convert_unauthorized(self, client):
         """Test de conversion sans authentification"""
-        file_content = b"MSG file content"
+        file_content = MSG_CONTENT
         files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
         
         response = client.post("/convert", files=files)
@@ -115,9 +433,31 @@ class TestConvertEndpoint:
         data = response.json()
         assert "Type de fichier non supporté" in data["detail"]
     
+    def test_convert_not_ole_rejected(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Un contenu sans signature OLE est refusé dès la réception, sans conversion"""
+        files = {"file": ("test.msg", io.BytesIO(b"MOCK_MSG_DATA" * 100), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "message Outlook" in response.json()["detail"]
+        mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+    
+    def test_convert_content_hash_header(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """L'empreinte SHA-256 du fichier reçu est retournée"""
+        import hashlib
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["X-Content-SHA256"] == hashlib.sha256(MSG_CONTENT).hexdigest()
+    
     def test_convert_no_filename(self, client, mock_auth, auth_headers):
         """Test de conversion sans nom de fichier"""
-        file_content = b"MSG file content"
+        file_content = MSG_CONTENT
         files = {"file": ("", io.BytesIO(file_content), "application/octet-stream")}
         
         response = client.post("/convert", files=files, headers=auth_headers)
@@ -141,7 +481,7 @@ class TestConvertEndpoint:
     
     def test_convert_msg_conversion_error(self, client, mock_auth, auth_headers, mock_msg_converter):
         """Test d'erreur de conversion MSG"""
-        file_content = b"Invalid MSG file"
+        file_content = OLE_SIGNATURE + b"Invalid MSG file"
         files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
         
         # Configuration du mock pour lever une exception
@@ -156,7 +496,7 @@ class TestConvertEndpoint:
     
     def test_convert_internal_error(self, client, mock_auth, auth_headers, mock_msg_converter):
         """Test d'erreur interne lors de la conversion"""
-        file_content = b"MSG file content"
+        file_content = MSG_CONTENT
         files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
         
         # Configuration du mock pour lever une exception générique
@@ -171,7 +511,7 @@ class TestConvertEndpoint:
     
     def test_convert_with_attachments(self, client, mock_auth, auth_headers, mock_msg_converter):
         """Test de conversion avec pièces jointes"""
-        file_content = b"MSG file with attachments"
+        file_content = OLE_SIGNATURE + b"MSG file with attachments"
         files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
         data = {"merge_attachments": True}
         
@@ -197,7 +537,7 @@ class TestConvertEndpoint:
     
     def test_convert_response_headers(self, client, mock_auth, auth_headers, mock_msg_converter):
         """Test des headers de réponse de conversion"""
-        file_content = b"MSG file content"
+        file_content = MSG_CONTENT
         files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
         
         with patch('app.main.converter', mock_msg_converter):
@@ -213,6 +553,553 @@ class TestConvertEndpoint:
             assert "X-Attachments-Processed" in response.headers
             assert "X-Original-Size" in response.headers
             assert "X-Output-Size" in response.headers
+    
+    def test_convert_server_timing_header(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Test de l'en-tête Server-Timing détaillant les étapes"""
+        file_content = MSG_CONTENT
+        files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers=auth_headers)
+            
+            assert response.status_code == status.HTTP_200_OK
+            server_timing = response.headers["Server-Timing"]
+            assert "auth;dur=" in server_timing
+            assert "upload;dur=" in server_timing
+            assert "total;dur=" in server_timing
+
+
+class TestSourceUrlConvert:
+    """Tests pour la conversion d'un fichier récupéré par URL"""
+    
+    @pytest.fixture
+    def fetcher(self):
+        """Stockage objet simulé sur un hôte autorisé"""
+        import httpx
+        from app.services.source_fetch import SourceFetcher, parse_hosts
+        
+        def handler(request):
+            if request.url.path == "/bucket/email.msg":
+                return httpx.Response(200, content=MSG_CONTENT)
+            if request.url.path == "/bucket/lent.msg":
+                raise httpx.ReadTimeout("lent", request=request)
+            return httpx.Response(404)
+        
+        fetcher = SourceFetcher(parse_hosts("s3.local"), 1024, transport=httpx.MockTransport(handler))
+        with patch('app.main.source_fetcher', fetcher):
+            yield fetcher
+    
+    def test_convert_from_url(self, client, mock_auth, auth_headers, mock_msg_converter, fetcher):
+        """Le fichier est récupéré puis converti comme un envoi"""
+        import hashlib
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post(
+                "/convert",
+                data={"source_url": "https://s3.local/bucket/email.msg?X-Amz-Signature=abc"},
+                headers=auth_headers
+            )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert "filename=email.pdf" in response.headers["Content-Disposition"]
+        assert response.headers["X-Content-SHA256"] == hashlib.sha256(MSG_CONTENT).hexdigest()
+        mock_msg_converter.convert_msg_to_pdf.assert_called_once()
+    
+    def test_file_or_url_required(self, client, mock_auth, auth_headers, fetcher):
+        """Fournir à la fois un fichier et une URL, ou aucun des deux, est refusé"""
+        both = client.post(
+            "/convert",
+            files={"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")},
+            data={"source_url": "https://s3.local/bucket/email.msg"},
+            headers=auth_headers
+        )
+        neither = client.post("/convert", data={"merge_attachments": "true"}, headers=auth_headers)
+        
+        assert both.status_code == status.HTTP_400_BAD_REQUEST
+        assert neither.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_host_not_allowed(self, client, mock_auth, auth_headers, fetcher):
+        """Un hôte hors de la liste est interdit"""
+        response = client.post(
+            "/convert", data={"source_url": "http://169.254.169.254/latest/email.msg"}, headers=auth_headers
+        )
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_fetch_failures(self, client, mock_auth, auth_headers, fetcher):
+        """Source absente (502), délai dépassé (504), extension invalide (400)"""
+        missing = client.post("/convert", data={"source_url": "https://s3.local/bucket/absent.msg"},
+                              headers=auth_headers)
+        slow = client.post("/convert", data={"source_url": "https://s3.local/bucket/lent.msg"},
+                           headers=auth_headers)
+        extension = client.post("/convert", data={"source_url": "https://s3.local/bucket/notes.txt"},
+                                headers=auth_headers)
+        
+        assert missing.status_code == status.HTTP_502_BAD_GATEWAY
+        assert slow.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+        assert extension.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestAsyncConversion:
+    """Tests pour les conversions asynchrones avec livraison par webhook"""
+    
+    @pytest.fixture
+    def dispatcher(self, client, tmp_path):
+        """Livreur autorisé vers hooks.local, enregistrement des livraisons observé
+
+        Les requêtes partagent une boucle d'événements persistante : les conversions
+        confiées au livreur s'y poursuivent après la réponse, et sont attendues par
+        self.post avant les vérifications.
+        """
+        import anyio.from_thread
+        from unittest.mock import AsyncMock
+        from app.services.source_fetch import parse_hosts
+        from app.services.webhooks import DeliveryStore, WebhookDispatcher
+        
+        dispatcher = WebhookDispatcher(DeliveryStore(str(tmp_path / "hooks.sqlite3")), parse_hosts("hooks.local"))
+        dispatcher.enqueue = AsyncMock(return_value=1)
+        with anyio.from_thread.start_blocking_portal(**client.async_backend) as portal, \
+             patch('app.main.webhook_dispatcher', dispatcher):
+            client.portal = portal
+            try:
+                yield dispatcher
+            finally:
+                client.portal = None
+    
+    def post(self, client, dispatcher, *args, **kwargs):
+        """Requête puis attente des conversions asynchrones qu'elle a acceptées"""
+        response = client.post(*args, **kwargs)
+        client.portal.call(dispatcher.join)
+        return response
+    
+    def payload(self, dispatcher):
+        """Corps JSON de la livraison enregistrée"""
+        import json
+        request_id, url, body, headers = dispatcher.enqueue.call_args[0]
+        assert headers["Content-Type"] == "application/json"
+        return json.loads(body)
+    
+    def test_accepted_then_delivered(self, client, mock_auth, auth_headers, mock_msg_converter, dispatcher):
+        """La conversion est acceptée (202) puis son résultat enregistré pour livraison"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = self.post(client, dispatcher, "/convert", files=files,
+                                 data={"callback_url": "https://hooks.local/done"}, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        data = response.json()
+        assert data["status"] == "accepted"
+        assert data["callback_url"] == "https://hooks.local/done"
+        assert "RateLimit-Limit" in response.headers
+        assert "RateLimit-Remaining" in response.headers
+        mock_msg_converter.convert_msg_to_pdf.assert_called_once()
+        assert dispatcher.enqueue.call_args[0][:2] == (data["request_id"], "https://hooks.local/done")
+        payload = self.payload(dispatcher)
+        assert payload["status"] == "succeeded"
+        assert payload["result"]["output_filename"] == "test.pdf"
+        assert payload["result"]["output_size"] == len(b"Merged PDF content")
+    
+    def test_failure_delivered(self, client, mock_auth, auth_headers, mock_msg_converter, dispatcher):
+        """Une conversion échouée est livrée avec le code qu'aurait reçu un appel synchrone"""
+        mock_msg_converter.convert_msg_to_pdf.side_effect = MSGConversionError("Invalid MSG format")
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = self.post(
+                client, dispatcher, "/convert/raw?callback_url=https://hooks.local/done", content=MSG_CONTENT,
+                headers={**auth_headers, "Content-Type": "application/vnd.ms-outlook"}
+            )
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        payload = self.payload(dispatcher)
+        assert payload["status"] == "failed"
+        assert payload["status_code"] == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert "Erreur de conversion" in payload["detail"]
+    
+    def test_pdf_payload(self, client, mock_auth, auth_headers, mock_msg_converter, dispatcher):
+        """Configuré en mode pdf, le PDF est livré avec les métadonnées en en-têtes"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.settings.webhook_payload', "pdf"):
+            self.post(client, dispatcher, "/convert", files=files,
+                      data={"callback_url": "https://hooks.local/done"}, headers=auth_headers)
+        
+        _, _, body, headers = dispatcher.enqueue.call_args[0]
+        assert body == b"Merged PDF content"
+        assert headers["Content-Type"] == "application/pdf"
+        assert headers["X-Output-Size"] == str(len(body))
+        assert "Server-Timing" not in headers
+    
+    def test_path_conversion_with_callback(self, client, mock_auth, auth_headers, mock_msg_converter,
+                                           dispatcher, tmp_path):
+        """Une conversion par référence asynchrone livre le chemin du PDF écrit"""
+        (tmp_path / "email.msg").write_bytes(MSG_CONTENT)
+        mock_auth.return_value = {"sub": "test-user-123", "roles": ["admin"], "exp": 9999999999}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.reference_roots', [tmp_path]):
+            response = self.post(
+                client, dispatcher, "/convert/path",
+                json={"path": str(tmp_path / "email.msg"), "write_output": True,
+                      "callback_url": "https://hooks.local/done"},
+                headers=auth_headers
+            )
+        
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert self.payload(dispatcher)["result"]["output_path"] == str(tmp_path / "email.pdf")
+        assert (tmp_path / "email.pdf").exists()
+    
+    def test_callback_host_not_allowed(self, client, mock_auth, auth_headers, mock_msg_converter, dispatcher):
+        """Une URL de rappel hors des hôtes autorisés est refusée avant la conversion"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = self.post(client, dispatcher, "/convert", files=files,
+                                 data={"callback_url": "http://10.0.0.1/hook"}, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+        dispatcher.enqueue.assert_not_called()
+
+    def test_store_failure_logged(self, client, mock_auth, auth_headers, mock_msg_converter, dispatcher):
+        """Une file des livraisons inaccessible est journalisée sans interrompre la conversion asynchrone"""
+        import sqlite3
+        dispatcher.enqueue.side_effect = sqlite3.OperationalError("database is locked")
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.log_error') as log_error:
+            response = self.post(client, dispatcher, "/convert", files=files,
+                                 data={"callback_url": "https://hooks.local/done"}, headers=auth_headers)
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        request_id, error, context = log_error.call_args[0]
+        assert request_id == response.json()["request_id"]
+        assert isinstance(error, sqlite3.OperationalError)
+        assert context == {"callback_url": "https://hooks.local/done"}
+
+
+class TestRawConvertEndpoint:
+    """Tests pour l'endpoint de conversion à corps brut"""
+    
+    def raw_headers(self, auth_headers, **extra):
+        """En-têtes d'un envoi brut"""
+        return {**auth_headers, "Content-Type": "application/vnd.ms-outlook", **extra}
+    
+    def test_raw_convert_success(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Le .msg transmis tel quel est converti avec les options par défaut"""
+        import hashlib
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert/raw", content=MSG_CONTENT, headers=self.raw_headers(auth_headers))
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/pdf"
+        assert "filename=message.pdf" in response.headers["Content-Disposition"]
+        assert response.headers["X-Content-SHA256"] == hashlib.sha256(MSG_CONTENT).hexdigest()
+        assert mock_msg_converter.convert_msg_to_pdf.call_args[0][2] is False  # strict_mode
+    
+    def test_raw_options_from_query_and_headers(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Les options sont lues en paramètres de requête, sinon en en-têtes"""
+        headers = self.raw_headers(auth_headers, **{"X-Filename": "rapport.msg", "X-Strict-Mode": "true",
+                                                    "X-Merge-Attachments": "true"})
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert/raw?merge_attachments=false", content=MSG_CONTENT, headers=headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert "filename=rapport.pdf" in response.headers["Content-Disposition"]
+        assert mock_msg_converter.convert_msg_to_pdf.call_args[0][2] is True
+        mock_msg_converter.merge_pdfs.assert_not_called()
+    
+    def test_raw_streamed_in_chunks(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Un corps transmis par blocs est reçu en un passage"""
+        def chunks():
+            for start in range(0, len(MSG_CONTENT), 5):
+                yield MSG_CONTENT[start:start + 5]
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert/raw?dry_run=true", content=chunks(),
+                                   headers=self.raw_headers(auth_headers))
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["file_size"] == len(MSG_CONTENT)
+    
+    def test_raw_gzip_body(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Un corps compressé en gzip est décompressé avant réception"""
+        import gzip
+        import hashlib
+        headers = self.raw_headers(auth_headers, **{"Content-Encoding": "gzip"})
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert/raw", content=gzip.compress(MSG_CONTENT), headers=headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["X-Content-SHA256"] == hashlib.sha256(MSG_CONTENT).hexdigest()
+    
+    def test_raw_wrong_content_type(self, client, mock_auth, auth_headers):
+        """Seul le type application/vnd.ms-outlook est accepté"""
+        response = client.post("/convert/raw", content=MSG_CONTENT,
+                               headers={**auth_headers, "Content-Type": "application/octet-stream"})
+        
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    
+    def test_raw_not_ole_rejected(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Un corps sans signature OLE est refusé sans conversion"""
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert/raw", content=b"MOCK_MSG_DATA" * 10,
+                                   headers=self.raw_headers(auth_headers))
+        
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+    
+    def test_raw_unauthorized(self, client):
+        """L'authentification est requise"""
+        response = client.post("/convert/raw", content=MSG_CONTENT,
+                               headers={"Content-Type": "application/vnd.ms-outlook"})
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TestPathConvertEndpoint:
+    """Tests pour l'endpoint de conversion par référence"""
+    
+    @pytest.fixture
+    def root(self, tmp_path, mock_auth):
+        """Répertoire autorisé contenant un fichier .msg, utilisateur ayant le rôle requis"""
+        (tmp_path / "email.msg").write_bytes(MSG_CONTENT)
+        mock_auth.return_value = {"sub": "test-user-123", "roles": ["user", "admin"], "exp": 9999999999}
+        with patch('app.main.reference_roots', [tmp_path]):
+            yield tmp_path
+    
+    def test_path_convert_success(self, client, mock_auth, auth_headers, mock_msg_converter, root):
+        """Le fichier est converti en place, sans fichier temporaire"""
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert/path", json={"path": str(root / "email.msg")}, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/pdf"
+        assert "filename=email.pdf" in response.headers["Content-Disposition"]
+        assert mock_msg_converter.convert_msg_to_pdf.call_args[0][0] == str(root / "email.msg")
+        assert not (root / "email.pdf").exists()
+    
+    def test_path_write_output(self, client, mock_auth, auth_headers, mock_msg_converter, root):
+        """Avec write_output, le PDF est écrit à côté du fichier et seules les métadonnées sont retournées"""
+        import hashlib
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post(
+                "/convert/path",
+                json={"path": str(root / "email.msg"), "write_output": True},
+                headers=auth_headers
+            )
+        
+        assert response.status_code == status.HTTP_200_OK
+        data = response.json()
+        assert data["output_path"] == str(root / "email.pdf")
+        assert data["output_filename"] == "email.pdf"
+        assert data["sha256"] == hashlib.sha256(MSG_CONTENT).hexdigest()
+        assert data["output_size"] == len(b"Merged PDF content")
+        assert (root / "email.pdf").read_bytes() == b"Merged PDF content"
+        assert "RateLimit-Limit" in response.headers
+        assert "RateLimit-Remaining" in response.headers
+    
+    def test_path_requires_role(self, client, mock_auth, auth_headers, mock_msg_converter, root):
+        """Sans le rôle REFERENCE_ROLE, l'endpoint est interdit avant tout accès au fichier"""
+        mock_auth.return_value = {"sub": "test-user-123", "roles": ["user"], "exp": 9999999999}
+        
+        with patch('app.main.converter', mock_msg_converter), \
+             patch('app.main.resolve_reference') as resolve:
+            response = client.post("/convert/path", json={"path": str(root / "email.msg")}, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        resolve.assert_not_called()
+        mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+    
+    def test_path_existing_output(self, client, mock_auth, auth_headers, mock_msg_converter, root):
+        """Un PDF existant n'est remplacé qu'avec overwrite, sinon la conversion est refusée (409)"""
+        (root / "email.pdf").write_bytes(b"ancien")
+        body = {"path": str(root / "email.msg"), "write_output": True}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            refused = client.post("/convert/path", json=body, headers=auth_headers)
+            assert (root / "email.pdf").read_bytes() == b"ancien"
+            mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+            replaced = client.post("/convert/path", json={**body, "overwrite": True}, headers=auth_headers)
+        
+        assert refused.status_code == status.HTTP_409_CONFLICT
+        assert replaced.status_code == status.HTTP_200_OK
+        assert (root / "email.pdf").read_bytes() == b"Merged PDF content"
+    
+    def test_path_dry_run(self, client, mock_auth, auth_headers, mock_msg_converter, root):
+        """Le coût estimé est retourné sans conversion"""
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post(
+                "/convert/path",
+                json={"path": str(root / "email.msg"), "dry_run": True},
+                headers=auth_headers
+            )
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["file_size"] == len(MSG_CONTENT)
+        mock_msg_converter.convert_msg_to_pdf.assert_not_called()
+    
+    def test_path_outside_roots(self, client, mock_auth, auth_headers, root, tmp_path_factory):
+        """Un chemin hors des répertoires autorisés est interdit"""
+        outside = tmp_path_factory.mktemp("outside") / "email.msg"
+        outside.write_bytes(MSG_CONTENT)
+        
+        response = client.post("/convert/path", json={"path": str(outside)}, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_path_disabled_by_default(self, client, mock_auth, auth_headers, tmp_path):
+        """Sans répertoire autorisé configuré, l'endpoint refuse tout chemin"""
+        (tmp_path / "email.msg").write_bytes(MSG_CONTENT)
+        mock_auth.return_value = {"sub": "test-user-123", "roles": ["admin"], "exp": 9999999999}
+        
+        response = client.post("/convert/path", json={"path": str(tmp_path / "email.msg")}, headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert "désactivée" in response.json()["detail"]
+    
+    def test_path_missing_or_invalid(self, client, mock_auth, auth_headers, root):
+        """Fichier absent (404), extension (400) ou contenu (400) invalides"""
+        (root / "notes.txt").write_bytes(MSG_CONTENT)
+        (root / "faux.msg").write_bytes(b"not an ole container")
+        
+        missing = client.post("/convert/path", json={"path": str(root / "absent.msg")}, headers=auth_headers)
+        extension = client.post("/convert/path", json={"path": str(root / "notes.txt")}, headers=auth_headers)
+        content = client.post("/convert/path", json={"path": str(root / "faux.msg")}, headers=auth_headers)
+        
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+        assert extension.status_code == status.HTTP_400_BAD_REQUEST
+        assert content.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestAdminDiagnostics:
+    """Tests pour le profilage et les diagnostics d'administration"""
+    
+    @pytest.fixture
+    def profile_dir(self, tmp_path):
+        """Répertoire de profils temporaire"""
+        with patch('app.profiling.profile_store.directory', tmp_path):
+            yield tmp_path
+    
+    def test_profile_header_admin(self, client, mock_auth, auth_headers, mock_msg_converter, profile_dir):
+        """Un administrateur peut profiler une conversion puis télécharger le profil"""
+        mock_auth.return_value = {"sub": "admin-user", "roles": ["admin"], "exp": 9999999999}
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers={**auth_headers, "X-Profile": "1"})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["X-Profile-Captured"] == "cprofile"
+        request_id = response.headers["X-Request-ID"]
+        
+        listing = client.get("/admin/profiles", headers=auth_headers)
+        assert listing.status_code == status.HTTP_200_OK
+        assert listing.json()[0]["request_id"] == request_id
+        
+        download = client.get(f"/admin/profiles/{request_id}", headers=auth_headers)
+        assert download.status_code == status.HTTP_200_OK
+        assert len(download.content) > 0
+    
+    def test_profile_header_ignored_for_non_admin(self, client, mock_auth, auth_headers, mock_msg_converter, profile_dir):
+        """L'en-tête de profilage est ignoré pour un utilisateur non administrateur"""
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers={**auth_headers, "X-Profile": "1"})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert "X-Profile-Captured" not in response.headers
+        assert list(profile_dir.iterdir()) == []
+    
+    def test_admin_endpoints_forbidden(self, client, mock_auth, auth_headers):
+        """Les endpoints d'administration sont réservés aux administrateurs"""
+        response = client.get("/admin/profiles", headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_sampled_stacks_endpoint(self, client, mock_auth, auth_headers):
+        """Les piles de l'échantillonneur continu sont exposées aux administrateurs"""
+        mock_auth.return_value = {"sub": "admin-user", "roles": ["admin"], "exp": 9999999999}
+        
+        response = client.get("/admin/profiler/stacks", headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "X-Profiler-Samples" in response.headers
+    
+    def test_request_resources(self, client, mock_auth, auth_headers, mock_msg_converter):
+        """Les ressources d'une conversion sont consultables par identifiant de requête"""
+        mock_auth.return_value = {"sub": "admin-user", "roles": ["admin"], "exp": 9999999999}
+        files = {"file": ("test.msg", io.BytesIO(MSG_CONTENT), "application/octet-stream")}
+        
+        with patch('app.main.converter', mock_msg_converter):
+            response = client.post("/convert", files=files, headers=auth_headers)
+        request_id = response.headers["X-Request-ID"]
+        
+        report = client.get(f"/admin/requests/{request_id}/resources", headers=auth_headers)
+        
+        assert report.status_code == status.HTTP_200_OK
+        data = report.json()
+        assert data["user_id"] == "admin-user"
+        assert "upload_read" in data["stages"]
+        assert "cpu_time" in data["stages"]["upload_read"]
+        
+        missing = client.get("/admin/requests/unknown/resources", headers=auth_headers)
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_usage_endpoints(self, client, mock_auth, auth_headers):
+        """La consommation par utilisateur est exposée aux administrateurs"""
+        from app.services.quotas import usage_ledger
+        mock_auth.return_value = {"sub": "admin-user", "roles": ["admin"], "exp": 9999999999}
+        usage_ledger.record("gros-consommateur", cpu_seconds=30, output_bytes=2048)
+        usage_ledger.record("petit-consommateur", cpu_seconds=1, output_bytes=100)
+        
+        top = client.get("/admin/usage?limit=1", headers=auth_headers)
+        assert top.status_code == status.HTTP_200_OK
+        assert [entry["subject"] for entry in top.json()] == ["gros-consommateur"]
+        
+        single = client.get("/admin/usage/petit-consommateur", headers=auth_headers)
+        assert single.status_code == status.HTTP_200_OK
+        assert single.json()["output_bytes"] == 100
+        assert single.json()["conversions"] == 1
+    
+    def test_tracemalloc_endpoints(self, client, mock_auth, auth_headers):
+        """Cycle complet start / snapshot / diff / stop de tracemalloc"""
+        mock_auth.return_value = {"sub": "admin-user", "roles": ["admin"], "exp": 9999999999}
+        
+        try:
+            conflict = client.post("/admin/tracemalloc/snapshots", headers=auth_headers)
+            assert conflict.status_code == status.HTTP_409_CONFLICT
+            
+            assert client.post("/admin/tracemalloc/start?frames=5", headers=auth_headers).json()["tracing"] is True
+            first = client.post("/admin/tracemalloc/snapshots", headers=auth_headers).json()
+            second = client.post("/admin/tracemalloc/snapshots", headers=auth_headers).json()
+            
+            diff = client.get(
+                f"/admin/tracemalloc/diff?from_id={first['id']}&to_id={second['id']}&limit=5",
+                headers=auth_headers
+            )
+            assert diff.status_code == status.HTTP_200_OK
+            assert len(diff.json()) <= 5
+            
+            missing = client.get("/admin/tracemalloc/diff?from_id=999&to_id=1000", headers=auth_headers)
+            assert missing.status_code == status.HTTP_404_NOT_FOUND
+        finally:
+            stopped = client.post("/admin/tracemalloc/stop", headers=auth_headers)
+        
+        assert stopped.json()["tracing"] is False
+    
+    def test_download_unknown_profile(self, client, mock_auth, auth_headers, profile_dir):
+        """Un profil inexistant retourne 404"""
+        mock_auth.return_value = {"sub": "admin-user", "roles": ["admin"], "exp": 9999999999}
+        
+        response = client.get("/admin/profiles/00000000-0000-0000-0000-000000000000", headers=auth_headers)
+        
+        assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
 class TestErrorHandling:
@@ -233,7 +1120,7 @@ class TestErrorHandling:
         with patch('app.main.converter') as mock_converter:
             mock_converter.convert_msg_to_pdf.side_effect = RuntimeError("Unexpected error")
             
-            file_content = b"MSG file content"
+            file_content = MSG_CONTENT
             files = {"file": ("test.msg", io.BytesIO(file_content), "application/octet-stream")}
             
             response = client.post("/convert", files=files, headers=auth_headers)
@@ -268,6 +1155,50 @@ class TestStartupShutdown:
             # L'événement ne devrait pas lever d'exception même en cas d'erreur JWKS
             await startup_event()
     
+    @pytest.mark.asyncio
+    async def test_startup_rejects_insufficient_capacity(self):
+        """Moins de workers que de voies : le démarrage échoue avec une erreur de configuration claire"""
+        from app.main import startup_event
+        
+        with patch('app.main.settings.conversion_workers', 1), \
+             patch('app.auth.get_jwks') as mock_jwks:
+            with pytest.raises(ValueError, match="CONVERSION_WORKERS=1"):
+                await startup_event()
+        
+        mock_jwks.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_startup_event_jwks_off_event_loop(self):
+        """La vérification JWKS du démarrage ne bloque pas la boucle d'événements"""
+        import asyncio
+        
+        def get_jwks():
+            with pytest.raises(RuntimeError):
+                asyncio.get_running_loop()
+            return {"keys": []}
+        
+        with patch('app.auth.get_jwks', side_effect=get_jwks) as mock_jwks:
+            from app.main import startup_event
+            await startup_event()
+        
+        mock_jwks.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_startup_redirects_library_temp_files(self):
+        """Les fichiers temporaires des bibliothèques (multipart mis en tampon) sont créés sous TEMP_DIR"""
+        import tempfile
+        from app.main import scratch_space, startup_event
+        
+        previous = tempfile.tempdir
+        try:
+            with patch('app.auth.get_jwks', return_value={"keys": []}):
+                await startup_event()
+            
+            assert tempfile.gettempdir() == str(scratch_space.root)
+            assert scratch_space.root.is_dir()
+        finally:
+            tempfile.tempdir = previous
+    
     @pytest.mark.asyncio
     async def test_shutdown_event(self):
         """Test de l'événement d'arrêt"""
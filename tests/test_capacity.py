@@ -0,0 +1,135 @@
+"""
+Tests pour le suivi de capacité de conversion
+"""
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from app.services import capacity
+from app.services.capacity import ConversionPool, read_memory_status
+
+
+class TestConversionPool:
+    """Tests pour le pool de workers de conversion"""
+    
+    @pytest.mark.asyncio
+    async def test_run_returns_result(self):
+        """Le résultat de la fonction est retourné à l'appelant"""
+        pool = ConversionPool(1)
+        try:
+            result = await pool.run(lambda a, b: a + b, 2, 3)
+            assert result == 5
+            assert pool.queue_depth == 0
+            assert pool.busy_workers == 0
+        finally:
+            pool.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_counters_during_execution(self):
+        """Les compteurs reflètent les workers occupés et la file d'attente"""
+        pool = ConversionPool(1)
+        release = threading.Event()
+        started = threading.Event()
+        
+        def blocking():
+            started.set()
+            release.wait(5)
+            return "done"
+        
+        try:
+            first = asyncio.ensure_future(pool.run(blocking))
+            second = asyncio.ensure_future(pool.run(lambda: "second"))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            await asyncio.sleep(0)
+            
+            assert pool.busy_workers == 1
+            assert pool.queue_depth == 1
+            
+            release.set()
+            assert await first == "done"
+            assert await second == "second"
+            assert pool.busy_workers == 0
+            assert pool.queue_depth == 0
+        finally:
+            release.set()
+            pool.shutdown()
+    
+    @pytest.mark.asyncio
+    async def test_exception_propagates(self):
+        """Les exceptions de la fonction sont propagées et les compteurs remis à zéro"""
+        pool = ConversionPool(1)
+        
+        def failing():
+            raise ValueError("boom")
+        
+        try:
+            with pytest.raises(ValueError, match="boom"):
+                await pool.run(failing)
+            assert pool.busy_workers == 0
+        finally:
+            pool.shutdown()
+
+
+    @pytest.mark.asyncio
+    async def test_lanes_have_dedicated_workers(self):
+        """Une voie saturée n'occupe pas les workers des autres voies"""
+        pool = ConversionPool(2, lanes={"interactive": 1, "bulk": 1})
+        release = threading.Event()
+        started = threading.Event()
+        
+        def blocking():
+            started.set()
+            release.wait(5)
+            return "bulk"
+        
+        try:
+            assert pool.max_workers == 2
+            bulk = asyncio.ensure_future(pool.run_in_lane("bulk", blocking))
+            queued = asyncio.ensure_future(pool.run_in_lane("bulk", lambda: "bulk-2"))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            
+            assert await pool.run_in_lane("interactive", lambda: "small") == "small"
+            status = pool.lane_status()
+            assert status["bulk"] == {"workers": 1, "busy": 1, "queued": 1}
+            assert status["interactive"]["busy"] == 0
+            
+            release.set()
+            assert await bulk == "bulk"
+            assert await queued == "bulk-2"
+        finally:
+            release.set()
+            pool.shutdown()
+
+
+class TestMemoryStatus:
+    """Tests pour la lecture de l'état mémoire"""
+    
+    def test_cgroup_v2_limit(self, tmp_path):
+        """La limite cgroup v2 est prioritaire"""
+        (tmp_path / "memory.max").write_text("1073741824\n")
+        (tmp_path / "memory.current").write_text("268435456\n")
+        (tmp_path / "meminfo").write_text("MemTotal:       16384000 kB\nMemAvailable:    8192000 kB\n")
+        
+        with patch.object(capacity, "CGROUP_V2_MEMORY_MAX", str(tmp_path / "memory.max")), \
+             patch.object(capacity, "CGROUP_V2_MEMORY_CURRENT", str(tmp_path / "memory.current")), \
+             patch.object(capacity, "PROC_MEMINFO", str(tmp_path / "meminfo")):
+            memory = read_memory_status()
+        
+        assert memory.source == "cgroup_v2"
+        assert memory.limit == 1073741824
+        assert memory.headroom == 1073741824 - 268435456
+    
+    def test_unlimited_cgroup_falls_back_to_meminfo(self, tmp_path):
+        """Sans limite cgroup, la mémoire disponible de l'hôte est utilisée"""
+        (tmp_path / "memory.max").write_text("max\n")
+        (tmp_path / "memory.current").write_text("268435456\n")
+        (tmp_path / "meminfo").write_text("MemTotal:       16384000 kB\nMemAvailable:    8192000 kB\n")
+        
+        with patch.object(capacity, "CGROUP_V2_MEMORY_MAX", str(tmp_path / "memory.max")), \
+             patch.object(capacity, "CGROUP_V2_MEMORY_CURRENT", str(tmp_path / "memory.current")), \
+             patch.object(capacity, "CGROUP_V1_MEMORY_USAGE", str(tmp_path / "absent")), \
+             patch.object(capacity, "PROC_MEMINFO", str(tmp_path / "meminfo")):
+            memory = read_memory_status()
+        
+        assert memory.source == "meminfo"
+        assert memory.headroom == 8192000 * 1024
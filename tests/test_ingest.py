@@ -0,0 +1,83 @@
+"""
+Tests pour la réception des fichiers .msg en un passage
+"""
+import hashlib
+import mmap
+import pytest
+from app.metrics import BYTES_RECEIVED
+from app.services.ingest import (
+    OLE_SIGNATURE, InvalidUploadError, UploadIngestor, UploadTooLargeError, ingest_upload
+)
+
+
+async def chunked(data, size):
+    """Blocs asynchrones d'un contenu"""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+class TestUploadIngestor:
+    """Tests pour la vérification, le hachage et le comptage au fil des blocs"""
+
+    @pytest.mark.asyncio
+    async def test_single_pass(self):
+        """Contenu, taille et empreinte sont obtenus en un passage"""
+        data = OLE_SIGNATURE + b"x" * 10000
+        before = BYTES_RECEIVED.get()
+
+        upload = await ingest_upload(chunked(data, 3), max_size=20000)
+
+        assert upload.content[:] == data
+        assert upload.size == len(data)
+        assert upload.sha256 == hashlib.sha256(data).hexdigest()
+        assert BYTES_RECEIVED.get() == before + len(data)
+
+    @pytest.mark.asyncio
+    async def test_single_buffer_grown_in_place(self):
+        """Les blocs sont copiés dans un tampon unique, agrandi puis ramené à la taille reçue"""
+        data = OLE_SIGNATURE + bytes(range(256)) * (12 * 1024)
+
+        upload = await ingest_upload(chunked(data, 64 * 1024), max_size=len(data))
+
+        assert isinstance(upload.content, mmap.mmap)
+        assert len(upload.content) == len(data)
+        assert upload.content[:] == data
+
+    def test_rejected_on_first_chunk(self):
+        """Une signature invalide est refusée dès le premier bloc"""
+        ingestor = UploadIngestor(max_size=1000)
+
+        with pytest.raises(InvalidUploadError):
+            ingestor.feed(b"MOCK_MSG_DATA")
+        assert ingestor.size == 0
+
+    def test_signature_split_across_chunks(self):
+        """La signature peut arriver en plusieurs blocs ; l'écart est détecté au plus tôt"""
+        ingestor = UploadIngestor(max_size=1000)
+        ingestor.feed(OLE_SIGNATURE[:3])
+
+        with pytest.raises(InvalidUploadError):
+            ingestor.feed(b"\x00" * 10)
+
+    def test_too_short(self):
+        """Un contenu plus court que la signature est refusé"""
+        ingestor = UploadIngestor(max_size=1000)
+        ingestor.feed(OLE_SIGNATURE[:4])
+
+        with pytest.raises(InvalidUploadError):
+            ingestor.finish()
+
+    @pytest.mark.asyncio
+    async def test_too_large(self):
+        """La réception s'arrête dès que la taille maximale est dépassée"""
+        data = OLE_SIGNATURE + b"x" * 10000
+        received = []
+
+        async def source():
+            async for chunk in chunked(data, 1000):
+                received.append(chunk)
+                yield chunk
+
+        with pytest.raises(UploadTooLargeError):
+            await ingest_upload(source(), max_size=2500)
+        assert len(received) == 3
@@ -0,0 +1,87 @@
+"""
+Tests pour les voies de conversion selon le coût estimé
+"""
+import pytest
+from app.services.lanes import Lane, check_capacity, parse_lanes, select_lane, split_capacity
+
+MB = 1024 * 1024
+
+
+class TestLaneConfiguration:
+    """Tests pour la configuration des voies"""
+
+    def test_parse_lanes(self):
+        """Chaque voie reçoit son coût maximal et sa part des workers"""
+        lanes = parse_lanes("interactive=48/0.5, standard=256/0.3, bulk=0/0.2")
+
+        assert lanes == [
+            Lane("interactive", 48 * MB, 0.5),
+            Lane("standard", 256 * MB, 0.3),
+            Lane("bulk", 0, 0.2),
+        ]
+
+    def test_empty_configuration(self):
+        """Sans configuration, une voie unique reçoit tous les workers"""
+        lanes = parse_lanes("")
+
+        assert len(lanes) == 1
+        assert lanes[0].max_cost == 0
+
+    def test_last_lane_must_be_unbounded(self):
+        """La dernière voie doit accepter n'importe quel coût"""
+        with pytest.raises(ValueError):
+            parse_lanes("interactive=48/0.5,bulk=512/0.5")
+
+    def test_invalid_share(self):
+        """Une part nulle est rejetée"""
+        with pytest.raises(ValueError):
+            parse_lanes("interactive=48/0,bulk=0/1")
+
+    def test_split_capacity(self):
+        """La capacité est répartie selon les parts, au moins 1 par voie"""
+        lanes = parse_lanes("interactive=48/0.75,bulk=0/0.25")
+
+        assert split_capacity(lanes, 8) == {"interactive": 6, "bulk": 2}
+        assert split_capacity(lanes, 2) == {"interactive": 1, "bulk": 1}
+
+    @pytest.mark.parametrize("total,expected", [(2, (1, 1)), (3, (2, 1)), (5, (3, 2)), (7, (4, 3))])
+    def test_split_capacity_odd_totals(self, total, expected):
+        """Des parts égales sur une capacité impaire somment exactement à la capacité"""
+        lanes = parse_lanes("interactive=48/0.5,bulk=0/0.5")
+
+        parts = split_capacity(lanes, total)
+
+        assert sum(parts.values()) == total
+        assert (parts["interactive"], parts["bulk"]) == expected
+
+    @pytest.mark.parametrize("total", range(3, 40))
+    def test_split_capacity_preserves_total(self, total):
+        """Quelle que soit la capacité, la somme est conservée et chaque voie a au moins 1"""
+        lanes = parse_lanes("a=8/0.6,b=48/0.3,c=0/0.1")
+
+        parts = split_capacity(lanes, total)
+
+        assert sum(parts.values()) == total
+        assert min(parts.values()) >= 1
+
+    def test_more_lanes_than_capacity(self):
+        """Plus de voies que de capacité : une place par voie, configuration refusée par la vérification"""
+        lanes = parse_lanes("interactive=48/0.5,bulk=0/0.5")
+
+        assert split_capacity(lanes, 1) == {"interactive": 1, "bulk": 1}
+        check_capacity(lanes, {"CONVERSION_WORKERS": 2})
+        with pytest.raises(ValueError, match="CONVERSION_WORKERS=1 pour 2 voies"):
+            check_capacity(lanes, {"CONVERSION_WORKERS": 1})
+
+
+class TestLaneSelection:
+    """Tests pour l'orientation des conversions"""
+
+    def test_select_by_cost(self):
+        """La première voie dont la borne couvre le coût est retenue"""
+        lanes = parse_lanes("interactive=48/0.5,standard=256/0.3,bulk=0/0.2")
+
+        assert select_lane(lanes, 33 * MB).name == "interactive"
+        assert select_lane(lanes, 48 * MB).name == "interactive"
+        assert select_lane(lanes, 100 * MB).name == "standard"
+        assert select_lane(lanes, 2048 * MB).name == "bulk"
@@ -0,0 +1,233 @@
+"""
+Tests pour l'envoi des logs vers Loki
+"""
+import gzip
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.log_shipping import LokiHandler, parse_labels, LOG_RECORDS_DROPPED, LOG_RECORDS_SHIPPED
+
+
+class LokiStandIn:
+    """Serveur HTTP local imitant l'API push de Loki"""
+
+    def __init__(self, delay=0.0, status=204):
+        self.delay = delay
+        self.status = status
+        self.pushes = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(stand_in.delay)
+                stand_in.pushes.append({"path": self.path, "headers": dict(self.headers), "body": body})
+                self.send_response(stand_in.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def streams(self):
+        """Flux reçus (corps décompressés)"""
+        return [
+            stream
+            for push in self.pushes
+            for stream in json.loads(gzip.decompress(push["body"]))["streams"]
+        ]
+
+    def lines(self):
+        """Lignes de log reçues"""
+        return [value[1] for stream in self.streams() for value in stream["values"]]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def loki():
+    """Stand-in Loki local"""
+    server = LokiStandIn()
+    yield server
+    server.close()
+
+
+def make_logger(handler, name="test.loki"):
+    """Logger isolé utilisant le handler"""
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return logger
+
+
+def wait_for(condition, timeout=5.0):
+    """Attend qu'une condition soit vraie"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestParseLabels:
+    """Tests pour le parsing des labels"""
+
+    def test_parse_labels(self):
+        """Labels au format clé=valeur séparés par des virgules"""
+        assert parse_labels("app=msgtopdf, env=prod") == {"app": "msgtopdf", "env": "prod"}
+        assert parse_labels("") == {}
+
+
+class TestLokiHandler:
+    """Tests pour le handler Loki"""
+
+    def test_batches_compressed_push(self, loki):
+        """Les enregistrements sont envoyés par lots compressés avec les labels"""
+        handler = LokiHandler(loki.url, labels={"app": "msgtopdf"}, batch_size=3, flush_interval=10)
+        logger = make_logger(handler)
+        try:
+            for i in range(3):
+                logger.info("ligne %s", i)
+            assert wait_for(lambda: len(loki.lines()) == 3)
+        finally:
+            handler.close()
+
+        push = loki.pushes[0]
+        assert push["path"] == "/loki/api/v1/push"
+        assert push["headers"]["Content-Encoding"] == "gzip"
+        assert len(loki.pushes) == 1
+        assert loki.streams()[0]["stream"] == {"app": "msgtopdf", "level": "info"}
+        assert loki.lines() == ["ligne 0", "ligne 1", "ligne 2"]
+
+    def test_flush_interval(self, loki):
+        """Un lot incomplet est envoyé à l'échéance de l'intervalle"""
+        handler = LokiHandler(loki.url, batch_size=100, flush_interval=0.05)
+        logger = make_logger(handler)
+        try:
+            logger.warning("seule")
+            assert wait_for(lambda: loki.lines() == ["seule"])
+        finally:
+            handler.close()
+
+    def test_close_flushes(self, loki):
+        """La fermeture envoie les enregistrements restants"""
+        handler = LokiHandler(loki.url, batch_size=100, flush_interval=60)
+        logger = make_logger(handler)
+        logger.error("dernière")
+        handler.close()
+
+        assert loki.lines() == ["dernière"]
+
+    def test_flush_pushed_by_shipper_thread(self, loki):
+        """flush() attend que le thread d'envoi ait vidé le tampon, sans envoyer lui-même"""
+        handler = LokiHandler(loki.url, batch_size=2, flush_interval=60)
+        logger = make_logger(handler)
+        push, threads = handler._push, []
+
+        def tracked(batch):
+            threads.append(threading.current_thread().name)
+            return push(batch)
+
+        handler._push = tracked
+        try:
+            for i in range(5):
+                logger.info("ligne %s", i)
+            handler.flush()
+
+            assert loki.lines() == [f"ligne {i}" for i in range(5)]
+            assert handler.buffered == 0
+            assert set(threads) == {"loki-shipper"}
+        finally:
+            handler.close()
+
+    def test_drop_newest_when_full(self, loki):
+        """Tampon plein : les nouveaux enregistrements sont rejetés"""
+        handler = LokiHandler(loki.url, batch_size=100, flush_interval=60, buffer_size=2, sample_rate=1)
+        logger = make_logger(handler)
+        before = LOG_RECORDS_DROPPED.get(reason="overflow")
+        for i in range(4):
+            logger.warning("ligne %s", i)
+        handler.close()
+
+        assert loki.lines() == ["ligne 0", "ligne 1"]
+        assert LOG_RECORDS_DROPPED.get(reason="overflow") == before + 2
+
+    def test_drop_oldest_when_full(self, loki):
+        """Tampon plein en mode drop_oldest : les plus anciens sont éjectés"""
+        handler = LokiHandler(loki.url, batch_size=100, flush_interval=60, buffer_size=2,
+                              overflow_policy="drop_oldest", sample_rate=1)
+        logger = make_logger(handler)
+        for i in range(4):
+            logger.warning("ligne %s", i)
+        handler.close()
+
+        assert loki.lines() == ["ligne 2", "ligne 3"]
+
+    def test_sampling_spares_warnings(self, loki):
+        """Au-delà de la moitié du tampon, seuls les niveaux < WARNING sont échantillonnés"""
+        handler = LokiHandler(loki.url, batch_size=1000, flush_interval=60, buffer_size=100, sample_rate=10)
+        logger = make_logger(handler)
+        before = LOG_RECORDS_DROPPED.get(reason="sampled")
+        for i in range(50):
+            logger.info("info %s", i)
+        for i in range(20):
+            logger.debug("debug %s", i)
+        logger.error("erreur")
+        handler.close()
+
+        lines = loki.lines()
+        assert "erreur" in lines
+        assert len([line for line in lines if line.startswith("debug")]) == 2
+        assert LOG_RECORDS_DROPPED.get(reason="sampled") == before + 18
+
+    def test_invalid_policy(self):
+        """Une politique de débordement inconnue est refusée"""
+        with pytest.raises(ValueError):
+            LokiHandler("http://127.0.0.1:1", overflow_policy="block")
+
+    def test_slow_backend_does_not_block(self):
+        """Un backend lent ne ralentit pas les appels de log"""
+        slow = LokiStandIn(delay=0.5)
+        handler = LokiHandler(slow.url, batch_size=5, flush_interval=0.01, buffer_size=5, sample_rate=1)
+        logger = make_logger(handler)
+        before = LOG_RECORDS_DROPPED.get(reason="overflow")
+        try:
+            start = time.perf_counter()
+            for i in range(200):
+                logger.warning("ligne %s", i)
+            elapsed = time.perf_counter() - start
+        finally:
+            handler.close()
+            slow.close()
+
+        assert elapsed < 0.4
+        assert LOG_RECORDS_DROPPED.get(reason="overflow") > before
+
+    def test_failed_push_counted(self):
+        """Un lot refusé par le backend est abandonné et compté"""
+        failing = LokiStandIn(status=500)
+        handler = LokiHandler(failing.url, batch_size=2, flush_interval=60)
+        logger = make_logger(handler)
+        before_dropped = LOG_RECORDS_DROPPED.get(reason="push_failed")
+        before_shipped = LOG_RECORDS_SHIPPED.get()
+        try:
+            logger.warning("a")
+            logger.warning("b")
+            assert wait_for(lambda: LOG_RECORDS_DROPPED.get(reason="push_failed") == before_dropped + 2)
+        finally:
+            handler.close()
+            failing.close()
+
+        assert LOG_RECORDS_SHIPPED.get() == before_shipped
@@ -0,0 +1,184 @@
+"""
+Tests pour la configuration du logging
+"""
+import io
+import queue
+import sys
+import json
+import logging
+import pytest
+from app.config import settings
+from app.logging_config import (
+    ColoredFormatter, JsonFormatter, LazyQueueHandler, RequestContextFilter,
+    setup_logging, shutdown_logging, set_request_id, reset_request_id, log_error
+)
+import app.logging_config
+
+
+def make_record(msg="Message %s", args=("test",), **extra):
+    """Crée un enregistrement de log"""
+    record = logging.makeLogRecord({
+        "name": "test", "levelno": logging.INFO, "levelname": "INFO", "msg": msg, "args": args
+    })
+    record.__dict__.update(extra)
+    return record
+
+
+class Unformattable:
+    """Argument dont le formatage est détectable"""
+
+    formatted = 0
+
+    def __str__(self):
+        Unformattable.formatted += 1
+        return "formaté"
+
+
+@pytest.fixture
+def restore_logging():
+    """Restaure la configuration du logger racine après le test"""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    originals = (settings.log_json, settings.log_async)
+    yield
+    shutdown_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    settings.log_json, settings.log_async = originals
+
+
+class TestRequestContext:
+    """Tests pour l'identifiant de requête porté par le contexte"""
+
+    def test_filter_adds_request_id(self):
+        """Le filtre ajoute l'identifiant de la requête en cours"""
+        token = set_request_id("req-123")
+        try:
+            record = make_record()
+            RequestContextFilter().filter(record)
+        finally:
+            reset_request_id(token)
+
+        assert record.request_id == "req-123"
+
+    def test_filter_outside_request(self):
+        """Hors requête, l'identifiant vaut '-'"""
+        record = make_record()
+        RequestContextFilter().filter(record)
+
+        assert record.request_id == "-"
+
+    def test_filter_keeps_explicit_request_id(self):
+        """Un identifiant passé via `extra` n'est pas écrasé"""
+        token = set_request_id("req-ctx")
+        try:
+            record = make_record(request_id="req-extra")
+            RequestContextFilter().filter(record)
+        finally:
+            reset_request_id(token)
+
+        assert record.request_id == "req-extra"
+
+
+class TestFormatters:
+    """Tests pour les formatters"""
+
+    def test_colored_formatter_restores_levelname(self):
+        """Le formatter coloré ne modifie pas l'enregistrement"""
+        record = make_record()
+        output = ColoredFormatter("%(levelname)s %(message)s").format(record)
+
+        assert "\033[32m" in output
+        assert record.levelname == "INFO"
+
+    def test_json_formatter(self):
+        """Sortie JSON avec identifiant de requête et champs extra"""
+        record = make_record(request_id="req-1", file_name="test.msg")
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert entry["message"] == "Message test"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "test"
+        assert entry["request_id"] == "req-1"
+        assert entry["file_name"] == "test.msg"
+        assert "exception" not in entry
+
+    def test_json_formatter_exception(self):
+        """La trace d'appel est incluse pour les exceptions"""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.makeLogRecord({"msg": "Erreur", "exc_info": sys.exc_info()})
+        entry = json.loads(JsonFormatter().format(record))
+
+        assert "ValueError: boom" in entry["exception"]
+
+
+class TestAsyncLogging:
+    """Tests pour le mode asynchrone"""
+
+    def test_queue_handler_defers_formatting(self):
+        """L'enregistrement est mis en file sans formatage du message"""
+        handler = LazyQueueHandler(queue.SimpleQueue())
+        Unformattable.formatted = 0
+
+        handler.handle(make_record(args=(Unformattable(),)))
+        queued = handler.queue.get_nowait()
+
+        assert Unformattable.formatted == 0
+        assert queued.getMessage() == "Message formaté"
+
+    def test_async_json_logging(self, restore_logging, monkeypatch):
+        """Les messages sont écrits par le thread d'écoute avec l'identifiant de requête"""
+        stream = io.StringIO()
+        monkeypatch.setattr(app.logging_config.sys, "stdout", stream)
+        settings.log_json = True
+        settings.log_async = True
+        setup_logging()
+
+        token = set_request_id("req-async")
+        try:
+            logging.getLogger("test.async").warning("Fichier %s", "a.msg")
+        finally:
+            reset_request_id(token)
+        shutdown_logging()
+
+        entry = json.loads(stream.getvalue().strip().splitlines()[-1])
+        assert entry["message"] == "Fichier a.msg"
+        assert entry["request_id"] == "req-async"
+
+    def test_disabled_level_not_formatted(self, restore_logging, monkeypatch):
+        """Un message sous le niveau configuré n'est jamais formaté"""
+        monkeypatch.setattr(app.logging_config.sys, "stdout", io.StringIO())
+        monkeypatch.setattr(settings, "log_level", "INFO")
+        settings.log_async = True
+        setup_logging()
+        Unformattable.formatted = 0
+
+        logging.getLogger("test.async").debug("Détail %s", Unformattable())
+        shutdown_logging()
+
+        assert Unformattable.formatted == 0
+
+
+class TestLogError:
+    """Tests pour la journalisation des erreurs"""
+
+    def test_unexpected_error_has_traceback(self, caplog):
+        """Les erreurs inattendues conservent la trace d'appel"""
+        with caplog.at_level(logging.ERROR, logger="api.error"):
+            log_error("req-1", RuntimeError("boom"))
+
+        assert caplog.records[-1].exc_info is not None
+        assert caplog.records[-1].request_id == "req-1"
+
+    def test_expected_error_without_traceback(self, caplog):
+        """Les erreurs de validation attendues sont journalisées sans trace d'appel"""
+        with caplog.at_level(logging.ERROR, logger="api.error"):
+            log_error("req-1", ValueError("Nom de fichier manquant"), expected=True)
+
+        assert not caplog.records[-1].exc_info
+        assert "Nom de fichier manquant" in caplog.records[-1].getMessage()
@@ -0,0 +1,50 @@
+"""
+Tests pour la surveillance de la boucle d'événements
+"""
+import asyncio
+import logging
+import time
+import pytest
+from app.loop_monitor import EventLoopMonitor, LOOP_BLOCKED, LOOP_LAG
+
+
+def blocking_call(duration):
+    """Appel synchrone qui bloque la boucle"""
+    time.sleep(duration)
+
+
+class TestEventLoopMonitor:
+    """Tests pour le moniteur de boucle"""
+    
+    @pytest.mark.asyncio
+    async def test_lag_measured(self):
+        """La latence de la boucle est mesurée à chaque battement"""
+        monitor = EventLoopMonitor(interval=0.01, block_threshold=1)
+        before = LOOP_LAG.get_count()
+        
+        monitor.start()
+        try:
+            await asyncio.sleep(0.1)
+        finally:
+            await monitor.stop()
+        
+        assert LOOP_LAG.get_count() > before
+        assert not monitor.running
+    
+    @pytest.mark.asyncio
+    async def test_blocking_call_reported(self, caplog):
+        """Un blocage au-delà du seuil est compté et sa pile journalisée"""
+        monitor = EventLoopMonitor(interval=0.01, block_threshold=0.05)
+        before = LOOP_BLOCKED.get()
+        
+        monitor.start()
+        try:
+            await asyncio.sleep(0.05)
+            with caplog.at_level(logging.WARNING, logger="app.loop_monitor"):
+                blocking_call(0.3)
+                await asyncio.sleep(0.05)
+        finally:
+            await monitor.stop()
+        
+        assert LOOP_BLOCKED.get() == before + 1
+        assert any("blocking_call" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,400 @@
+"""
+Tests pour l'inventaire des pièces jointes et l'estimation du coût
+"""
+import io
+import re
+import pytest
+from unittest.mock import patch
+import olefile
+from PIL import Image
+from reportlab.pdfgen import canvas
+from app.services.manifest import (
+    read_manifest, read_pdf_page_count, attachment_kind, pdf_page_count, AttachmentInfo, MessageManifest,
+    StreamReader, OLEFILE_INTERNALS
+)
+from app.services import cost_estimator
+from app.services.cost_estimator import CostModel, estimate_memory, estimate_wall_time
+
+MB = 1024 * 1024
+
+
+class FakeOle:
+    """Conteneur OLE simulé (chemins de flux -> contenu)"""
+
+    def __init__(self, streams):
+        self.streams = streams
+
+    def listdir(self, streams=True, storages=False):
+        return [path.split("/") for path in self.streams]
+
+    def exists(self, path):
+        return path in self.streams or any(p.startswith(path + "/") for p in self.streams)
+
+    def get_size(self, path):
+        return len(self.streams[path])
+
+    def openstream(self, path):
+        return io.BytesIO(self.streams[path])
+
+    def close(self):
+        pass
+
+
+def png_bytes(width, height):
+    """Image PNG de test"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def pdf_bytes(pages):
+    """PDF de test"""
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer)
+    for page in range(pages):
+        document.drawString(100, 750, f"Page {page + 1}")
+        document.showPage()
+    document.save()
+    return buffer.getvalue()
+
+
+def attachment(index, filename, data):
+    """Flux d'une pièce jointe de .msg"""
+    storage = f"__attach_version1.0_#{index:08X}"
+    return {
+        f"{storage}/__substg1.0_3707001F": filename.encode("utf-16-le"),
+        f"{storage}/__substg1.0_37010102": data,
+    }
+
+
+def ole_file(name, data, sector_size=512):
+    """
+    Conteneur OLE minimal (version 3) contenant un seul flux stocké dans la FAT
+
+    Les secteurs du flux sont alloués dans l'ordre inverse pour exercer le
+    parcours de la chaîne de secteurs.
+    """
+    import struct
+    free, end, fat_sector, no_stream = 0xFFFFFFFF, 0xFFFFFFFE, 0xFFFFFFFD, 0xFFFFFFFF
+    count = -(-len(data) // sector_size)
+    data_sectors = list(range(2 + count - 1, 1, -1))
+    fat = [free] * (sector_size // 4)
+    fat[0], fat[1] = fat_sector, end
+    for current, following in zip(data_sectors, data_sectors[1:] + [end]):
+        fat[current] = following
+
+    def entry(entry_name, entry_type, child, start, size):
+        encoded = entry_name.encode("utf-16-le") + b"\x00\x00" if entry_name else b""
+        return (encoded.ljust(64, b"\x00") + struct.pack("<HBB", len(encoded), entry_type, 1)
+                + struct.pack("<III", no_stream, no_stream, child) + b"\x00" * 36
+                + struct.pack("<IQ", start, size))
+
+    directory = (entry("Root Entry", 5, 1, end, 0) + entry(name, 2, no_stream, data_sectors[0], len(data))
+                 + entry("", 0, no_stream, 0, 0) * 2)
+    header = (olefile.MAGIC + b"\x00" * 16 + struct.pack("<HHHHH", 0x3E, 3, 0xFFFE, 9, 6) + b"\x00" * 6
+              + struct.pack("<IIIIIIIII", 0, 1, 1, 0, 4096, end, 0, end, 0)
+              + struct.pack("<109I", 0, *([free] * 108)))
+    padded = data.ljust(count * sector_size, b"\x00")
+    sectors = {index: padded[i * sector_size:(i + 1) * sector_size]
+               for i, index in enumerate(data_sectors)}
+    body = b"".join(sectors[index] for index in range(2, 2 + count))
+    return header + struct.pack(f"<{len(fat)}I", *fat) + directory + body
+
+
+class TestStreamReader:
+    """Tests pour la lecture bornée des flux OLE"""
+
+    def test_ranges_follow_sector_chain(self):
+        """Les plages lues suivent la chaîne de secteurs, sans lire le flux entier"""
+        data = bytes(range(256)) * 64
+        ole = olefile.OleFileIO(io.BytesIO(ole_file("big", data)))
+        try:
+            reader = StreamReader(ole, "big")
+            with patch.object(ole, "openstream", side_effect=AssertionError("flux lu en entier")):
+                assert reader.size == len(data)
+                assert reader.read(0, 10) == data[:10]
+                assert reader.read(500, 1000) == data[500:1500]
+                assert reader.read(len(data) - 100, 4096) == data[-100:]
+                assert reader.read(len(data), 10) == b""
+        finally:
+            ole.close()
+
+    def test_olefile_internals_available(self):
+        """olefile expose toujours les attributs internes dont dépend la lecture par secteurs"""
+        ole = olefile.OleFileIO(io.BytesIO(ole_file("big", bytes(8192))))
+        try:
+            missing = [name for name in OLEFILE_INTERNALS if not hasattr(ole, name)]
+            assert missing == []
+            assert ole.direntries[ole._find("big")].isectStart < len(ole.fat)
+            assert ole.sectorsize == 512
+        finally:
+            ole.close()
+
+
+class TestReadManifest:
+    """Tests pour l'inventaire des pièces jointes"""
+
+    def test_attachment_kinds(self):
+        """Le type est déduit de l'extension"""
+        assert attachment_kind("Rapport.PDF") == "pdf"
+        assert attachment_kind("photo.jpeg") == "image"
+        assert attachment_kind("notes.docx") == "other"
+
+    def test_manifest_from_ole(self):
+        """Tailles, types et dimensions des images sont lus sans conversion"""
+        streams = {
+            "__substg1.0_0037001F": "Sujet".encode("utf-16-le"),
+            **attachment(0, "rapport.pdf", b"%PDF-1.4" + b"x" * 992),
+            **attachment(1, "photo.png", png_bytes(30, 20)),
+            **attachment(2, "notes.txt", b"texte"),
+            "__attach_version1.0_#00000003/__substg1.0_3701000D/__substg1.0_0037001F": b"",
+        }
+
+        with patch("app.services.manifest.olefile.OleFileIO", return_value=FakeOle(streams)):
+            manifest = read_manifest(b"x" * 5000)
+
+        assert manifest.readable
+        assert manifest.upload_size == 5000
+        kinds = [(a.filename, a.kind) for a in manifest.attachments]
+        assert kinds == [("rapport.pdf", "pdf"), ("photo.png", "image"), ("notes.txt", "other"), ("", "message")]
+        assert manifest.attachments[0].size == 1000
+        assert manifest.attachments[1].pixels == 600
+        assert manifest.count("image") == 1
+
+    def test_mapped_file_read_without_copy(self, tmp_path):
+        """Une projection mmap est transmise telle quelle à olefile"""
+        import mmap
+        path = tmp_path / "email.msg"
+        path.write_bytes(b"x" * 100)
+
+        with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with patch("app.services.manifest.olefile.OleFileIO", return_value=FakeOle({})) as ole:
+                manifest = read_manifest(mapped)
+
+            assert ole.call_args[0][0] is mapped
+        assert manifest.upload_size == 100
+
+    def test_pdf_pages_in_manifest(self):
+        """Le nombre de pages des PDFs joints est lu dans l'inventaire"""
+        streams = attachment(0, "rapport.pdf", pdf_bytes(4))
+
+        with patch("app.services.manifest.olefile.OleFileIO", return_value=FakeOle(streams)):
+            manifest = read_manifest(b"x" * 100)
+
+        assert manifest.attachments[0].pages == 4
+
+    def test_unreadable_image_header(self):
+        """Un en-tête d'image illisible laisse les dimensions inconnues"""
+        streams = attachment(0, "photo.jpg", b"pas une image")
+
+        with patch("app.services.manifest.olefile.OleFileIO", return_value=FakeOle(streams)):
+            manifest = read_manifest(b"x" * 100)
+
+        assert manifest.attachments[0].kind == "image"
+        assert manifest.attachments[0].pixels is None
+
+    def test_bad_attachment_isolated(self):
+        """Une pièce jointe corrompue garde un coût inconnu sans invalider l'inventaire"""
+        corrupt = b"%PDF-1.4\n" + b"x" * 100 + b"\nxref\n0 9\ncorrupted!\n" + b"trailer\n<< /Root 1 0 R >>\nstartxref\n110\n%%EOF\n"
+        streams = {
+            **attachment(0, "corrompu.pdf", corrupt),
+            **attachment(1, "rapport.pdf", pdf_bytes(3)),
+            **attachment(2, "photo.png", png_bytes(30, 20)),
+        }
+        ole = FakeOle(streams)
+        original = ole.openstream
+
+        def openstream(path):
+            if path.startswith("__attach_version1.0_#00000002/__substg1.0_3701"):
+                raise IOError("secteur illisible")
+            return original(path)
+
+        with patch.object(ole, "openstream", side_effect=openstream), \
+             patch("app.services.manifest.olefile.OleFileIO", return_value=ole):
+            manifest = read_manifest(b"x" * 100)
+
+        assert manifest.readable
+        assert [a.filename for a in manifest.attachments] == ["corrompu.pdf", "rapport.pdf", "photo.png"]
+        assert [a.pages for a in manifest.attachments[:2]] == [None, 3]
+        assert manifest.attachments[2].pixels is None
+
+    def test_not_an_ole_file(self):
+        """Un contenu non OLE donne un inventaire vide marqué illisible"""
+        manifest = read_manifest(b"MSG file content")
+
+        assert not manifest.readable
+        assert manifest.attachments == []
+        assert manifest.upload_size == 16
+
+
+class TestPdfPageCount:
+    """Tests pour la lecture du nombre de pages d'un PDF"""
+
+    def test_pages_from_trailer(self):
+        """Le /Count de l'arbre des pages désigné par le trailer est retourné"""
+        assert pdf_page_count(pdf_bytes(7)) == 7
+
+    def test_incremental_update(self):
+        """La table xref la plus récente l'emporte, les précédentes sont suivies par /Prev"""
+        data = pdf_bytes(2)
+        tree = data.rindex(b"obj", 0, data.rindex(b"/Count 2"))
+        number = int(data[data.rfind(b"\n", 0, tree) + 1:tree].split()[0])
+        root = re.search(rb"/Root \d+ \d+ R", data).group(0)
+        previous = int(re.findall(rb"startxref\s+(\d+)", data)[-1])
+        update = b"%d 0 obj\n<< /Count 3 /Kids [ ] /Type /Pages >>\nendobj\n" % number
+        xref = len(data) + len(update)
+        updated = (data + update + b"xref\n%d 1\n%010d 00000 n \n" % (number, len(data))
+                   + b"trailer\n<< " + root + b" /Prev %d >>\nstartxref\n%d\n%%%%EOF\n" % (previous, xref))
+
+        assert pdf_page_count(updated) == 3
+
+    def test_bounded_reads(self):
+        """Seules quelques plages bornées d'un PDF volumineux sont lues"""
+        data = pdf_bytes(1500)
+        ranges = []
+
+        def read(offset, length):
+            ranges.append(length)
+            return data[offset:offset + length]
+
+        assert read_pdf_page_count(read, len(data)) == 1500
+        assert len(data) > 500 * 1024
+        assert sum(ranges) < 64 * 1024
+
+    def test_xref_stream_unknown(self):
+        """Un PDF à flux xref (objets compressés) laisse le nombre de pages inconnu"""
+        data = (b"%PDF-1.5\n1 0 obj << /Type /Page >> endobj\n"
+                b"2 0 obj << /Type /XRef /Root 3 0 R >> stream\nendstream endobj\nstartxref\n43\n%%EOF\n")
+
+        assert pdf_page_count(data) is None
+
+    def test_corrupt_xref_entry(self):
+        """Une entrée xref illisible ou hors du fichier laisse le nombre de pages inconnu"""
+        data = pdf_bytes(2)
+        root = int(re.search(rb"/Root (\d+) \d+ R", data).group(1))
+        xref = int(re.findall(rb"startxref\s+(\d+)", data)[-1])
+        entries = xref + re.match(rb"xref\s+0 \d+\s*\n", data[xref:]).end()
+        position = entries + root * 20
+
+        for value in (b"abcdefghij", b"9999999999"):
+            assert pdf_page_count(data[:position] + value + data[position + 10:]) is None
+
+    def test_unreadable(self):
+        """Un contenu sans structure PDF donne un nombre de pages inconnu"""
+        assert pdf_page_count(b"%PDF-1.4" + b"x" * 992) is None
+
+
+class TestEstimateMemory:
+    """Tests pour l'estimation mémoire"""
+
+    def test_upload_only(self):
+        """Sans pièce jointe, l'estimation dépend de la taille du fichier"""
+        manifest = MessageManifest(upload_size=1000)
+
+        assert estimate_memory(manifest) == cost_estimator.BASE_MEMORY + 3000
+
+    def test_image_pixels_dominate(self):
+        """Une image compressée coûte selon ses pixels décodés"""
+        small = MessageManifest(upload_size=1000, attachments=[
+            AttachmentInfo("a.jpg", "image", size=500, pixels=100)
+        ])
+        large = MessageManifest(upload_size=1000, attachments=[
+            AttachmentInfo("a.jpg", "image", size=500, pixels=24_000_000)
+        ])
+
+        assert estimate_memory(large) - estimate_memory(small) == (24_000_000 - 100) * 8
+
+    def test_unknown_pixels_fallback(self):
+        """Sans dimensions, la taille compressée est majorée"""
+        manifest = MessageManifest(upload_size=0, attachments=[AttachmentInfo("a.jpg", "image", size=1000)])
+
+        assert estimate_memory(manifest) == cost_estimator.BASE_MEMORY + 10_000 + 1000
+
+    def test_images_decoded_one_at_a_time(self):
+        """Plusieurs images : seul le plus grand décodage compte, les sorties s'accumulent"""
+        photos = [AttachmentInfo(f"photo{i}.jpg", "image", size=3 * MB, pixels=12_000_000) for i in range(15)]
+        manifest = MessageManifest(upload_size=45 * MB, attachments=photos)
+
+        expected = (cost_estimator.BASE_MEMORY + 3 * 45 * MB + 12_000_000 * 8 + 15 * 3 * MB)
+        assert estimate_memory(manifest) == expected
+        assert estimate_memory(manifest) < 512 * MB
+
+    def test_largest_image_decode(self):
+        """Le décodage retenu est celui de la plus grande image"""
+        manifest = MessageManifest(upload_size=0, attachments=[
+            AttachmentInfo("small.png", "image", size=100, pixels=1_000),
+            AttachmentInfo("large.png", "image", size=100, pixels=5_000_000),
+            AttachmentInfo("unknown.jpg", "image", size=100),
+        ])
+
+        assert estimate_memory(manifest) == cost_estimator.BASE_MEMORY + 5_000_000 * 8 + 300
+
+    @pytest.mark.parametrize("kind,expected", [("pdf", 3000), ("other", 0), ("message", 0)])
+    def test_attachment_types(self, kind, expected):
+        """Seules les pièces jointes converties ou fusionnées ajoutent un coût"""
+        manifest = MessageManifest(upload_size=0, attachments=[AttachmentInfo("f", kind, size=1000)])
+
+        assert estimate_memory(manifest) == cost_estimator.BASE_MEMORY + expected
+
+
+class TestEstimateWallTime:
+    """Tests pour l'estimation du temps de conversion"""
+
+    def test_grows_with_content(self):
+        """Le temps estimé croît avec les pixels des images et les pages des PDFs"""
+        text_only = MessageManifest(upload_size=50_000)
+        photos = MessageManifest(upload_size=50_000_000, attachments=[
+            AttachmentInfo("a.jpg", "image", size=8_000_000, pixels=24_000_000)
+        ])
+        report = MessageManifest(upload_size=50_000, attachments=[
+            AttachmentInfo("r.pdf", "pdf", size=1000, pages=200)
+        ])
+
+        assert estimate_wall_time(text_only) < estimate_wall_time(report) < estimate_wall_time(photos)
+
+    def test_unknown_pages_from_size(self):
+        """Sans nombre de pages, la taille du PDF sert d'estimation"""
+        known = MessageManifest(upload_size=0, attachments=[AttachmentInfo("r.pdf", "pdf", size=0, pages=11)])
+        unknown = MessageManifest(upload_size=0, attachments=[
+            AttachmentInfo("r.pdf", "pdf", size=10 * cost_estimator.PDF_BYTES_PER_PAGE)
+        ])
+
+        assert estimate_wall_time(unknown) == pytest.approx(estimate_wall_time(known))
+
+
+class TestCostModel:
+    """Tests pour la calibration des estimations sur l'historique"""
+
+    def test_uncalibrated_until_min_samples(self):
+        """Les estimations a priori sont utilisées tant que l'historique est insuffisant"""
+        model = CostModel(min_samples=5)
+        manifest = MessageManifest(upload_size=1000)
+        for _ in range(4):
+            model.observe(manifest, wall_time=10.0)
+
+        assert model.estimate(manifest).wall_time == pytest.approx(estimate_wall_time(manifest))
+        assert model.samples == 4
+
+    def test_time_calibrated_on_median(self):
+        """Le temps estimé suit le rapport médian mesuré/estimé"""
+        model = CostModel(min_samples=5)
+        manifest = MessageManifest(upload_size=1000)
+        raw = estimate_wall_time(manifest)
+        for ratio in (1.5, 2.0, 2.0, 2.5, 9.0):
+            model.observe(manifest, wall_time=raw * ratio)
+
+        assert model.estimate(manifest).wall_time == pytest.approx(raw * 2.0)
+
+    def test_memory_not_calibrated(self):
+        """La mémoire estimée reste l'estimation a priori, le temps revient à l'a priori après reset"""
+        model = CostModel(min_samples=5)
+        manifest = MessageManifest(upload_size=1000)
+        raw = estimate_wall_time(manifest)
+        for _ in range(5):
+            model.observe(manifest, wall_time=3 * raw)
+
+        assert model.estimate(manifest).memory == estimate_memory(manifest)
+        assert model.estimate(manifest).wall_time == pytest.approx(3 * raw)
+
+        model.reset()
+        assert model.estimate(manifest).wall_time == pytest.approx(raw)
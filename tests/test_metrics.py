@@ -0,0 +1,133 @@
+"""
+Tests pour les métriques au format Prometheus
+"""
+import pytest
+from app.metrics import (
+    Counter, Gauge, Histogram, MetricsRegistry, STAGE_DURATION, get_request_timings,
+    observe_attachment, observe_stage, record_image, record_merged_pages, reset_request_timings,
+    start_request_timings
+)
+
+
+class TestMetrics:
+    """Tests pour les types de métriques"""
+    
+    def test_counter_render(self):
+        """Un compteur est sérialisé avec ses labels"""
+        counter = Counter("test_total", "Compteur de test", ["kind"])
+        counter.inc(kind="a")
+        counter.inc(2, kind="b")
+        
+        output = counter.render()
+        
+        assert "# TYPE test_total counter" in output
+        assert 'test_total{kind="a"} 1' in output
+        assert 'test_total{kind="b"} 2' in output
+    
+    def test_counter_rejects_negative(self):
+        """Un compteur ne peut pas décroître"""
+        counter = Counter("test_total", "Compteur de test")
+        
+        with pytest.raises(ValueError):
+            counter.inc(-1)
+    
+    def test_invalid_labels(self):
+        """Des labels inattendus sont refusés"""
+        counter = Counter("test_total", "Compteur de test", ["kind"])
+        
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+    
+    def test_gauge_function(self):
+        """Une jauge calculée est évaluée à la collecte"""
+        values = [3]
+        gauge = Gauge("test_gauge", "Jauge de test", function=lambda: values[0])
+        values[0] = 7
+        
+        assert "test_gauge 7" in gauge.render()
+    
+    def test_histogram_buckets(self):
+        """Les buckets d'un histogramme sont cumulatifs"""
+        histogram = Histogram("test_seconds", "Histogramme de test", ["stage"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="parse")
+        histogram.observe(0.5, stage="parse")
+        histogram.observe(5, stage="parse")
+        
+        output = histogram.render()
+        
+        assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in output
+        assert 'test_seconds_bucket{stage="parse",le="1"} 2' in output
+        assert 'test_seconds_bucket{stage="parse",le="+Inf"} 3' in output
+        assert 'test_seconds_count{stage="parse"} 3' in output
+    
+    def test_label_escaping(self):
+        """Les valeurs de labels sont échappées"""
+        counter = Counter("test_total", "Compteur de test", ["name"])
+        counter.inc(name='a"b')
+        
+        assert 'test_total{name="a\\"b"} 1' in counter.render()
+    
+    def test_registry_duplicate(self):
+        """Deux métriques ne peuvent pas porter le même nom"""
+        registry = MetricsRegistry()
+        registry.register(Counter("test_total", "Compteur de test"))
+        
+        with pytest.raises(ValueError):
+            registry.register(Counter("test_total", "Compteur de test"))
+    
+    def test_observe_stage(self):
+        """La durée d'une étape est enregistrée même en cas d'erreur"""
+        before = STAGE_DURATION.get_count(stage="test_stage")
+        
+        with pytest.raises(RuntimeError):
+            with observe_stage("test_stage"):
+                raise RuntimeError("boom")
+        
+        assert STAGE_DURATION.get_count(stage="test_stage") == before + 1
+
+
+class TestRequestTimings:
+    """Tests pour l'accumulateur de durées par requête (Server-Timing)"""
+    
+    def test_stages_recorded_in_request_context(self):
+        """Les étapes et pièces jointes sont cumulées pour la requête courante"""
+        timings, token = start_request_timings()
+        try:
+            with observe_stage("parse"):
+                pass
+            with observe_attachment("image"):
+                pass
+            with observe_attachment("image"):
+                pass
+            
+            assert get_request_timings() is timings
+        finally:
+            reset_request_timings(token)
+        
+        header = timings.server_timing(total=0.5)
+        
+        assert "parse;dur=" in header
+        assert "images;dur=" in header
+        assert 'attachments-image;desc="2"' in header
+        assert header.endswith("total;dur=500.0")
+        assert get_request_timings() is None
+
+    
+    def test_resource_report(self):
+        """Le rapport de ressources inclut les étapes et la forme des entrées"""
+        timings, token = start_request_timings()
+        try:
+            with observe_stage("main_render"):
+                sum(i * i for i in range(10000))
+            record_image(800, 600)
+            record_merged_pages(3)
+        finally:
+            reset_request_timings(token)
+        
+        report = timings.resource_report()
+        
+        assert report["stages"]["main_render"]["calls"] == 1
+        assert report["stages"]["main_render"]["cpu_time"] >= 0
+        assert report["cpu_time"] == report["stages"]["main_render"]["cpu_time"]
+        assert report["images"] == [{"width": 800, "height": 600}]
+        assert report["merged_pages"] == [3]
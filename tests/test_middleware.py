@@ -0,0 +1,203 @@
+"""
+Tests pour les middlewares ASGI
+"""
+import gzip
+
+import pytest
+from fastapi import FastAPI, File, Request, UploadFile, status
+from fastapi.testclient import TestClient
+from app.metrics import UPLOADS_DECOMPRESSED, UPLOADS_REJECTED
+from app.middleware import BodySizeLimitMiddleware, GzipRequestMiddleware
+
+
+@pytest.fixture
+def limited_app():
+    """Application minimale derrière une limite de 1 Ko"""
+    app = FastAPI()
+    received = []
+
+    @app.post("/convert")
+    async def upload(file: UploadFile = File(...)):
+        content = await file.read()
+        received.append(len(content))
+        return {"size": len(content)}
+
+    @app.post("/other")
+    async def other(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    app.add_middleware(BodySizeLimitMiddleware, max_body_size=1024)
+    app.state.received = received
+    return app
+
+
+class TestBodySizeLimitMiddleware:
+    """Tests pour la limite de taille des envois"""
+
+    def test_within_limit(self, limited_app):
+        """Un envoi sous la limite est transmis à l'application"""
+        client = TestClient(limited_app)
+
+        response = client.post("/convert", files={"file": ("a.msg", b"x" * 500)})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["size"] == 500
+
+    @pytest.mark.asyncio
+    async def test_content_length_rejected_without_reading(self, limited_app):
+        """Un Content-Length au-delà de la limite est refusé sans lire le corps"""
+        before = UPLOADS_REJECTED.get(reason="content_length")
+        sent = []
+
+        async def receive():
+            sent.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http", "method": "POST", "path": "/convert",
+            "headers": [(b"content-length", b"5000000000")],
+        }
+        await BodySizeLimitMiddleware(limited_app, max_body_size=1024)(scope, receive, send)
+
+        assert messages[0]["status"] == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert not sent
+        assert limited_app.state.received == []
+        assert UPLOADS_REJECTED.get(reason="content_length") == before + 1
+
+    def test_stream_aborted_past_limit(self, limited_app):
+        """Sans Content-Length, la réception s'arrête dès la limite franchie"""
+        before = UPLOADS_REJECTED.get(reason="stream")
+        client = TestClient(limited_app)
+        body = b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.msg\"\r\n\r\n"
+        body += b"x" * 4096 + b"\r\n--b--\r\n"
+
+        def chunks():
+            for start in range(0, len(body), 256):
+                yield body[start:start + 256]
+
+        response = client.post(
+            "/convert",
+            content=chunks(),
+            headers={"Content-Type": "multipart/form-data; boundary=b"}
+        )
+
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert limited_app.state.received == []
+        assert UPLOADS_REJECTED.get(reason="stream") == before + 1
+
+    def test_other_paths_not_limited(self, limited_app):
+        """Seuls les chemins de conversion sont limités"""
+        client = TestClient(limited_app)
+
+        response = client.post("/other", files={"file": ("a.msg", b"x" * 4096)})
+
+        assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.fixture
+def gzip_app():
+    """Application minimale décompressant les envois gzip, limite de 4 Ko décompressés"""
+    app = FastAPI()
+    received = []
+
+    @app.post("/convert/raw")
+    async def upload(request: Request):
+        content = b""
+        async for chunk in request.stream():
+            content += chunk
+        received.append(content)
+        return {"size": len(content), "encoding": request.headers.get("content-encoding")}
+
+    app.add_middleware(GzipRequestMiddleware, max_body_size=4096)
+    app.state.received = received
+    return app
+
+
+class TestGzipRequestMiddleware:
+    """Tests pour la décompression des envois gzip"""
+
+    def test_gzip_body_decompressed(self, gzip_app):
+        """Le corps gzip est transmis décompressé, sans en-tête Content-Encoding"""
+        before = UPLOADS_DECOMPRESSED.get()
+        client = TestClient(gzip_app)
+        body = b"message " * 400
+
+        response = client.post("/convert/raw", content=gzip.compress(body), headers={"Content-Encoding": "gzip"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"size": len(body), "encoding": None}
+        assert gzip_app.state.received == [body]
+        assert UPLOADS_DECOMPRESSED.get() == before + 1
+
+    def test_gzip_streamed_in_chunks(self, gzip_app):
+        """Un corps gzip reçu par petits blocs et en membres concaténés est reconstitué"""
+        client = TestClient(gzip_app)
+        body = bytes(range(256)) * 8
+        compressed = gzip.compress(body[:1000]) + gzip.compress(body[1000:])
+
+        def chunks():
+            for start in range(0, len(compressed), 7):
+                yield compressed[start:start + 7]
+
+        response = client.post("/convert/raw", content=chunks(), headers={"Content-Encoding": "gzip"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert gzip_app.state.received == [body]
+
+    def test_uncompressed_body_untouched(self, gzip_app):
+        """Sans Content-Encoding, le corps est transmis tel quel"""
+        client = TestClient(gzip_app)
+
+        response = client.post("/convert/raw", content=b"x" * 100)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert gzip_app.state.received == [b"x" * 100]
+
+    def test_decompression_bomb_rejected(self, gzip_app):
+        """La limite porte sur les octets décompressés"""
+        before = UPLOADS_REJECTED.get(reason="decompressed")
+        client = TestClient(gzip_app)
+        bomb = gzip.compress(b"\0" * (2 * 1024 * 1024))
+        assert len(bomb) < 4096
+
+        response = client.post("/convert/raw", content=bomb, headers={"Content-Encoding": "gzip"})
+
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert "décompression" in response.json()["detail"]
+        assert gzip_app.state.received == []
+        assert UPLOADS_REJECTED.get(reason="decompressed") == before + 1
+
+    def test_invalid_gzip_rejected(self, gzip_app):
+        """Un corps qui n'est pas du gzip est refusé"""
+        client = TestClient(gzip_app)
+
+        response = client.post("/convert/raw", content=b"pas du gzip", headers={"Content-Encoding": "gzip"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert gzip_app.state.received == []
+
+    def test_truncated_gzip_rejected(self, gzip_app):
+        """Un flux gzip tronqué est refusé"""
+        client = TestClient(gzip_app)
+        compressed = gzip.compress(b"message " * 100)
+
+        response = client.post("/convert/raw", content=compressed[:-12], headers={"Content-Encoding": "gzip"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "tronqué" in response.json()["detail"]
+
+    def test_unsupported_encoding_rejected(self, gzip_app):
+        """Les autres encodages sont refusés"""
+        before = UPLOADS_REJECTED.get(reason="encoding")
+        client = TestClient(gzip_app)
+
+        response = client.post("/convert/raw", content=b"data", headers={"Content-Encoding": "br"})
+
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        assert gzip_app.state.received == []
+        assert UPLOADS_REJECTED.get(reason="encoding") == before + 1
@@ -4,7 +4,8 @@ Tests pour le service de conversion MSG
 import pytest
 import io
 from unittest.mock import Mock, patch, MagicMock
-from app.services.msg_converter import MSGConverter, MSGConversionError
+from app.services.msg_converter import MSGConverter, MSGConversionError, PendingImage
+from app.services.spill import SpilledAttachment, open_attachment, spill
 
 
 class TestMSGConverter:
@@ -267,4 +268,85 @@ class TestMSGConverter:
         # Vérifier que des éléments ont été ajoutés à la story
         assert len(story) > 0
         # Vérifier qu'il y a au moins les éléments de base (labels + values)
-        assert len(story) >= 8  # De, À, CC, Objet, Date = 5 * 2 éléments minimum
\ No newline at end of file
+        assert len(story) >= 8  # De, À, CC, Objet, Date = 5 * 2 éléments minimum
+
+
+class TestAttachmentSpill:
+    """Tests des pièces jointes déversées sur disque"""
+    
+    @pytest.fixture
+    def converter(self):
+        return MSGConverter()
+    
+    @pytest.fixture
+    def spill_threshold(self):
+        """Seuil de déversement abaissé à 16 octets"""
+        with patch('app.services.msg_converter.settings.attachment_spill_threshold', 16):
+            yield
+    
+    def test_large_pdf_is_spilled(self, converter, mock_extract_msg, spill_threshold, tmp_path):
+        """Un PDF au-delà du seuil est écrit dans le répertoire de travail"""
+        attachment = Mock()
+        attachment.longFilename = "document.pdf"
+        attachment.data = b"%PDF-" + b"x" * 64
+        mock_extract_msg.attachments = [attachment]
+        
+        result = converter._process_attachments(mock_extract_msg, "req", spill_dir=str(tmp_path))
+        
+        assert isinstance(result[0], SpilledAttachment)
+        assert len(result[0]) == 69
+        assert open(result[0].path, "rb").read() == attachment.data
+    
+    def test_small_pdf_stays_in_memory(self, converter, mock_extract_msg, spill_threshold, tmp_path):
+        """Sous le seuil, le contenu reste en mémoire"""
+        attachment = Mock()
+        attachment.longFilename = "document.pdf"
+        attachment.data = b"%PDF-small"
+        mock_extract_msg.attachments = [attachment]
+        
+        result = converter._process_attachments(mock_extract_msg, "req", spill_dir=str(tmp_path))
+        
+        assert result == [b"%PDF-small"]
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_spilled_image_converted_after_collection(self, converter, mock_extract_msg, spill_threshold, tmp_path, png_content):
+        """Une image déversée est convertie en PDF depuis sa projection"""
+        attachment = Mock()
+        attachment.longFilename = "photo.png"
+        attachment.data = png_content
+        mock_extract_msg.attachments = [attachment]
+        
+        collected = converter._process_attachments(mock_extract_msg, "req", spill_dir=str(tmp_path))
+        assert isinstance(collected[0], PendingImage)
+        assert isinstance(collected[0].data, SpilledAttachment)
+        
+        rendered = converter._render_attachments(collected, "req", str(tmp_path))
+        
+        assert len(rendered) == 1
+        with open_attachment(rendered[0]) as stream:
+            assert stream.read(5) == b"%PDF-"
+    
+    def test_merge_reads_spilled_pdfs(self, converter, spill_threshold, tmp_path, blank_pdf_content):
+        """La fusion lit les PDFs déversés par projection"""
+        attachment = spill(blank_pdf_content, str(tmp_path), 16)
+        assert isinstance(attachment, SpilledAttachment)
+        
+        result = converter.merge_pdfs(blank_pdf_content, [attachment], "req")
+        
+        from PyPDF2 import PdfReader
+        assert len(PdfReader(io.BytesIO(result)).pages) == 2
+    
+    def test_message_closed_before_rendering(self, converter):
+        """Le message est fermé une seule fois, avant la conversion des images"""
+        events = []
+        msg = Mock()
+        msg.close.side_effect = lambda: events.append("close")
+        
+        with patch('app.services.msg_converter.extract_msg.Message', return_value=msg), \
+             patch.object(converter, '_create_main_pdf', return_value=b"main"), \
+             patch.object(converter, '_process_attachments', return_value=[]), \
+             patch.object(converter, '_render_attachments',
+                          side_effect=lambda *args: events.append("render") or []):
+            converter.convert_msg_to_pdf("test.msg", "req")
+        
+        assert events == ["close", "render"]
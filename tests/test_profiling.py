@@ -0,0 +1,160 @@
+"""
+Tests pour le profilage des conversions
+"""
+import os
+import pstats
+import threading
+import time
+import uuid
+from app.profiling import ProfileStore, RequestProfiler, SamplingProfiler, ThreadStackSampler, format_stack
+
+
+def slow_function(duration):
+    """Fonction lente à profiler"""
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+class TestProfileStore:
+    """Tests pour le stockage des profils"""
+    
+    def test_save_and_find_collapsed(self, tmp_path):
+        """Un profil échantillonné est retrouvé par identifiant de requête"""
+        store = ProfileStore(str(tmp_path), max_files=10)
+        request_id = str(uuid.uuid4())
+        
+        store.save_collapsed(request_id, {"a:main;b:work": 3})
+        
+        path = store.find(request_id)
+        assert path is not None
+        assert path.read_text() == "a:main;b:work 3\n"
+        assert store.list()[0]["kind"] == "sampled"
+    
+    def test_find_rejects_invalid_id(self, tmp_path):
+        """Un identifiant qui n'est pas un UUID est refusé"""
+        store = ProfileStore(str(tmp_path), max_files=10)
+        
+        assert store.find("../../etc/passwd") is None
+    
+    def test_prune_oldest(self, tmp_path):
+        """Les profils les plus anciens sont supprimés au-delà de la limite"""
+        store = ProfileStore(str(tmp_path), max_files=2)
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        
+        for i, request_id in enumerate(ids):
+            path = store.save_collapsed(request_id, {"a:main": 1})
+            # Horodatages distincts et croissants
+            os.utime(path, (1000 + i, 1000 + i))
+        store._prune()
+        
+        assert store.find(ids[0]) is None
+        assert store.find(ids[2]) is not None
+
+
+class TestRequestProfiler:
+    """Tests pour le profilage d'une conversion"""
+    
+    def test_on_demand_cprofile(self, tmp_path):
+        """Le profilage à la demande produit un profil pstats"""
+        store = ProfileStore(str(tmp_path), max_files=10)
+        request_id = str(uuid.uuid4())
+        profiler = RequestProfiler(request_id, on_demand=True, store=store)
+        
+        assert profiler.run(slow_function, 0.01) == "done"
+        
+        assert profiler.captured == "cprofile"
+        stats = pstats.Stats(str(store.find(request_id)))
+        assert any(func[2] == "slow_function" for func in stats.stats)
+    
+    def test_slow_request_sampled(self, tmp_path):
+        """Une conversion dépassant le seuil est conservée en piles échantillonnées"""
+        store = ProfileStore(str(tmp_path), max_files=10)
+        sampler = ThreadStackSampler(0.002)
+        request_id = str(uuid.uuid4())
+        profiler = RequestProfiler(request_id, slow_threshold=0.05, store=store, sampler=sampler)
+        
+        profiler.run(slow_function, 0.1)
+        
+        assert profiler.captured == "sampled"
+        assert "slow_function" in store.find(request_id).read_text()
+    
+    def test_fast_request_not_stored(self, tmp_path):
+        """Une conversion rapide ne laisse aucun profil"""
+        store = ProfileStore(str(tmp_path), max_files=10)
+        sampler = ThreadStackSampler(0.002)
+        request_id = str(uuid.uuid4())
+        profiler = RequestProfiler(request_id, slow_threshold=10, store=store, sampler=sampler)
+        
+        profiler.run(slow_function, 0.01)
+        
+        assert profiler.captured is None
+        assert store.find(request_id) is None
+    
+    def test_disabled(self):
+        """Sans déclencheur, la fonction est exécutée telle quelle"""
+        profiler = RequestProfiler(str(uuid.uuid4()))
+        
+        assert not profiler.enabled
+        assert profiler.run(lambda: 42) == 42
+    
+    def test_format_stack(self):
+        """La pile est formatée de la racine vers la feuille"""
+        import sys
+        stack = format_stack(sys._getframe())
+        
+        assert stack.endswith("test_profiling:test_format_stack")
+
+
+class TestSamplingProfiler:
+    """Tests pour l'échantillonneur continu"""
+    
+    def test_sample_aggregates_busy_threads(self):
+        """Les threads actifs sont agrégés par groupe, les threads inactifs ignorés"""
+        profiler = SamplingProfiler(interval=1)
+        stop = threading.Event()
+        
+        def busy_loop():
+            while not stop.is_set():
+                pass
+        
+        worker = threading.Thread(target=busy_loop, name="msg-convert_3")
+        worker.start()
+        try:
+            for _ in range(3):
+                profiler.sample()
+        finally:
+            stop.set()
+            worker.join()
+        
+        snapshot = profiler.snapshot()
+        busy = [stack for stack in snapshot["counts"] if "busy_loop" in stack]
+        assert snapshot["samples"] == 3
+        assert busy and all(stack.startswith("msg-convert;") for stack in busy)
+    
+    def test_snapshot_reset(self):
+        """La remise à zéro vide les compteurs"""
+        profiler = SamplingProfiler(interval=1)
+        profiler._counts["a:main"] = 2
+        
+        assert profiler.snapshot(reset=True)["counts"] == {"a:main": 2}
+        assert profiler.snapshot()["counts"] == {}
+    
+    def test_max_stacks(self):
+        """Le nombre de piles distinctes est borné"""
+        profiler = SamplingProfiler(interval=1, max_stacks=1)
+        profiler._counts["a:main"] = 1
+        
+        profiler.sample()
+        
+        assert set(profiler.snapshot()["counts"]) <= {"a:main", "[truncated]"}
+    
+    def test_start_stop(self):
+        """L'échantillonneur démarre et s'arrête proprement"""
+        profiler = SamplingProfiler(interval=0.01)
+        profiler.start()
+        assert profiler.running
+        
+        profiler.stop()
+        assert not profiler.running
@@ -0,0 +1,90 @@
+"""
+Tests pour la comptabilité de consommation et les quotas par utilisateur
+"""
+import pytest
+from app.services.quotas import QuotaPolicy, UsageLedger, parse_quotas, quota_for_roles
+
+MB = 1024 * 1024
+
+
+class TestQuotaConfiguration:
+    """Tests pour la configuration des quotas par rôle"""
+
+    def test_parse_quotas(self):
+        """Chaque rôle reçoit ses secondes CPU et mégaoctets produits"""
+        quotas = parse_quotas("default=600/500, batch=0/10000")
+
+        assert quotas["default"] == QuotaPolicy(600, 500 * MB)
+        assert quotas["batch"] == QuotaPolicy(0, 10000 * MB)
+
+    def test_parse_invalid(self):
+        """Une spécification incomplète est rejetée"""
+        with pytest.raises(ValueError):
+            parse_quotas("default=600")
+
+    def test_loosest_quota_for_roles(self):
+        """Le quota le plus permissif s'applique, 0 signifiant illimité"""
+        quotas = parse_quotas("default=60/10,batch=600/0,reports=120/50")
+
+        assert quota_for_roles(quotas, []) == quotas["default"]
+        assert quota_for_roles(quotas, ["batch", "reports"]) == QuotaPolicy(600, 0)
+
+
+class TestUsageLedger:
+    """Tests pour la consommation sur fenêtre glissante"""
+
+    def test_record_and_usage(self, clock):
+        """La consommation est cumulée par sujet"""
+        ledger = UsageLedger(window=3600, clock=clock)
+        ledger.record("alice", 1.5, 1000)
+        ledger.record("alice", 0.5, 500)
+
+        usage = ledger.usage("alice")
+        assert usage["cpu_seconds"] == pytest.approx(2.0)
+        assert usage["output_bytes"] == 1500
+        assert usage["conversions"] == 2
+        assert ledger.usage("bob")["conversions"] == 0
+
+    def test_window_expiry(self, clock):
+        """La consommation sort de la fenêtre une fois celle-ci écoulée"""
+        ledger = UsageLedger(window=3600, clock=clock)
+        ledger.record("alice", 5, 0)
+        clock.now += 1800
+        ledger.record("alice", 1, 0)
+
+        clock.now += 1900
+        assert ledger.usage("alice")["cpu_seconds"] == pytest.approx(1)
+        clock.now += 3600
+        assert ledger.usage("alice")["conversions"] == 0
+
+    def test_retry_after(self, clock):
+        """Le délai correspond à l'expiration de la consommation la plus ancienne"""
+        ledger = UsageLedger(window=3600, clock=clock)
+        policy = QuotaPolicy(cpu_seconds=5)
+
+        ledger.record("alice", 3, 0)
+        assert ledger.retry_after("alice", policy) is None
+        clock.now += 600
+        ledger.record("alice", 3, 0)
+
+        retry_after = ledger.retry_after("alice", policy)
+        assert 3000 <= retry_after <= 3060
+        assert ledger.retry_after("alice", QuotaPolicy()) is None
+
+    def test_top_orders_by_cpu(self, clock):
+        """Les sujets les plus coûteux sont listés en premier"""
+        ledger = UsageLedger(window=3600, clock=clock)
+        ledger.record("alice", 1, 0)
+        ledger.record("bob", 10, 0)
+        ledger.record("carol", 5, 0)
+
+        assert [entry["subject"] for entry in ledger.top(2)] == ["bob", "carol"]
+
+    def test_max_subjects(self, clock):
+        """Le nombre de sujets suivis est borné (les moins récents sont oubliés)"""
+        ledger = UsageLedger(window=3600, max_subjects=2, clock=clock)
+        for subject in ("alice", "bob", "carol"):
+            ledger.record(subject, 1, 0)
+
+        assert ledger.usage("alice")["conversions"] == 0
+        assert ledger.usage("carol")["conversions"] == 1
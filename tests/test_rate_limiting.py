@@ -0,0 +1,123 @@
+"""
+Tests pour la limitation de débit par utilisateur
+"""
+import pytest
+from app.services.rate_limiting import (
+    RateLimiter, RateLimitPolicy, parse_policies, policy_for_roles
+)
+
+
+class TestPolicies:
+    """Tests pour la configuration des politiques"""
+
+    def test_parse_policies(self):
+        """Format rôle=par_minute/rafale/simultanées"""
+        policies = parse_policies("default=60/20/4, batch=600/100/16,admin=0/0/0")
+
+        assert policies["default"] == RateLimitPolicy(60, 20, 4)
+        assert policies["batch"] == RateLimitPolicy(600, 100, 16)
+        assert policies["admin"] == RateLimitPolicy(0, 0, 0)
+
+    def test_parse_invalid_policy(self):
+        """Une politique mal formée est refusée"""
+        with pytest.raises(ValueError):
+            parse_policies("default=60/20")
+
+    def test_policy_for_roles(self):
+        """Rôle inconnu : politique par défaut ; plusieurs rôles : la plus permissive"""
+        policies = parse_policies("default=60/20/4,batch=600/10/16,viewer=30/50/0")
+
+        assert policy_for_roles(policies, ["user"]) == policies["default"]
+        assert policy_for_roles(policies, ["batch"]) == policies["batch"]
+        assert policy_for_roles(policies, ["batch", "viewer"]) == RateLimitPolicy(600, 50, 0)
+
+    def test_no_default_policy(self):
+        """Sans politique par défaut, l'utilisateur n'est pas limité"""
+        assert policy_for_roles({}, ["user"]) == RateLimitPolicy()
+
+
+class TestRateLimiter:
+    """Tests pour le seau de jetons et la concurrence par sujet"""
+
+    def test_burst_then_limited(self, clock):
+        """La rafale est consommée puis la requête suivante est refusée"""
+        limiter = RateLimiter(clock=clock)
+        policy = RateLimitPolicy(per_minute=60, burst=3)
+
+        decisions = [limiter.acquire("alice", policy) for _ in range(4)]
+
+        assert [d.allowed for d in decisions] == [True, True, True, False]
+        assert decisions[2].remaining == 0
+        assert decisions[3].reason == "rate"
+        assert decisions[3].retry_after == 1
+        assert decisions[3].headers()["RateLimit-Limit"] == "3"
+
+    def test_tokens_refill(self, clock):
+        """Les jetons sont regagnés au débit configuré"""
+        limiter = RateLimiter(clock=clock)
+        policy = RateLimitPolicy(per_minute=60, burst=1)
+
+        assert limiter.acquire("alice", policy).allowed
+        limiter.release("alice")
+        assert not limiter.acquire("alice", policy).allowed
+
+        clock.now += 1.0
+        assert limiter.acquire("alice", policy).allowed
+
+    def test_subjects_independent(self, clock):
+        """Un client qui abuse n'affecte pas les autres"""
+        limiter = RateLimiter(clock=clock)
+        policy = RateLimitPolicy(per_minute=60, burst=1)
+
+        limiter.acquire("batch-client", policy)
+        assert not limiter.acquire("batch-client", policy).allowed
+        assert limiter.acquire("alice", policy).allowed
+
+    def test_concurrency_cap(self, clock):
+        """Le plafond de requêtes simultanées est appliqué puis libéré"""
+        limiter = RateLimiter(clock=clock)
+        policy = RateLimitPolicy(max_concurrent=2)
+
+        assert limiter.acquire("alice", policy).allowed
+        assert limiter.acquire("alice", policy).allowed
+        refused = limiter.acquire("alice", policy)
+        assert not refused.allowed
+        assert refused.reason == "concurrency"
+        assert limiter.active("alice") == 2
+
+        limiter.release("alice")
+        assert limiter.acquire("alice", policy).allowed
+
+    def test_concurrency_refusal_keeps_tokens(self, clock):
+        """Un refus de concurrence ne consomme pas de jeton"""
+        limiter = RateLimiter(clock=clock)
+        policy = RateLimitPolicy(per_minute=60, burst=2, max_concurrent=1)
+
+        limiter.acquire("alice", policy)
+        limiter.acquire("alice", policy)
+        limiter.release("alice")
+
+        assert limiter.acquire("alice", policy).remaining == 0
+
+    def test_unlimited_policy(self, clock):
+        """Une politique sans limite n'émet pas d'en-têtes"""
+        limiter = RateLimiter(clock=clock)
+
+        decision = limiter.acquire("admin", RateLimitPolicy())
+
+        assert decision.allowed
+        assert decision.headers() == {}
+
+    def test_eviction_spares_active_subjects(self, clock):
+        """Le nombre de sujets suivis est borné, sans oublier ceux en cours"""
+        limiter = RateLimiter(max_subjects=2, clock=clock)
+        policy = RateLimitPolicy(per_minute=60, burst=5, max_concurrent=5)
+
+        limiter.acquire("a", policy)
+        limiter.release("a")
+        limiter.acquire("b", policy)
+        limiter.acquire("c", policy)
+
+        assert limiter.active("b") == 1
+        assert limiter.active("c") == 1
+        assert "a" not in limiter._subjects
@@ -0,0 +1,142 @@
+"""
+Tests pour la conversion par référence à un fichier local
+"""
+import hashlib
+import mmap
+import os
+
+import pytest
+from app.services.ingest import InvalidUploadError, OLE_SIGNATURE, UploadTooLargeError
+from app.services.references import (
+    OutputExistsError, ReferenceNotAllowedError, ReferenceNotFoundError, map_reference, parse_roots,
+    resolve_reference, write_beside
+)
+
+MSG_CONTENT = OLE_SIGNATURE + b"MSG file content"
+
+
+@pytest.fixture
+def root(tmp_path):
+    """Répertoire autorisé contenant un fichier .msg"""
+    allowed = tmp_path / "allowed"
+    allowed.mkdir()
+    (allowed / "email.msg").write_bytes(MSG_CONTENT)
+    return allowed
+
+
+class TestResolveReference:
+    """Tests pour la résolution des chemins autorisés"""
+
+    def test_parse_roots(self, tmp_path):
+        """Les répertoires sont résolus en chemins réels, les entrées vides ignorées"""
+        assert parse_roots(f" {tmp_path}/a/../b , ,") == [tmp_path / "b"]
+        assert parse_roots("") == []
+
+    def test_file_under_root(self, root):
+        """Un fichier sous un répertoire autorisé est accepté"""
+        assert resolve_reference(str(root / "email.msg"), [root]) == root / "email.msg"
+
+    def test_disabled_without_roots(self, root):
+        """Sans répertoire autorisé, la conversion par référence est désactivée"""
+        with pytest.raises(ReferenceNotAllowedError, match="désactivée"):
+            resolve_reference(str(root / "email.msg"), [])
+
+    def test_relative_path_rejected(self, root):
+        """Un chemin relatif est refusé"""
+        with pytest.raises(ReferenceNotAllowedError, match="absolu"):
+            resolve_reference("email.msg", [root])
+
+    def test_traversal_rejected(self, root, tmp_path):
+        """Un chemin remontant hors du répertoire autorisé est refusé"""
+        (tmp_path / "secret.msg").write_bytes(MSG_CONTENT)
+
+        with pytest.raises(ReferenceNotAllowedError):
+            resolve_reference(str(root / ".." / "secret.msg"), [root])
+
+    def test_symlink_escape_rejected(self, root, tmp_path):
+        """Un lien symbolique pointant hors du répertoire autorisé est refusé"""
+        (tmp_path / "secret.msg").write_bytes(MSG_CONTENT)
+        os.symlink(tmp_path / "secret.msg", root / "lien.msg")
+
+        with pytest.raises(ReferenceNotAllowedError):
+            resolve_reference(str(root / "lien.msg"), [root])
+
+    def test_sibling_prefix_rejected(self, root, tmp_path):
+        """Un répertoire voisin partageant le préfixe du répertoire autorisé est refusé"""
+        sibling = tmp_path / "allowed-other"
+        sibling.mkdir()
+        (sibling / "email.msg").write_bytes(MSG_CONTENT)
+
+        with pytest.raises(ReferenceNotAllowedError):
+            resolve_reference(str(sibling / "email.msg"), [root])
+
+    def test_missing_file(self, root):
+        """Un chemin autorisé sans fichier est introuvable"""
+        with pytest.raises(ReferenceNotFoundError):
+            resolve_reference(str(root / "absent.msg"), [root])
+        with pytest.raises(ReferenceNotFoundError):
+            resolve_reference(str(root), [root])
+
+
+class TestMapReference:
+    """Tests pour la projection en mémoire des fichiers"""
+
+    def test_mapped_without_copy(self, root):
+        """Le contenu est une projection mmap, taille et empreinte calculées"""
+        upload = map_reference(root / "email.msg", 1024)
+        try:
+            assert isinstance(upload.content, mmap.mmap)
+            assert upload.content[:] == MSG_CONTENT
+            assert upload.size == len(MSG_CONTENT)
+            assert upload.sha256 == hashlib.sha256(MSG_CONTENT).hexdigest()
+        finally:
+            upload.content.close()
+
+    def test_too_large(self, root):
+        """Un fichier au-delà de la taille maximale est refusé"""
+        with pytest.raises(UploadTooLargeError):
+            map_reference(root / "email.msg", 10)
+
+    def test_not_ole(self, root):
+        """Un fichier sans signature OLE est refusé"""
+        (root / "faux.msg").write_bytes(b"not an ole container")
+
+        with pytest.raises(InvalidUploadError):
+            map_reference(root / "faux.msg", 1024)
+
+    def test_empty_file(self, root):
+        """Un fichier vide est refusé"""
+        (root / "vide.msg").write_bytes(b"")
+
+        with pytest.raises(InvalidUploadError):
+            map_reference(root / "vide.msg", 1024)
+
+
+class TestWriteBeside:
+    """Tests pour l'écriture du PDF à côté du fichier source"""
+
+    def test_pdf_written_beside_source(self, root):
+        """Le PDF porte le nom du fichier source, sans fichier temporaire restant"""
+        target = write_beside(root / "email.msg", b"%PDF-1.4")
+
+        assert target == root / "email.pdf"
+        assert target.read_bytes() == b"%PDF-1.4"
+        assert sorted(p.name for p in root.iterdir()) == ["email.msg", "email.pdf"]
+
+    def test_existing_pdf_kept(self, root):
+        """Un PDF existant n'est pas écrasé sans demande explicite"""
+        (root / "email.pdf").write_bytes(b"ancien")
+
+        with pytest.raises(OutputExistsError):
+            write_beside(root / "email.msg", b"nouveau")
+
+        assert (root / "email.pdf").read_bytes() == b"ancien"
+        assert sorted(p.name for p in root.iterdir()) == ["email.msg", "email.pdf"]
+
+    def test_existing_pdf_replaced(self, root):
+        """Avec overwrite, un PDF existant est remplacé"""
+        (root / "email.pdf").write_bytes(b"ancien")
+
+        write_beside(root / "email.msg", b"nouveau", overwrite=True)
+
+        assert (root / "email.pdf").read_bytes() == b"nouveau"
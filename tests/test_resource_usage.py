@@ -0,0 +1,121 @@
+"""
+Tests pour la mesure des ressources consommées par étape
+"""
+import asyncio
+import contextvars
+import time
+import tracemalloc
+import pytest
+from app.metrics import observe_stage, reset_request_timings, start_request_timings
+from app.resource_usage import ResourceProbe, StageUsage, UsageStore, read_peak_rss, read_rss, summarize
+
+
+class TestResourceProbe:
+    """Tests pour les relevés de ressources"""
+    
+    def test_read_rss(self):
+        """La mémoire résidente du processus est lisible"""
+        assert read_rss() > 0
+        assert read_peak_rss() >= read_rss() // 2
+    
+    def test_cpu_time_accumulated(self):
+        """Le temps CPU de l'étape est cumulé dans l'accumulateur"""
+        usage = StageUsage()
+        
+        for _ in range(2):
+            probe = ResourceProbe()
+            sum(i * i for i in range(200000))
+            probe.finish(usage)
+        
+        assert usage.calls == 2
+        assert usage.cpu_time > 0
+        assert usage.wall_time >= usage.cpu_time * 0.5
+        assert usage.allocated is None
+    
+    def test_allocated_bytes_with_tracemalloc(self):
+        """Les octets alloués sont mesurés lorsque tracemalloc est actif"""
+        usage = StageUsage()
+        tracemalloc.start()
+        try:
+            probe = ResourceProbe()
+            data = bytearray(1024 * 1024)
+            probe.finish(usage)
+        finally:
+            tracemalloc.stop()
+        
+        assert usage.allocated >= 1024 * 1024
+        del data
+
+
+class TestUsageStore:
+    """Tests pour l'historique des rapports par requête"""
+    
+    def test_put_and_get(self):
+        """Un rapport est retrouvé par identifiant de requête"""
+        store = UsageStore(max_entries=10)
+        store.put("req-1", {"cpu_time": 1.0})
+        
+        assert store.get("req-1") == {"cpu_time": 1.0}
+        assert store.get("req-2") is None
+    
+    def test_eviction(self):
+        """Les rapports les plus anciens sont éjectés au-delà de la limite"""
+        store = UsageStore(max_entries=2)
+        for i in range(3):
+            store.put(f"req-{i}", {"cpu_time": i})
+        
+        assert store.get("req-0") is None
+        assert store.get("req-2") == {"cpu_time": 2}
+
+
+class TestStageAttribution:
+    """Tests de l'imputation des ressources aux requêtes concurrentes"""
+    
+    @staticmethod
+    def burn(seconds):
+        """Consomme du CPU pendant la durée indiquée"""
+        end = time.thread_time() + seconds
+        while time.thread_time() < end:
+            pass
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_do_not_share_cpu(self):
+        """Une étape qui attend sur la boucle n'est pas chargée du CPU d'une requête voisine"""
+        ready = asyncio.Event()
+        
+        async def waiting_request():
+            timings, token = start_request_timings()
+            try:
+                with observe_stage("upload_read"):
+                    ready.set()
+                    await asyncio.sleep(0.3)
+            finally:
+                reset_request_timings(token)
+            return timings
+        
+        async def busy_request():
+            timings, token = start_request_timings()
+            try:
+                await ready.wait()
+                with observe_stage("manifest"):
+                    self.burn(0.15)
+                    await asyncio.sleep(0)
+                
+                def convert():
+                    with observe_stage("parse"):
+                        self.burn(0.1)
+                
+                await asyncio.get_running_loop().run_in_executor(
+                    None, contextvars.copy_context().run, convert
+                )
+            finally:
+                reset_request_timings(token)
+            return timings
+        
+        waiting, busy = await asyncio.gather(waiting_request(), busy_request())
+        
+        assert waiting.stages["upload_read"].wall_time >= 0.25
+        assert summarize(waiting.stages)[0] == 0.0
+        assert busy.stages["manifest"].cpu_time == 0.0
+        assert busy.stages["parse"].cpu_time >= 0.09
+        assert summarize(busy.stages)[0] == pytest.approx(busy.stages["parse"].cpu_time)
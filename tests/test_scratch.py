@@ -0,0 +1,118 @@
+"""
+Tests de l'espace de travail temporaire et de son nettoyeur
+"""
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.services.scratch import ScratchSpace, directory_size, is_tmpfs
+
+
+class TestScratchSpace:
+    """Tests de ScratchSpace"""
+    
+    @pytest.mark.asyncio
+    async def test_area_created_under_temp_dir_and_removed(self, tmp_path):
+        """Le répertoire de la requête est créé sous TEMP_DIR puis supprimé avec son contenu"""
+        space = ScratchSpace(str(tmp_path))
+        
+        async with space.area("req-1") as area:
+            assert area.path.parent == tmp_path / "msgtopdf"
+            assert area.path.name.startswith("req-1-")
+            written = await area.write_async("message.msg", b"x" * 100)
+            (area.path / "attachment-1.bin").write_bytes(b"y" * 50)
+            assert written.read_bytes() == b"x" * 100
+            assert area.usage() == 150
+            assert space.active == 1
+        
+        assert not area.path.exists()
+        assert space.active == 0
+    
+    @pytest.mark.asyncio
+    async def test_area_removed_on_error(self, tmp_path):
+        """Le répertoire est supprimé même si la conversion échoue"""
+        space = ScratchSpace(str(tmp_path))
+        
+        with pytest.raises(RuntimeError):
+            async with space.area("req") as area:
+                area.write("message.msg", b"data")
+                raise RuntimeError("boom")
+        
+        assert not area.path.exists()
+    
+    def test_sweep_removes_old_orphans_only(self, tmp_path):
+        """Seuls les orphelins plus anciens que l'âge maximal sont supprimés"""
+        space = ScratchSpace(str(tmp_path), max_age=60)
+        space.root.mkdir()
+        old_dir = space.root / "old-request"
+        old_dir.mkdir()
+        (old_dir / "message.msg").write_bytes(b"x")
+        old_file = space.root / "stray.bin"
+        old_file.write_bytes(b"x")
+        recent = space.root / "recent-request"
+        recent.mkdir()
+        stale = time.time() - 3600
+        os.utime(old_dir, (stale, stale))
+        os.utime(old_file, (stale, stale))
+        
+        assert space.sweep() == 2
+        assert [entry.name for entry in space.root.iterdir()] == ["recent-request"]
+    
+    @pytest.mark.asyncio
+    async def test_sweep_keeps_active_areas(self, tmp_path):
+        """Un répertoire utilisé par une requête en cours n'est jamais supprimé"""
+        space = ScratchSpace(str(tmp_path), max_age=0, clock=lambda: time.time() + 3600)
+        
+        async with space.area("req") as area:
+            assert space.sweep() == 0
+            assert area.path.exists()
+    
+    def test_sweep_without_root(self, tmp_path):
+        """Sans répertoire de travail, rien à nettoyer"""
+        assert ScratchSpace(str(tmp_path / "absent")).sweep() == 0
+    
+    @pytest.mark.asyncio
+    async def test_start_sweeps_and_runs_janitor(self, tmp_path):
+        """Le démarrage nettoie les orphelins puis le nettoyeur repasse périodiquement"""
+        space = ScratchSpace(str(tmp_path), max_age=0, janitor_interval=0.01,
+                             clock=lambda: time.time() + 3600)
+        space.root.mkdir()
+        (space.root / "crashed-request").mkdir()
+        
+        await space.start()
+        try:
+            assert list(space.root.iterdir()) == []
+            assert space.running
+            (space.root / "later-orphan").mkdir()
+            await asyncio.sleep(0.1)
+            assert list(space.root.iterdir()) == []
+        finally:
+            await space.stop()
+        assert not space.running
+
+
+class TestHelpers:
+    """Tests des fonctions utilitaires"""
+    
+    def test_directory_size(self, tmp_path):
+        """Taille cumulée des fichiers, sous-répertoires compris"""
+        (tmp_path / "a").write_bytes(b"x" * 10)
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "b").write_bytes(b"y" * 5)
+        assert directory_size(tmp_path) == 15
+    
+    def test_is_tmpfs(self, tmp_path):
+        """Le point de montage le plus long contenant le chemin détermine le type"""
+        mounts = tmp_path / "mounts"
+        mounts.write_text(
+            "/dev/sda1 / ext4 rw 0 0\n"
+            "tmpfs /scratch tmpfs rw 0 0\n"
+            "/dev/sdb1 /scratch/disk ext4 rw 0 0\n"
+        )
+        assert is_tmpfs("/scratch", str(mounts))
+        assert is_tmpfs("/scratch/msgtopdf", str(mounts))
+        assert not is_tmpfs("/scratch/disk/msgtopdf", str(mounts))
+        assert not is_tmpfs("/scratchpad", str(mounts))
+        assert not is_tmpfs("/tmp", str(tmp_path / "absent"))
@@ -0,0 +1,218 @@
+"""
+Tests pour la récupération des fichiers .msg par URL
+"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from app.services.ingest import InvalidUploadError, OLE_SIGNATURE, UploadTooLargeError
+from app.services.source_fetch import (
+    SOURCE_FETCHES, SourceFetchError, SourceFetcher, SourceNotAllowedError, parse_hosts, source_filename
+)
+
+MSG_CONTENT = OLE_SIGNATURE + b"MSG file content"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Stockage objet simulé"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.path.startswith("/bucket/email.msg"):
+            self._send(200, MSG_CONTENT)
+        elif self.path == "/bucket/texte.msg":
+            self._send(200, b"not an ole container")
+        elif self.path == "/bucket/annonce.msg":
+            self._send(200, MSG_CONTENT, {"Content-Length": "5000"})
+        elif self.path == "/bucket/flux.msg":
+            # Corps par blocs, sans Content-Length
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in (MSG_CONTENT, b"x" * 2000):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        elif self.path == "/bucket/lent.msg":
+            time.sleep(1)
+            self._send(200, MSG_CONTENT)
+        elif self.path == "/bucket/redirection.msg":
+            self._send(302, b"", {"Location": "http://ailleurs.example/email.msg"})
+        else:
+            self._send(404, b"absent")
+
+    def _send(self, code, body, headers=None):
+        self.send_response(code)
+        headers = {"Content-Length": str(len(body)), **(headers or {})}
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if headers["Content-Length"] == str(len(body)):
+            self.wfile.write(body)
+        else:
+            self.close_connection = True
+
+
+@pytest.fixture(scope="module")
+def stand_in():
+    """Serveur HTTP local servant les fichiers .msg"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetcher_for(server, **kwargs):
+    """Récupérateur autorisé sur le serveur local"""
+    return SourceFetcher(parse_hosts(f"127.0.0.1:{server.server_port}"), 1024, **kwargs)
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+class TestSourceUrls:
+    """Tests pour la liste des hôtes autorisés"""
+
+    def test_parse_hosts(self):
+        """Hôtes avec ou sans port"""
+        assert parse_hosts("S3.local:9000, objets.example ,") == [("s3.local", 9000), ("objets.example", None)]
+        assert parse_hosts("") == []
+
+    def test_source_filename(self):
+        """Le nom de fichier est le dernier segment du chemin, sans la requête"""
+        assert source_filename("https://s3.local/bucket/mon%20mail.msg?X-Amz-Signature=abc") == "mon mail.msg"
+
+    def test_check(self):
+        """Seuls les hôtes et ports autorisés, en http(s), sont acceptés"""
+        fetcher = SourceFetcher(parse_hosts("s3.local:9000,objets.example"), 1024)
+
+        fetcher.check("http://s3.local:9000/bucket/email.msg")
+        fetcher.check("https://OBJETS.example/email.msg")
+        for rejected in ("http://s3.local/bucket/email.msg", "http://autre.example/email.msg",
+                         "file:///etc/passwd", "ftp://objets.example/email.msg",
+                         "http://objets.example@autre.example/email.msg", "http://s3.local:abc/x.msg"):
+            with pytest.raises(SourceNotAllowedError):
+                fetcher.check(rejected)
+
+    def test_disabled_without_hosts(self):
+        """Sans hôte autorisé, la récupération par URL est désactivée"""
+        with pytest.raises(SourceNotAllowedError, match="désactivée"):
+            SourceFetcher([], 1024).check("http://s3.local/email.msg")
+
+
+class TestSourceFetcher:
+    """Tests pour la récupération auprès d'un serveur HTTP local"""
+
+    @pytest.mark.asyncio
+    async def test_fetch(self, stand_in):
+        """Le fichier est reçu, vérifié et haché"""
+        fetcher = fetcher_for(stand_in)
+        before = SOURCE_FETCHES.get(outcome="success")
+        try:
+            upload = await fetcher.fetch(url(stand_in, "/bucket/email.msg?signature=abc"))
+        finally:
+            await fetcher.close()
+
+        assert upload.content[:] == MSG_CONTENT
+        assert upload.sha256 == hashlib.sha256(MSG_CONTENT).hexdigest()
+        assert SOURCE_FETCHES.get(outcome="success") == before + 1
+
+    @pytest.mark.asyncio
+    async def test_connections_reused(self, stand_in):
+        """Les récupérations successives réutilisent la même connexion"""
+        fetcher = fetcher_for(stand_in)
+        stand_in.connections.clear()
+        try:
+            for _ in range(3):
+                await fetcher.fetch(url(stand_in, "/bucket/email.msg"))
+        finally:
+            await fetcher.close()
+
+        assert len(stand_in.connections) == 1
+
+    @pytest.mark.asyncio
+    async def test_announced_size_rejected(self, stand_in):
+        """Un Content-Length au-delà de la taille maximale est refusé avant lecture"""
+        fetcher = fetcher_for(stand_in)
+        try:
+            with pytest.raises(UploadTooLargeError, match="annoncés"):
+                await fetcher.fetch(url(stand_in, "/bucket/annonce.msg"))
+        finally:
+            await fetcher.close()
+
+    @pytest.mark.asyncio
+    async def test_streamed_size_rejected(self, stand_in):
+        """Sans Content-Length, la réception s'arrête à la taille maximale"""
+        fetcher = fetcher_for(stand_in)
+        try:
+            with pytest.raises(UploadTooLargeError):
+                await fetcher.fetch(url(stand_in, "/bucket/flux.msg"))
+        finally:
+            await fetcher.close()
+
+    @pytest.mark.asyncio
+    async def test_not_ole(self, stand_in):
+        """Un contenu sans signature OLE est refusé"""
+        fetcher = fetcher_for(stand_in)
+        try:
+            with pytest.raises(InvalidUploadError):
+                await fetcher.fetch(url(stand_in, "/bucket/texte.msg"))
+        finally:
+            await fetcher.close()
+
+    @pytest.mark.asyncio
+    async def test_error_status_and_redirect(self, stand_in):
+        """Un statut d'erreur ou une redirection fait échouer la récupération"""
+        fetcher = fetcher_for(stand_in)
+        try:
+            with pytest.raises(SourceFetchError, match="404"):
+                await fetcher.fetch(url(stand_in, "/bucket/absent.msg"))
+            with pytest.raises(SourceFetchError, match="302"):
+                await fetcher.fetch(url(stand_in, "/bucket/redirection.msg"))
+        finally:
+            await fetcher.close()
+
+    @pytest.mark.asyncio
+    async def test_read_timeout(self, stand_in):
+        """Une source trop lente dépasse le délai de lecture"""
+        fetcher = fetcher_for(stand_in, read_timeout=0.2)
+        try:
+            with pytest.raises(SourceFetchError) as excinfo:
+                await fetcher.fetch(url(stand_in, "/bucket/lent.msg"))
+        finally:
+            await fetcher.close()
+
+        assert excinfo.value.timeout
+
+    @pytest.mark.asyncio
+    async def test_total_timeout(self, stand_in):
+        """Le délai total borne l'ensemble de la récupération"""
+        fetcher = fetcher_for(stand_in, total_timeout=0.2)
+        try:
+            with pytest.raises(SourceFetchError, match="Délai") as excinfo:
+                await fetcher.fetch(url(stand_in, "/bucket/lent.msg"))
+        finally:
+            await fetcher.close()
+
+        assert excinfo.value.timeout
+
+    @pytest.mark.asyncio
+    async def test_unreachable_host(self):
+        """Un hôte autorisé injoignable fait échouer la récupération"""
+        fetcher = SourceFetcher(parse_hosts("127.0.0.1:1"), 1024)
+        try:
+            with pytest.raises(SourceFetchError) as excinfo:
+                await fetcher.fetch("http://127.0.0.1:1/email.msg")
+        finally:
+            await fetcher.close()
+
+        assert not excinfo.value.timeout
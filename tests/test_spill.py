@@ -0,0 +1,46 @@
+"""
+Tests du déversement sur disque des pièces jointes volumineuses
+"""
+import pytest
+
+from app.services.spill import SpilledAttachment, open_attachment, spill
+
+
+class TestSpill:
+    """Tests de spill et open_attachment"""
+    
+    def test_below_threshold_stays_in_memory(self, tmp_path):
+        """Un contenu sous le seuil est retourné tel quel"""
+        assert spill(b"abc", str(tmp_path), 4) == b"abc"
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_disabled_without_directory_or_threshold(self, tmp_path):
+        """Sans répertoire de travail ou avec un seuil nul, rien n'est écrit"""
+        data = b"x" * 100
+        assert spill(data, None, 1) is data
+        assert spill(data, str(tmp_path), 0) is data
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_spilled_content_read_through_mmap(self, tmp_path):
+        """Un contenu déversé est relu à l'identique par projection"""
+        data = bytes(range(256)) * 8
+        spilled = spill(data, str(tmp_path), 1024)
+        
+        assert isinstance(spilled, SpilledAttachment)
+        assert len(spilled) == len(data)
+        assert spilled.path.startswith(str(tmp_path))
+        with open_attachment(spilled) as stream:
+            assert stream.read() == data
+    
+    def test_projection_closed_after_use(self, tmp_path):
+        """La projection est fermée à la sortie du bloc"""
+        spilled = spill(b"y" * 32, str(tmp_path), 1)
+        with open_attachment(spilled) as stream:
+            pass
+        with pytest.raises(ValueError):
+            stream.read()
+    
+    def test_in_memory_content_as_stream(self):
+        """Un contenu en mémoire est lu comme un flux"""
+        with open_attachment(b"hello") as stream:
+            assert stream.read() == b"hello"
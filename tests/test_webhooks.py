@@ -0,0 +1,274 @@
+"""
+Tests pour la livraison des webhooks de fin de conversion
+"""
+import asyncio
+
+import httpx
+import pytest
+from app.services.source_fetch import parse_hosts
+from app.services.webhooks import (
+    WEBHOOK_DELIVERIES, CallbackNotAllowedError, DeliveryStore, WebhookDispatcher, backoff_delay
+)
+
+HOSTS = parse_hosts("hooks.local")
+URL = "https://hooks.local/done"
+
+
+def dispatcher_for(store, handler, **kwargs):
+    """Livreur vers un destinataire simulé, sans délai de reprise"""
+    kwargs.setdefault("rng", lambda: 0.0)
+    return WebhookDispatcher(store, HOSTS, transport=httpx.MockTransport(handler), **kwargs)
+
+
+async def wait_until(condition, timeout=2.0):
+    """Attend qu'une condition soit remplie"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condition non remplie dans le délai")
+        await asyncio.sleep(0.01)
+
+
+class TestBackoff:
+    """Tests pour le backoff exponentiel avec gigue"""
+
+    def test_exponential_with_cap(self):
+        """Le plafond double à chaque tentative, borné par le maximum"""
+        assert [backoff_delay(n, 1.0, 10.0, rng=lambda: 1.0) for n in range(1, 7)] == [1, 2, 4, 8, 10, 10]
+
+    def test_full_jitter(self):
+        """Le délai est tiré entre 0 et le plafond"""
+        assert backoff_delay(3, 1.0, 60.0, rng=lambda: 0.5) == 2.0
+        assert backoff_delay(3, 1.0, 60.0, rng=lambda: 0.0) == 0.0
+
+
+class TestDeliveryStore:
+    """Tests pour la file persistée des livraisons"""
+
+    def test_due_and_reschedule(self, tmp_path):
+        """Seules les livraisons échues sont retournées, les plus anciennes d'abord"""
+        store = DeliveryStore(str(tmp_path / "hooks.sqlite3"))
+        first = store.add("r1", URL, {"Content-Type": "application/json"}, b"{}", now=100.0)
+        second = store.add("r2", URL, {}, b"pdf", now=101.0)
+
+        assert [d.id for d in store.due(now=100.5, limit=10)] == [first]
+        store.reschedule(first, attempts=1, next_attempt=200.0, error="statut 500")
+        due = store.due(now=150.0, limit=10)
+        assert [(d.id, d.body, d.attempts) for d in due] == [(second, b"pdf", 0)]
+        assert store.next_due(exclude={second}) == 200.0
+
+        store.remove(second)
+        assert store.pending() == 1
+        store.close()
+
+    def test_directory_created(self, tmp_path):
+        """Le répertoire propre à la file est créé à la première opération"""
+        store = DeliveryStore(str(tmp_path / "msgtopdf-webhooks" / "deliveries.sqlite3"))
+        store.add("r1", URL, {}, b"{}", now=0.0)
+
+        assert store.pending() == 1
+        assert (tmp_path / "msgtopdf-webhooks" / "deliveries.sqlite3").exists()
+        store.close()
+
+    def test_persisted_across_reopen(self, tmp_path):
+        """Les livraisons en attente survivent à la fermeture de la file"""
+        path = str(tmp_path / "hooks.sqlite3")
+        store = DeliveryStore(path)
+        store.add("r1", URL, {"Content-Type": "application/json"}, b"{}", now=0.0)
+        store.close()
+
+        reopened = DeliveryStore(path)
+        [delivery] = reopened.due(now=1.0, limit=10)
+        assert delivery.request_id == "r1"
+        assert delivery.headers == {"Content-Type": "application/json"}
+        reopened.close()
+
+
+class TestWebhookDispatcher:
+    """Tests pour le livreur de webhooks"""
+
+    def test_check(self, tmp_path):
+        """Seuls les hôtes autorisés reçoivent des rappels"""
+        dispatcher = WebhookDispatcher(DeliveryStore(str(tmp_path / "h.sqlite3")), HOSTS)
+
+        dispatcher.check(URL)
+        with pytest.raises(CallbackNotAllowedError):
+            dispatcher.check("http://169.254.169.254/latest")
+        with pytest.raises(CallbackNotAllowedError, match="désactivés"):
+            WebhookDispatcher(DeliveryStore(str(tmp_path / "h.sqlite3")), []).check(URL)
+
+    @pytest.mark.asyncio
+    async def test_delivered(self, tmp_path):
+        """La livraison est postée avec ses en-têtes puis retirée de la file"""
+        received = []
+
+        def handler(request):
+            received.append(request)
+            return httpx.Response(204)
+
+        store = DeliveryStore(str(tmp_path / "hooks.sqlite3"))
+        dispatcher = dispatcher_for(store, handler)
+        before = WEBHOOK_DELIVERIES.get(outcome="delivered")
+        dispatcher.start()
+        try:
+            await dispatcher.enqueue("r1", URL, b'{"status": "succeeded"}', {"Content-Type": "application/json"})
+            await wait_until(lambda: WEBHOOK_DELIVERIES.get(outcome="delivered") == before + 1)
+        finally:
+            await dispatcher.stop()
+
+        [request] = received
+        assert request.content == b'{"status": "succeeded"}'
+        assert request.headers["X-Request-ID"] == "r1"
+        assert request.headers["X-Webhook-Attempt"] == "1"
+        assert DeliveryStore(str(tmp_path / "hooks.sqlite3")).pending() == 0
+
+    @pytest.mark.asyncio
+    async def test_retried_until_delivered(self, tmp_path):
+        """Les erreurs transitoires sont retentées avec backoff"""
+        responses = [httpx.Response(503), httpx.Response(429), httpx.Response(200)]
+        attempts = []
+
+        def handler(request):
+            attempts.append(request.headers["X-Webhook-Attempt"])
+            return responses[len(attempts) - 1]
+
+        store = DeliveryStore(str(tmp_path / "hooks.sqlite3"))
+        dispatcher = dispatcher_for(store, handler)
+        dispatcher.start()
+        try:
+            await dispatcher.enqueue("r1", URL, b"{}", {})
+            await wait_until(lambda: len(attempts) == 3 and dispatcher.in_flight == 0)
+        finally:
+            await dispatcher.stop()
+
+        assert attempts == ["1", "2", "3"]
+
+    @pytest.mark.asyncio
+    async def test_abandoned(self, tmp_path):
+        """Un statut 4xx définitif ou le nombre maximal de tentatives abandonne la livraison"""
+        def handler(request):
+            if request.url.path == "/gone":
+                return httpx.Response(410)
+            raise httpx.ConnectError("refusé", request=request)
+
+        store = DeliveryStore(str(tmp_path / "hooks.sqlite3"))
+        dispatcher = dispatcher_for(store, handler, max_attempts=3)
+        before = WEBHOOK_DELIVERIES.get(outcome="abandoned")
+        dispatcher.start()
+        try:
+            await dispatcher.enqueue("r1", "https://hooks.local/gone", b"{}", {})
+            await dispatcher.enqueue("r2", URL, b"{}", {})
+            await wait_until(lambda: WEBHOOK_DELIVERIES.get(outcome="abandoned") == before + 2)
+        finally:
+            await dispatcher.stop()
+
+        assert DeliveryStore(str(tmp_path / "hooks.sqlite3")).pending() == 0
+
+    @pytest.mark.asyncio
+    async def test_redirect_abandoned(self, tmp_path):
+        """Une redirection, jamais suivie, est définitive dès la première tentative"""
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            return httpx.Response(302, headers={"Location": "https://ailleurs.local/"})
+
+        store = DeliveryStore(str(tmp_path / "hooks.sqlite3"))
+        dispatcher = dispatcher_for(store, handler)
+        before = WEBHOOK_DELIVERIES.get(outcome="abandoned")
+        dispatcher.start()
+        try:
+            await dispatcher.enqueue("r1", URL, b"{}", {})
+            await wait_until(lambda: WEBHOOK_DELIVERIES.get(outcome="abandoned") == before + 1)
+        finally:
+            await dispatcher.stop()
+
+        assert len(attempts) == 1
+        assert DeliveryStore(str(tmp_path / "hooks.sqlite3")).pending() == 0
+
+    @pytest.mark.asyncio
+    async def test_submitted_jobs(self, tmp_path):
+        """Les conversions confiées au livreur sont attendues par join() et par l'arrêt"""
+        dispatcher = dispatcher_for(DeliveryStore(str(tmp_path / "hooks.sqlite3")), lambda request: httpx.Response(200))
+        done, release = [], asyncio.Event()
+
+        async def job(name):
+            await release.wait()
+            done.append(name)
+
+        dispatcher.submit(job("a"))
+        dispatcher.submit(job("b"))
+        await asyncio.sleep(0)
+        assert done == []
+        release.set()
+        await dispatcher.join()
+        assert sorted(done) == ["a", "b"]
+
+        blocked = dispatcher.submit(asyncio.Event().wait())
+        await dispatcher.stop(timeout=0.01)
+        assert blocked.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_backoff_schedules_retry(self, tmp_path):
+        """Une livraison échouée est reprogrammée selon le backoff"""
+        store = DeliveryStore(str(tmp_path / "hooks.sqlite3"))
+        dispatcher = dispatcher_for(store, lambda request: httpx.Response(500),
+                                    rng=lambda: 1.0, backoff_base=60.0, clock=lambda: 1000.0)
+        dispatcher.start()
+        try:
+            await dispatcher.enqueue("r1", URL, b"{}", {})
+            await wait_until(lambda: store.next_due() == 1060.0)
+        finally:
+            await dispatcher.stop()
+
+        [delivery] = DeliveryStore(str(tmp_path / "hooks.sqlite3")).due(now=2000.0, limit=10)
+        assert delivery.attempts == 1
+
+    @pytest.mark.asyncio
+    async def test_bounded_concurrency(self, tmp_path):
+        """Un destinataire lent n'occupe pas plus de places que la limite"""
+        release = asyncio.Event()
+        active = []
+        peak = []
+
+        async def handler(request):
+            active.append(request)
+            peak.append(len(active))
+            await release.wait()
+            active.pop()
+            return httpx.Response(200)
+
+        store = DeliveryStore(str(tmp_path / "hooks.sqlite3"))
+        dispatcher = dispatcher_for(store, handler, max_concurrency=2)
+        dispatcher.start()
+        try:
+            for index in range(5):
+                await dispatcher.enqueue(f"r{index}", URL, b"{}", {})
+            await wait_until(lambda: len(active) == 2)
+            await asyncio.sleep(0.05)
+            assert dispatcher.in_flight == 2
+            release.set()
+            await wait_until(lambda: store.pending() == 0)
+        finally:
+            await dispatcher.stop()
+
+        assert max(peak) == 2
+
+    @pytest.mark.asyncio
+    async def test_pending_resumed_after_restart(self, tmp_path):
+        """Les livraisons enregistrées avant un arrêt sont livrées au démarrage suivant"""
+        path = str(tmp_path / "hooks.sqlite3")
+        stopped = dispatcher_for(DeliveryStore(path), lambda request: httpx.Response(200))
+        await stopped.enqueue("r1", URL, b"{}", {})
+        await stopped.stop()
+
+        received = []
+        store = DeliveryStore(path)
+        dispatcher = dispatcher_for(store, lambda request: received.append(request) or httpx.Response(200))
+        dispatcher.start()
+        try:
+            await wait_until(lambda: received and store.pending() == 0)
+        finally:
+            await dispatcher.stop()
+
+        assert received[0].headers["X-Request-ID"] == "r1"